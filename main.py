@@ -4,106 +4,64 @@ import sys
 from src.logging.logger import logging
 from src.exception.exception import Project_Exception
 
-from src.entity.artifact_entity import DataIngestionArtifact
-from src.entity.config_entity import ProjectPipelineConfig,DataIngistionConfig
-from src.data_ingestion.data_preprocessor import DataIngestion
-from src.embedding_service.embedding_generator import  EmbeddingGenerator
-from src.embedding_service.vector_store import VectorStore
-from src.query_engine.entity_extractor import EntityExtractor
-from tests.test_api_class import CloudLLM
+# Full ingest -> embed -> index -> query run. To only answer queries from an
+# existing artifact use: python -m src.pipelines.inference_pipeline "<query>"
 
 if __name__=="__main__":
-    try:
-        project_pipeline_config = ProjectPipelineConfig()
-        data_ingestion_config = DataIngistionConfig(project_pipeline_config)
-        data_ingestion = DataIngestion(data_ingestion_config)
-        data_ingestion_artifact = data_ingestion.initiate_dataingestion()
-
-        store = VectorStore(data_ingestion_artifact)
-        messages, metadata = store.load_messages()
+    # Heavy modules are imported here so importing main.py stays cheap
+    from src.embedding_service.embedding_generator import  EmbeddingGenerator
+    from src.pipelines.train_pipeline import TrainPipeline
+    from src.nlp_models.llm_responder import CloudLLM
+    from src.nlp_models.response_cache import ResponseCache
+    from src.query_engine.query_handler import QueryHandler
 
-        # Step 2: Generate embeddings
+    try:
         embedder = EmbeddingGenerator()
-        embeddings = embedder.generate_embeddings(messages)
 
-        # Step 3: Save + build index
-        store.save_data(embeddings)
-        store.build_index(embeddings)
+        # Steps 1-3: ingest, embed, index. Re-runs only embed messages the
+        # current artifact's manifest has not seen, then move Artifact/CURRENT
+        store = TrainPipeline(embedder).run()
 
         # Step 4: Run search
         query = input("Enter your search query: ")
-        query_emb = embedder.generate_embeddings([query])
+        query_emb = embedder.generate_embeddings([query], cache=False)
         results = store.search(query_emb, top_k=3)
 
-        
-
         logging.info("\nTop Matches:\n")
         for r in results:
             logging.info(f"{r['rank']}. {r['text']}")
             logging.info(f"   Type: {r['metadata']['type']}, Distance: {r['distance']:.3f}\n")
 
-        new_message = {
-            "sender": "Google Pay",
-            "timestamp": "2025-11-07T10:05:00",
-            "text": "Payment of Rs. 250 to Rajesh for dinner was successful. Ref ID: GP281105.",
-            "type": "transaction",
-            "details": {"amount": 250, "action": "debited"}
-        }
-
-        store.add_new_message(new_message, embedder)
-        query = input("Enter your search query: ")
-        query_emb = embedder.generate_embeddings([query])
-        results = store.search(query_emb, top_k=3)
-
-        logging.info("\nTop Matches:\n")
-        for r in results:
-            logging.info(f"{r['rank']}. {r['text']}")
-            logging.info(f"   Type: {r['metadata']['type']}, Distance: {r['distance']:.3f}\n")
-
-        messages = [mes['text'] for mes in results]
-        result = EntityExtractor.extract_entities_from_messages(messages)
-
-        print("\n--- MASKED MESSAGES ---")
-        for m in result["masked_messages"]:
-            print(m)
-
-        print("\n--- PLACEHOLDER MAP ---")
-        print(result["placeholder_map"])
-
-
-        llm = CloudLLM()
-
-        prompt = f"""
-        You are a natural-language reasoning assistant for a RAG system.
-
-        IMPORTANT RULES:
-        - The text contains masked entities like #amount, #receiver, #date.
-        - These placeholders MUST remain EXACTLY as they appear.
-        - NEVER replace, modify, create, or remove placeholders.
-        - Never hallucinate real names, numbers, dates, or apps.
-        - Only summarize or compute using the placeholders given.
-        - Ignore messages that do NOT contain #amount if question is about payments.
-        - If total cannot be calculated because placeholders are the same, say so.
+        llm = CloudLLM(cache=ResponseCache())
+        handler = QueryHandler(store, embedder, llm)
 
-        USER QUERY:
-        {query}
+        while True:
+            query = input("Enter your search query (blank to quit): ").strip()
+            if not query:
+                break
 
-        RETRIEVED MESSAGES:
-        {messages}
+            # Stream the answer, putting real values back as placeholders complete;
+            # aggregates are computed locally, near-duplicates come from the query cache
+            print("Answer: ", end="", flush=True)
+            answer = handler.answer(query, on_text=lambda piece: print(piece, end="", flush=True))
+            print()
 
-        TASK:
-        - Identify which messages represent payments.
-        - Use only the placeholders to calculate.
-        - If multiple different #amount placeholders exist, express total as (#amount + #amount).
-        - If the same placeholder repeats, say: 
-        "Both payments use the placeholder #amount, so the total cannot be calculated."
+            logging.info("\nTop Matches:\n")
+            for r in answer["results"]:
+                logging.info(f"{r['rank']}. {r['text']}")
+                logging.info(f"   Type: {r['metadata']['type']}, Distance: {r['distance']:.3f}\n")
 
-        Give final answer in 1–2 sentences.
-        """
+            if answer["local"]:
+                print(f"(answered locally in {answer['seconds'] * 1000:.1f} ms)")
+                continue
 
-        response = llm.send_prompt(prompt)
+            print("\n--- MASKED MESSAGES ---")
+            for m in answer["masked"]["masked_messages"]:
+                print(m)
 
-        print("LLM Response:", response)
+            print("\n--- PLACEHOLDER MAP ---")
+            print(answer["masked"]["placeholder_map"])
+            print(f"({'cached, ' if answer['cached'] else ''}{answer['seconds'] * 1000:.0f} ms)")
 
     except Exception as e:
         raise Project_Exception(e,sys)
\ No newline at end of file
@@ -0,0 +1,63 @@
+# api/load_test.py
+
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+
+
+def run_load(url: str, queries, concurrency: int = 16, requests_per_client: int = 50, top_k: int = 5):
+    """
+    Fires `concurrency` clients at POST /search, each on its own keep-alive
+    session, and returns throughput plus client-side latency percentiles.
+    Compare a service started with --max-batch-size 1 against the default
+    to see what micro-batching buys on the same hardware.
+    """
+    latencies = []
+    lock = threading.Lock()
+
+    def client(worker: int):
+        session = requests.Session()
+        own = []
+        for i in range(requests_per_client):
+            query = queries[(worker * requests_per_client + i) % len(queries)]
+            t0 = time.perf_counter()
+            response = session.post(f"{url}/search", json={"query": query, "top_k": top_k}, timeout=60)
+            response.raise_for_status()
+            own.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(own)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "queries_per_second": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load against a running query service")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    sample_queries = [
+        "how much did I pay Rajesh", "movie tickets", "meeting tomorrow", "order delivered",
+        "salary credited", "electricity bill due", "internship offer", "refund processed",
+    ]
+    report = run_load(args.url, sample_queries, args.concurrency, args.requests, args.top_k)
+    print(json.dumps(report, indent=2))
+    print(json.dumps(requests.get(f"{args.url}/stats", timeout=10).json(), indent=2))
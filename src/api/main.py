@@ -0,0 +1,101 @@
+# api/main.py
+
+import argparse
+import json
+import sys
+import time
+from http.server import ThreadingHTTPServer
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.constants import message_pipeline
+from src.entity.artifact_entity import DataIngestionArtifact
+from src.embedding_service.vector_store import VectorStore
+from src.api.micro_batcher import MicroBatcher
+from src.api.routes.query_routes import make_query_handler
+
+
+class QueryService:
+    """
+    Long-running query service: the embedding model and the FAISS index are
+    loaded once, and concurrent queries are coalesced by a MicroBatcher so
+    each batch costs one generate_embeddings call and one search_batch call
+    per distinct filter set.
+    """
+
+    def __init__(self, artifact_dir: str, embedder=None,
+                 max_batch_size: int = message_pipeline.QUERY_SERVICE_MAX_BATCH_SIZE,
+                 max_wait_ms: float = message_pipeline.QUERY_SERVICE_MAX_WAIT_MS):
+        try:
+            artifact = DataIngestionArtifact(sms_path=None, email_path=None,
+                                             processed_data_dir=artifact_dir, artifact_dir=artifact_dir)
+            self.store = VectorStore(artifact)
+            self.store.load_index(mmap=True)
+            if embedder is None:
+                from src.embedding_service.embedding_generator import EmbeddingGenerator
+                embedder = EmbeddingGenerator()
+            self.embedder = embedder
+            self.batcher = MicroBatcher(self._process_batch, max_batch_size, max_wait_ms, name="query-batcher")
+            self.started = time.time()
+            logging.info(f"[INFO] Query service ready over {len(self.store.messages)} messages.")
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def _process_batch(self, requests):
+        """One encode for the whole batch, then one search_batch per distinct filter set."""
+        latency = self.batcher.latency
+
+        started = time.perf_counter()
+        embeddings = self.embedder.generate_embeddings(
+            [r["query"] for r in requests], batch_size=len(requests), show_progress_bar=False, cache=False
+        )
+        latency.record("encode", time.perf_counter() - started)
+
+        started = time.perf_counter()
+        groups = {}
+        for i, r in enumerate(requests):
+            groups.setdefault(json.dumps(r["filters"] or {}, sort_keys=True, default=str), []).append(i)
+        results = [None] * len(requests)
+        for rows in groups.values():
+            top_k = max(requests[i]["top_k"] for i in rows)
+            for i, hits in zip(rows, self.store.search_batch(embeddings[rows], top_k, requests[rows[0]]["filters"])):
+                results[i] = hits[:requests[i]["top_k"]]
+        latency.record("search", time.perf_counter() - started)
+
+        started = time.perf_counter()
+        responses = [{"results": hits, "masked": self.store.mask_results(hits)} for hits in results]
+        latency.record("mask", time.perf_counter() - started)
+        return responses
+
+    def search(self, query: str, top_k: int = 5, filters=None):
+        return self.batcher({"query": query, "top_k": top_k, "filters": filters})
+
+    def stats(self) -> dict:
+        return {"uptime_s": time.time() - self.started, **self.batcher.stats()}
+
+    def serve(self, host: str = message_pipeline.QUERY_SERVICE_HOST, port: int = message_pipeline.QUERY_SERVICE_PORT):
+        server = ThreadingHTTPServer((host, port), make_query_handler(self))
+        server.daemon_threads = True
+        logging.info(f"[INFO] Query service listening on http://{host}:{port}")
+        print(f"Query service listening on http://{host}:{port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.batcher.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-batching semantic search service")
+    parser.add_argument("--artifact-dir", required=True, help="directory holding index.faiss, documents.sqlite3, ...")
+    parser.add_argument("--host", default=message_pipeline.QUERY_SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=message_pipeline.QUERY_SERVICE_PORT)
+    parser.add_argument("--max-batch-size", type=int, default=message_pipeline.QUERY_SERVICE_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=message_pipeline.QUERY_SERVICE_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    QueryService(args.artifact_dir, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms).serve(
+        args.host, args.port
+    )
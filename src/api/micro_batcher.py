@@ -0,0 +1,140 @@
+# api/micro_batcher.py
+
+import queue
+import sys
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+import numpy as np
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.constants import message_pipeline
+
+
+class LatencyStats:
+    """Rolling per-stage latency samples (last `window` per stage) with percentile summaries."""
+
+    def __init__(self, window: int = 10_000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = {stage: np.array(values) * 1000 for stage, values in self._samples.items() if values}
+        return {
+            stage: {
+                "count": int(len(ms)),
+                "mean_ms": float(ms.mean()),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95)),
+                "p99_ms": float(np.percentile(ms, 99)),
+            }
+            for stage, ms in samples.items()
+        }
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item requests into batches for one worker
+    thread.
+
+    A batch closes when it holds `max_batch_size` items or when its oldest
+    item has waited `max_wait_ms`. Items that queued up while the previous
+    batch was running are already past their deadline, so under load
+    batches fill up without extra waiting, and a lone request pays at most
+    `max_wait_ms`.
+
+    `process_batch(items)` must return one result per item, in order; an
+    exception fails every request of that batch.
+    """
+
+    _STOP = object()
+
+    def __init__(self, process_batch,
+                 max_batch_size: int = message_pipeline.QUERY_SERVICE_MAX_BATCH_SIZE,
+                 max_wait_ms: float = message_pipeline.QUERY_SERVICE_MAX_WAIT_MS,
+                 name: str = "micro-batcher"):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+
+        self.latency = LatencyStats()
+        self.batch_sizes = Counter()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item) -> Future:
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item, timeout: float = message_pipeline.QUERY_SERVICE_TIMEOUT):
+        return self.submit(item).result(timeout)
+
+    def close(self):
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                remaining = deadline - time.perf_counter()
+                entry = self._queue.get_nowait() if remaining <= 0 else self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is self._STOP:
+                self._queue.put(entry)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is self._STOP:
+                return
+            batch = self._collect(first)
+
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.latency.record("queue_wait", started - enqueued)
+            self.batch_sizes[len(batch)] += 1
+
+            try:
+                results = self.process_batch([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise ValueError(f"{self.name}: {len(results)} results for {len(batch)} items")
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                logging.error(f"[ERROR] {self.name}: batch of {len(batch)} failed: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(Project_Exception(e, sys))
+            finally:
+                finished = time.perf_counter()
+                self.latency.record("batch", finished - started)
+                for _, _, enqueued in batch:
+                    self.latency.record("end_to_end", finished - enqueued)
+
+    def stats(self) -> dict:
+        batches = sum(self.batch_sizes.values())
+        items = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            "queue_depth": self._queue.qsize(),
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": items / batches if batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "latency": self.latency.summary(),
+        }
@@ -0,0 +1,68 @@
+# api/routes/query_routes.py
+
+import json
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler
+
+from src.logging.logger import logging
+
+
+def make_query_handler(service):
+    """
+    HTTP routes of the query service:
+
+      POST /search  {"query": str, "top_k": int, "filters": {...}}
+                    -> {"results": [...], "masked": {...}}
+      GET  /stats   -> batcher queue depth, batch sizes, per-stage latency
+      GET  /health  -> {"status": "ok", "rows": <indexed messages>}
+    """
+
+    class QueryRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logging.info(f"[INFO] {self.address_string()} {format % args}")
+
+        def _send_json(self, status: int, body):
+            data = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send_json(200, {"status": "ok", "rows": len(service.store.messages)})
+            elif self.path == "/stats":
+                self._send_json(200, service.stats())
+            else:
+                self._send_json(404, {"error": f"unknown route {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/search":
+                self._send_json(404, {"error": f"unknown route {self.path}"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                query = body.get("query")
+                if not isinstance(query, str) or not query.strip():
+                    raise ValueError("'query' must be a non-empty string")
+                top_k = int(body.get("top_k", 5))
+                if top_k < 1:
+                    raise ValueError("'top_k' must be positive")
+                filters = body.get("filters")
+                if filters is not None and not isinstance(filters, dict):
+                    raise ValueError("'filters' must be an object")
+            except (ValueError, TypeError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+
+            try:
+                self._send_json(200, service.search(query, top_k, filters))
+            except FutureTimeout:
+                self._send_json(503, {"error": "timed out waiting for a batch slot"})
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+
+    return QueryRequestHandler
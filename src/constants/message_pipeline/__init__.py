@@ -17,4 +17,112 @@ DATA_INGESTION_DIR_NAME = "Data_ingestion"
 RAW_DATA_DIR_NAME = "raw"
 PROCESSED_DATA_DIR_NAME = "processed"
 RAW_SMS_DIR_NAME = "sms.json"
-RAW_EMAIL_DIR_NAME = "emails.json"
\ No newline at end of file
+RAW_EMAIL_DIR_NAME = "emails.json"
+DATA_INGESTION_STREAMING = False         # JSONL output + chunked hand-off for very large exports
+DATA_INGESTION_CHUNK_SIZE = 1000
+JSON_STREAM_READ_SIZE = 1 << 16
+PREPROCESS_NUM_WORKERS = 1               # 1 = in-process, 0 = one worker per CPU
+PREPROCESS_CHUNK_SIZE = 500
+DATA_INGESTION_INCREMENTAL = True        # re-runs embed only messages the manifest has not seen
+DATA_INGESTION_MANIFEST_FILE_NAME = "manifest.json"
+ARTIFACT_CURRENT_FILE_NAME = "CURRENT"   # Artifact/CURRENT names the generation queries should use
+ARTIFACT_KEEP_GENERATIONS = 3
+ARTIFACT_CHECKSUM_SUFFIX = ".sha256"      # sidecar holding the sha256 of every atomically written artifact file
+ARTIFACT_VERIFY_CHECKSUMS = False        # verify those on every load; otherwise only after an unclean shutdown
+ARTIFACT_DIRTY_MARKER = "DIRTY"          # present in an artifact dir while its base files are being rewritten
+FULL_REBUILD_STALE_FRACTION = 0.2        # rebuild from scratch once this share of rows is edited / deleted
+
+
+"""
+embedding constants
+"""
+
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_CACHE_DIR_NAME = "embedding_cache"
+EMBEDDING_CACHE_MAX_ENTRIES = 500_000
+EMBEDDING_CACHE_FLUSH_EVERY = 1024       # new rows per append-only segment file, merged into cache.npz at exit
+EMBEDDING_CACHE_EVICT_TO = 0.9           # past MAX_ENTRIES, evict least recently used rows down to this share
+EMBEDDING_BACKEND = "torch"             # torch | onnx | onnx_int8
+EMBEDDING_ONNX_DIR_NAME = "onnx_models"
+EMBEDDING_ONNX_THREADS = 0              # ONNX Runtime intra-op threads, 0 = one per CPU
+EMBEDDING_MAX_SEQ_LENGTH = 256
+EMBEDDING_CHUNK_LONG_TEXTS = True       # split texts longer than the model window into overlapping chunks
+EMBEDDING_CHUNK_OVERLAP = 32            # tokens shared by consecutive chunks
+
+
+"""
+vector store constants
+"""
+
+VECTOR_STORE_SEGMENT_DIR_NAME = "segments"
+VECTOR_STORE_CHUNK_SEGMENT_DIR_NAME = "chunk_segments"
+VECTOR_STORE_SEGMENT_MAX_ROWS = 1000
+VECTOR_STORE_COMPACTION_THRESHOLD = 5000
+VECTOR_SEARCH_PREFILTER_SELECTIVITY = 0.2   # filters matching <= 20% of rows run inside FAISS
+VECTOR_SEARCH_POSTFILTER_OVERSAMPLE = 2
+HYBRID_SEARCH_CANDIDATE_FACTOR = 4          # BM25 / dense candidates per requested result before fusion
+HYBRID_EXACT_LOOKUP_MIN_DIGITS = 6          # bare numbers this long (ref / account numbers, not years) look like IDs
+HYBRID_EXACT_LOOKUP_MAX_DF = 3              # an ID-like token in more messages than this is not an exact lookup
+CHUNK_SEARCH_CANDIDATE_FACTOR = 4           # chunk hits searched per requested result before parent aggregation
+DEDUP_ENABLED = True                        # embed / return one row per near-duplicate cluster
+DEDUP_LSH_BANDS = 4                         # SimHash bands; every pair within DEDUP_MAX_HAMMING bits is found
+DEDUP_MAX_HAMMING = 3
+DEDUP_MAX_MEMBER_IDS = 20                   # duplicate ids attached to one search result
+
+
+"""
+vector index constants
+"""
+
+VECTOR_INDEX_TYPE = "flat"              # flat | ivf_flat | ivf_pq | hnsw | any FAISS factory string
+VECTOR_INDEX_STORAGE = "float32"        # float32 | float16 | int8 (per-dimension scalar quantized) vector codes
+VECTOR_SEARCH_RESCORE_FACTOR = 4        # compressed-scan candidates per result, re-ranked on exact fp32 vectors
+VECTOR_INDEX_CONFIG_FILE_NAME = "index_config.json"
+VECTOR_INDEX_NLIST = 1024
+VECTOR_INDEX_NPROBE = 16
+VECTOR_INDEX_PQ_M = 48
+VECTOR_INDEX_PQ_NBITS = 8
+VECTOR_INDEX_HNSW_M = 32
+VECTOR_INDEX_EF_CONSTRUCTION = 200
+VECTOR_INDEX_EF_SEARCH = 64
+VECTOR_INDEX_TRAIN_SAMPLE_SIZE = 100_000
+VECTOR_INDEX_MIN_TRAIN_SIZE = 1000
+
+
+"""
+llm client constants
+"""
+
+LLM_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+LLM_MODEL_NAME = "kwaipilot/kat-coder-pro:free"
+LLM_CONNECT_TIMEOUT = 5.0               # seconds
+LLM_READ_TIMEOUT = 60.0
+LLM_MAX_RETRIES = 4                     # retries after the first attempt (429 / 5xx / connection errors)
+LLM_BACKOFF_BASE = 0.5                  # seconds, doubled per retry, full jitter
+LLM_BACKOFF_MAX = 20.0
+LLM_MAX_CONCURRENCY = 4                 # in-flight requests per client
+LLM_POOL_SIZE = 8                       # keep-alive connections per client
+LLM_CACHE_DIR_NAME = "llm_cache"
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
+LLM_CACHE_MAX_ENTRIES = 50_000
+
+
+"""
+query engine constants
+"""
+
+QUERY_TOP_K = 3
+QUERY_CACHE_SIMILARITY = 0.95           # cosine similarity for a query to reuse a cached answer
+QUERY_CACHE_MAX_ENTRIES = 1024
+QUERY_CACHE_CANDIDATES = 8              # nearest cached queries checked for a matching top_k / filters
+
+
+"""
+query service constants
+"""
+
+QUERY_SERVICE_HOST = "127.0.0.1"
+QUERY_SERVICE_PORT = 8000
+QUERY_SERVICE_MAX_BATCH_SIZE = 32
+QUERY_SERVICE_MAX_WAIT_MS = 5.0         # longest a query waits for others to share its batch
+QUERY_SERVICE_TIMEOUT = 30.0            # seconds a request waits for its batch result
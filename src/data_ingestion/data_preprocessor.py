@@ -7,7 +7,8 @@ from src.exception.exception import Project_Exception
 from src.entity.artifact_entity import DataIngestionArtifact
 from src.entity.config_entity import DataIngistionConfig, ProjectPipelineConfig
 
-from src.utils.preprocessor import preprocess_text,analyze_sms, analyze_email
+from src.utils.preprocessor import preprocess_text, analyze_parallel
+from src.data_ingestion.message_parser import iter_json_array
 
 
 class DataIngestion:
@@ -28,6 +29,28 @@ class DataIngestion:
     #     os.makedirs(self.processed_dir, exist_ok=True)
     #     logging.info("DataIngestion initialized successfully.")
 
+    def _analyze(self, messages, kind):
+        """
+        Classifies messages lazily: in-process when num_workers is 1,
+        otherwise sharded across a process pool (results stay in input order).
+        Both go through analyze_parallel, which logs the throughput.
+        """
+        num_workers = self.data_ingestion_config.num_workers
+        return analyze_parallel(messages, kind, num_workers or None, self.data_ingestion_config.preprocess_chunk_size)
+
+    @staticmethod
+    def _sms_fields(msg):
+        return {"sender": msg.get("sender"), "body": msg.get("text"), "timestamp": msg.get("timestamp")}
+
+    @staticmethod
+    def _email_fields(mail):
+        return {
+            "sender": mail.get("from"),
+            "subject": mail.get("subject"),
+            "body": mail.get("body"),
+            "timestamp": mail.get("date")
+        }
+
     def read_sms_messages(self):
         """
         Reads sms.json from local directory and saves as sms_data.json
@@ -43,20 +66,7 @@ class DataIngestion:
             with open(sms_path, "r", encoding="utf-8") as f:
                 sms_data = json.load(f).get("messages", [])
 
-            formatted_sms = []
-            for msg in sms_data:
-                # formatted_sms.append({
-                #     "type": "sms",
-                #     "sender": msg.get("sender"),
-                #     "subject": None,
-                #     "body": msg.get("text"),
-                #     "timestamp": msg.get("timestamp")
-                # })
-                formatted_sms.append(analyze_sms({
-                    "sender": msg.get("sender"),
-                    "body": msg.get("text"),
-                    "timestamp": msg.get("timestamp")
-                }))
+            formatted_sms = list(self._analyze(map(self._sms_fields, sms_data), "sms"))
 
             # Save processed SMS
             
@@ -85,21 +95,7 @@ class DataIngestion:
             with open(email_path, "r", encoding="utf-8") as f:
                 email_data = json.load(f).get("emails", [])
 
-            formatted_emails = []
-            for mail in email_data:
-                # formatted_emails.append({
-                #     "type": "email",
-                #     "sender": mail.get("from"),
-                #     "subject": mail.get("subject"),
-                #     "body": mail.get("body"),
-                #     "timestamp": mail.get("date")
-                # })
-                formatted_emails.append(analyze_email({
-                    "sender": mail.get("from"),
-                    "subject": mail.get("subject"),
-                    "body": mail.get("body"),
-                    "timestamp": mail.get("date")
-                }))
+            formatted_emails = list(self._analyze(map(self._email_fields, email_data), "email"))
 
             # Save processed emails
 
@@ -113,10 +109,103 @@ class DataIngestion:
         except Exception as e:
             raise Project_Exception(e, sys)
         
+    # ------------------------------------------------------
+    # STREAMING MODE (very large exports)
+    # ------------------------------------------------------
+    @staticmethod
+    def _write_jsonl(records, output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        count = 0
+        with open(output_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+        return count
+
+    def stream_sms_messages(self):
+        """
+        Streaming variant of read_sms_messages: parses the "messages" array
+        incrementally and writes sms_data.jsonl one record at a time, so
+        memory stays flat regardless of the export size.
+        """
+        try:
+            sms_path = self.data_ingestion_config.sms_dir
+            output_path = os.path.join(self.data_ingestion_config.processed_data_dir, "sms_data.jsonl")
+
+            if not os.path.exists(sms_path):
+                logging.warning("sms.json not found. Skipping SMS ingestion.")
+                return None
+
+            raw_messages = iter_json_array(sms_path, "messages")
+            records = self._analyze(map(self._sms_fields, raw_messages), "sms")
+            count = self._write_jsonl(records, output_path)
+
+            logging.info(f"Streamed and saved {count} SMS messages to {output_path}")
+            return output_path
+
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def stream_email_messages(self):
+        """
+        Streaming variant of read_email_messages: parses the "emails" array
+        incrementally and writes email_data.jsonl one record at a time.
+        """
+        try:
+            email_path = self.data_ingestion_config.email_dir
+            output_path = os.path.join(self.data_ingestion_config.processed_data_dir, "email_data.jsonl")
+
+            if not os.path.exists(email_path):
+                logging.warning("emails.json not found. Skipping email ingestion.")
+                return None
+
+            raw_emails = iter_json_array(email_path, "emails")
+            records = self._analyze(map(self._email_fields, raw_emails), "email")
+            count = self._write_jsonl(records, output_path)
+
+            logging.info(f"Streamed and saved {count} email messages to {output_path}")
+            return output_path
+
+        except Exception as e:
+            raise Project_Exception(e, sys)
+        
+    # ------------------------------------------------------
+    # INCREMENTAL MODE (only messages the manifest has not seen)
+    # ------------------------------------------------------
+    def process_delta(self, sms_messages, emails):
+        """
+        Analyzes only the given raw SMS / email dicts and saves them as
+        sms_data.json / email_data.json in this run's processed dir.
+        Returns a DataIngestionArtifact over those delta files.
+        """
+        try:
+            processed_dir = self.data_ingestion_config.processed_data_dir
+            paths = []
+            for records, fields, kind, name in ((sms_messages, self._sms_fields, "sms", "sms_data.json"),
+                                                (emails, self._email_fields, "email", "email_data.json")):
+                if not records:
+                    paths.append(None)
+                    continue
+                formatted = list(self._analyze(map(fields, records), kind))
+                output_path = os.path.join(processed_dir, name)
+                os.makedirs(processed_dir, exist_ok=True)
+                with open(output_path, "w", encoding="utf-8") as f:
+                    json.dump(formatted, f, indent=4)
+                paths.append(output_path)
+
+            logging.info(f"Processed {len(sms_messages)} new SMS and {len(emails)} new emails into {processed_dir}")
+            return DataIngestionArtifact(paths[0], paths[1], processed_dir, self.data_ingestion_config.artifact_dir)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
     def initiate_dataingestion(self):
         try:
-            sms_path = self.read_sms_messages()
-            email_path = self.read_email_messages()
+            if self.data_ingestion_config.streaming:
+                sms_path = self.stream_sms_messages()
+                email_path = self.stream_email_messages()
+            else:
+                sms_path = self.read_sms_messages()
+                email_path = self.read_email_messages()
             processed_data_dir = self.data_ingestion_config.processed_data_dir
             artifact_dir = self.data_ingestion_config.artifact_dir
 
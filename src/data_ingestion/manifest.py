@@ -0,0 +1,180 @@
+# data_ingestion/manifest.py
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.utils.atomic_io import write_json_atomic, verify_checksum
+from src.constants import message_pipeline
+
+
+def content_id(kind: str, message: dict) -> str:
+    """Stable id of a raw SMS / email dict: same content -> same id, whatever its position in the file."""
+    payload = kind + "\0" + json.dumps(message, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def file_fingerprint(path: str, previous: dict = None):
+    """
+    {"size", "mtime", "sha256"} of a source file, or None if it is missing.
+    The hash is reused from `previous` when size and mtime did not change.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime}
+    if previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime:
+        fingerprint["sha256"] = previous["sha256"]
+        return fingerprint
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    fingerprint["sha256"] = digest.hexdigest()
+    return fingerprint
+
+
+class SourceManifest:
+    """
+    What one artifact generation was built from, saved as manifest.json
+    next to its index:
+
+      - sources    : kind -> fingerprint of the raw file (size, mtime, sha256)
+      - messages   : content id of every indexed row, in row order
+      - stale      : rows whose content no longer exists in the sources
+                     (edited or deleted messages still in the index)
+      - generation : this artifact directory's name; parent : the one it extends
+    """
+
+    def __init__(self, sources=None, messages=None, stale: int = 0, generation: str = None, parent: str = None):
+        self.sources = sources or {}
+        self.messages = messages or []
+        self.stale = stale
+        self.generation = generation
+        self.parent = parent
+
+    def same_sources(self, fingerprints: dict) -> bool:
+        """True when every source file has the content hash this generation was built from."""
+        def digest(fingerprint):
+            return fingerprint["sha256"] if fingerprint else None
+        kinds = set(self.sources) | set(fingerprints)
+        return all(digest(self.sources.get(k)) == digest(fingerprints.get(k)) for k in kinds)
+
+    @classmethod
+    def load(cls, artifact_dir: str):
+        """The manifest of `artifact_dir`, or None for an artifact built before manifests existed."""
+        try:
+            path = os.path.join(artifact_dir, message_pipeline.DATA_INGESTION_MANIFEST_FILE_NAME)
+            if not os.path.exists(path) or not verify_checksum(path):
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(data.get("sources"), data.get("messages"), data.get("stale", 0),
+                       data.get("generation"), data.get("parent"))
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def save(self, artifact_dir: str):
+        try:
+            path = os.path.join(artifact_dir, message_pipeline.DATA_INGESTION_MANIFEST_FILE_NAME)
+            write_json_atomic(path, {
+                "generation": self.generation,
+                "parent": self.parent,
+                "sources": self.sources,
+                "stale": self.stale,
+                "messages": self.messages,
+            })
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+
+# ------------------------------------------------------
+# CURRENT POINTER / GENERATIONS
+# ------------------------------------------------------
+def read_current(artifact_root: str = message_pipeline.ARTIFACT_DIR_NAME):
+    """Directory Artifact/CURRENT points at, or None before the first published run."""
+    path = os.path.join(artifact_root, message_pipeline.ARTIFACT_CURRENT_FILE_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        generation = f.read().strip()
+    artifact_dir = os.path.join(artifact_root, generation)
+    return artifact_dir if generation and os.path.isdir(artifact_dir) else None
+
+
+def publish_current(artifact_dir: str, artifact_root: str = message_pipeline.ARTIFACT_DIR_NAME):
+    """
+    Atomically points Artifact/CURRENT at `artifact_dir`: readers see either
+    the previous generation or the complete new one, never a half-built one.
+    """
+    try:
+        path = os.path.join(artifact_root, message_pipeline.ARTIFACT_CURRENT_FILE_NAME)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(os.path.basename(os.path.normpath(artifact_dir)) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        logging.info(f"[INFO] {path} -> {artifact_dir}")
+    except Exception as e:
+        raise Project_Exception(e, sys)
+
+
+def clone_generation(source_dir: str, target_dir: str):
+    """
+    Starts a new generation from an existing one. Base files are hard-linked
+    (every writer replaces them through a temp file, so the source is never
+    modified); WAL segment directories are copied since they are appended
+    in place, and SQLite databases through the backup API so a reader
+    holding the source open still gets a consistent copy. Raw-data copies
+    under Data_ingestion/ are not carried over.
+    """
+    try:
+        os.makedirs(target_dir, exist_ok=True)
+        wal_dirs = {message_pipeline.VECTOR_STORE_SEGMENT_DIR_NAME,
+                    message_pipeline.VECTOR_STORE_CHUNK_SEGMENT_DIR_NAME}
+        for name in os.listdir(source_dir):
+            source, target = os.path.join(source_dir, name), os.path.join(target_dir, name)
+            if name in wal_dirs:
+                shutil.copytree(source, target, dirs_exist_ok=True)
+            elif name.endswith(".sqlite3"):
+                src, dst = sqlite3.connect(source), sqlite3.connect(target)
+                try:
+                    src.backup(dst)
+                finally:
+                    src.close()
+                    dst.close()
+            elif name.endswith((".sqlite3-wal", ".sqlite3-shm")):
+                continue
+            elif (os.path.isfile(source) and not name.endswith(".tmp")
+                  and not name.startswith(message_pipeline.DATA_INGESTION_MANIFEST_FILE_NAME)):
+                try:
+                    os.link(source, target)
+                except OSError:
+                    shutil.copy2(source, target)
+    except Exception as e:
+        raise Project_Exception(e, sys)
+
+
+def prune_generations(artifact_root: str = message_pipeline.ARTIFACT_DIR_NAME,
+                      keep: int = message_pipeline.ARTIFACT_KEEP_GENERATIONS):
+    """Deletes the oldest manifest-bearing generations beyond `keep`, never the current one."""
+    try:
+        current = read_current(artifact_root)
+        generations = [
+            os.path.join(artifact_root, name) for name in os.listdir(artifact_root)
+            if os.path.exists(os.path.join(artifact_root, name, message_pipeline.DATA_INGESTION_MANIFEST_FILE_NAME))
+        ]
+        generations.sort(key=os.path.getmtime, reverse=True)
+        for artifact_dir in generations[keep:]:
+            if current and os.path.samefile(artifact_dir, current):
+                continue
+            shutil.rmtree(artifact_dir, ignore_errors=True)
+            logging.info(f"[INFO] Pruned old artifact generation {artifact_dir}")
+    except Exception as e:
+        raise Project_Exception(e, sys)
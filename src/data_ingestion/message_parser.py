@@ -0,0 +1,92 @@
+import json
+import re
+import sys
+
+from src.exception.exception import Project_Exception
+from src.constants import message_pipeline
+
+
+def iter_json_array(path: str, key: str = None, read_size: int = message_pipeline.JSON_STREAM_READ_SIZE):
+    """
+    Incrementally yields the elements of a JSON array without loading the
+    whole file.
+
+    - key=None : the file itself is an array  ->  [ {...}, {...} ]
+    - key="messages" : the array under a top-level key  ->  {"messages": [ ... ]}
+      (a bare top-level array is accepted as well)
+
+    Only `read_size` characters plus the element being decoded are held in
+    memory at any time.
+    """
+    try:
+        decoder = json.JSONDecoder()
+        start_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key)) if key else None
+
+        with open(path, "r", encoding="utf-8") as f:
+            buf = ""
+            pos = 0
+            eof = False
+
+            def read_more():
+                nonlocal buf, pos, eof
+                chunk = f.read(read_size)
+                if not chunk:
+                    eof = True
+                buf = buf[pos:] + chunk
+                pos = 0
+
+            # 1️⃣ Find the opening bracket of the array
+            while True:
+                stripped = buf.lstrip()
+                if stripped.startswith("["):
+                    pos = len(buf) - len(stripped) + 1
+                    break
+                match = start_pattern.search(buf) if start_pattern else None
+                if match:
+                    pos = match.end()
+                    break
+                if eof:
+                    return
+                read_more()
+
+            # 2️⃣ Decode one element at a time
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n,":
+                    pos += 1
+                if pos >= len(buf):
+                    if eof:
+                        raise ValueError(f"Unterminated JSON array in {path}")
+                    read_more()
+                    continue
+                if buf[pos] == "]":
+                    return
+
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    read_more()
+                    continue
+                # A value touching the end of the buffer may be cut short (e.g. a number)
+                if end >= len(buf) and not eof:
+                    read_more()
+                    continue
+
+                yield item
+                pos = end
+                if pos > read_size:
+                    buf, pos = buf[pos:], 0
+    except Exception as e:
+        raise Project_Exception(e, sys)
+
+
+def iter_jsonl(path: str):
+    """Yields one decoded record per non-empty line of a JSONL file."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    except Exception as e:
+        raise Project_Exception(e, sys)
@@ -0,0 +1,228 @@
+# embedding_service/bm25_index.py
+
+import json
+import math
+import os
+import sys
+import threading
+import uuid
+from array import array
+from collections import Counter
+import numpy as np
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.utils.atomic_io import atomic_open, write_json_atomic, verify_checksum
+from src.utils.preprocessor import preprocess_text
+
+
+class BM25Index:
+    """
+    Compact inverted index (term -> posting list of row ids + term
+    frequencies) scored with BM25.
+
+    On disk, next to index.faiss:
+      - bm25_vocab.json   : {"stamp", "rows", "terms": term -> [offset, length]}
+      - bm25_postings.npz : doc_ids (int32), tfs (int32), doc_lens (int32), stamp
+
+    The two files are renamed one after the other, so both carry the stamp of
+    the save that wrote them; a pair from different saves is rejected on load.
+
+    Rows added after the last save are kept in an in-memory delta that is
+    merged in at query time and folded into the arrays on save.
+    """
+
+    VOCAB_FILE_NAME = "bm25_vocab.json"
+    POSTINGS_FILE_NAME = "bm25_postings.npz"
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.vocab = {}                          # term -> (offset, length)
+        self.doc_ids = np.empty(0, np.int32)
+        self.tfs = np.empty(0, np.int32)
+        self.doc_lens = array("i")
+        self.total_len = 0
+        self.delta = {}                          # term -> (array of doc ids, array of tfs)
+
+    def __len__(self):
+        return len(self.doc_lens)
+
+    @staticmethod
+    def tokenize(text: str):
+        """preprocess_text tokens with trailing '.'/':' removed, so "GP281105." matches "gp281105"."""
+        return [t for t in (tok.strip(".:") for tok in preprocess_text(text).split()) if t]
+
+    # ------------------------------------------------------
+    # BUILD / UPDATE
+    # ------------------------------------------------------
+    def build(self, texts):
+        with self._lock:
+            self._reset()
+            self._add(texts)
+            self._merge()
+        logging.info(f"[INFO] Built BM25 index over {len(self)} messages ({len(self.vocab)} terms).")
+
+    def add(self, texts):
+        with self._lock:
+            self._add(texts)
+
+    def _add(self, texts):
+        doc_id = len(self.doc_lens)
+        for text in texts:
+            counts = Counter(self.tokenize(text))
+            for term, tf in counts.items():
+                ids, tfs = self.delta.setdefault(term, (array("i"), array("i")))
+                ids.append(doc_id)
+                tfs.append(tf)
+            length = sum(counts.values())
+            self.doc_lens.append(length)
+            self.total_len += length
+            doc_id += 1
+
+    def _merge(self):
+        """Folds the delta into the base posting arrays (O(total postings))."""
+        if not self.delta:
+            return
+        terms = sorted(set(self.vocab) | set(self.delta))
+        id_parts, tf_parts, vocab, offset = [], [], {}, 0
+        for term in terms:
+            ids, tfs = self._postings(term)
+            id_parts.append(ids)
+            tf_parts.append(tfs)
+            vocab[term] = (offset, len(ids))
+            offset += len(ids)
+        self.doc_ids = np.concatenate(id_parts).astype(np.int32)
+        self.tfs = np.concatenate(tf_parts).astype(np.int32)
+        self.vocab = vocab
+        self.delta = {}
+
+    def _postings(self, term):
+        ids, tfs = np.empty(0, np.int32), np.empty(0, np.int32)
+        if term in self.vocab:
+            offset, length = self.vocab[term]
+            ids, tfs = self.doc_ids[offset:offset + length], self.tfs[offset:offset + length]
+        if term in self.delta:
+            d_ids, d_tfs = self.delta[term]
+            ids = np.concatenate([ids, np.frombuffer(d_ids, dtype=np.int32)])
+            tfs = np.concatenate([tfs, np.frombuffer(d_tfs, dtype=np.int32)])
+        return ids, tfs
+
+    # ------------------------------------------------------
+    # PERSISTENCE
+    # ------------------------------------------------------
+    def save(self, index_dir: str, rows: int = None):
+        """Writes rows 0..rows-1 (default: every row)."""
+        try:
+            with self._lock:
+                self._merge()
+                vocab, doc_ids, tfs = self.vocab, self.doc_ids, self.tfs
+                doc_lens = np.array(self.doc_lens, dtype=np.int32)
+                if rows is not None and rows < len(doc_lens):
+                    vocab, doc_ids, tfs = self._truncated(rows)
+                    doc_lens = doc_lens[:rows]
+                stamp = uuid.uuid4().hex
+                vocab_path = os.path.join(index_dir, self.VOCAB_FILE_NAME)
+                postings_path = os.path.join(index_dir, self.POSTINGS_FILE_NAME)
+                with atomic_open(postings_path) as f:
+                    np.savez(f, doc_ids=doc_ids, tfs=tfs, doc_lens=doc_lens, stamp=np.array(stamp))
+                write_json_atomic(vocab_path, {"stamp": stamp, "rows": len(doc_lens), "terms": vocab},
+                                  ensure_ascii=False)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def _truncated(self, rows):
+        """Merged vocab and posting arrays without the postings of rows >= `rows`."""
+        keep = self.doc_ids < rows
+        kept = np.concatenate([[0], np.cumsum(keep)])
+        vocab = {}
+        for term, (offset, length) in self.vocab.items():
+            start, end = int(kept[offset]), int(kept[offset + length])
+            if end > start:
+                vocab[term] = (start, end - start)
+        return vocab, self.doc_ids[keep], self.tfs[keep]
+
+    def load(self, index_dir: str) -> bool:
+        """Loads a saved index; returns False if the artifact has none yet or its files don't pair up."""
+        try:
+            vocab_path = os.path.join(index_dir, self.VOCAB_FILE_NAME)
+            postings_path = os.path.join(index_dir, self.POSTINGS_FILE_NAME)
+            if not (os.path.exists(vocab_path) and os.path.exists(postings_path)):
+                return False
+            if not (verify_checksum(vocab_path) and verify_checksum(postings_path)):
+                return False
+            with open(vocab_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            with np.load(postings_path) as data:
+                doc_ids, tfs, doc_lens = data["doc_ids"], data["tfs"], data["doc_lens"]
+                stamp = str(data["stamp"]) if "stamp" in data.files else None
+
+            # Files written before the stamp was added are a plain term -> span mapping
+            terms = saved.get("terms") if stamp is not None else saved
+            if stamp is not None and (saved.get("stamp") != stamp or saved.get("rows") != len(doc_lens)):
+                logging.warning(f"[WARN] {self.VOCAB_FILE_NAME} and {self.POSTINGS_FILE_NAME} "
+                             "come from different saves; rebuilding BM25.")
+                return False
+
+            with self._lock:
+                self._reset()
+                self.vocab = {term: tuple(span) for term, span in terms.items()}
+                self.doc_ids = doc_ids
+                self.tfs = tfs
+                self.doc_lens = array("i", doc_lens.tobytes())
+                self.total_len = int(doc_lens.sum())
+            return True
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    # ------------------------------------------------------
+    # QUERY
+    # ------------------------------------------------------
+    def term_rows(self, term: str):
+        """Row ids (int64) whose text contains `term`, a token as tokenize() returns it."""
+        with self._lock:
+            return self._postings(term)[0].astype(np.int64)
+
+    def search(self, query: str, top_k: int = 5):
+        """Returns (row_ids, scores) of the best BM25 matches, best first."""
+        try:
+            with self._lock:
+                id_parts, score_parts = self._score_terms(query)
+
+            if not id_parts:
+                return np.empty(0, np.int64), np.empty(0, np.float32)
+
+            # Sparse accumulation: only rows containing a query term are touched
+            unique_ids, inverse = np.unique(np.concatenate(id_parts), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+            order = np.argsort(-scores, kind="stable")[:top_k]
+            return unique_ids[order].astype(np.int64), scores[order].astype(np.float32)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def _score_terms(self, query: str):
+        """
+        Per-term (row ids, BM25 scores), caller holds the lock. The doc_lens
+        view must not outlive it: add() cannot grow an array that still
+        exports its buffer.
+        """
+        n_docs = len(self.doc_lens)
+        if n_docs == 0:
+            return [], []
+        avgdl = self.total_len / n_docs
+        doc_lens = np.frombuffer(self.doc_lens, dtype=np.int32)
+
+        id_parts, score_parts = [], []
+        for term in set(self.tokenize(query)):
+            ids, tfs = self._postings(term)
+            if len(ids) == 0:
+                continue
+            idf = math.log(1 + (n_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * doc_lens[ids] / avgdl)
+            id_parts.append(ids)
+            score_parts.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+        return id_parts, score_parts
@@ -0,0 +1,126 @@
+# embedding_service/chunk_index.py
+
+import os
+import sys
+import threading
+from array import array
+import numpy as np
+import faiss
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.utils.atomic_io import atomic_open, verify_checksum
+
+
+class ChunkIndex:
+    """
+    Extra vectors for messages longer than the embedding model's window.
+
+    The main FAISS index keeps exactly one vector per message (its first
+    chunk), so every other side table stays one row per message. The
+    remaining chunks of long emails live here with `parents[row]` = the
+    message id they came from, and VectorStore scores a message by its
+    best-matching vector across both.
+
+    Only long messages contribute rows, so an exact IndexFlatL2 is enough.
+    On disk, next to index.faiss: chunks.npz (embeddings + parents).
+    """
+
+    FILE_NAME = "chunks.npz"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.index = None
+        self.parents = array("q")
+
+    def __len__(self):
+        return len(self.parents)
+
+    # ------------------------------------------------------
+    # BUILD / UPDATE
+    # ------------------------------------------------------
+    def build(self, dim: int, embeddings=None, parents=None):
+        with self._lock:
+            self.index = faiss.IndexFlatL2(dim)
+            self.parents = array("q")
+            if embeddings is not None:
+                self._add(embeddings, parents)
+        logging.info(f"[INFO] Built chunk index with {len(self)} extra chunk vectors.")
+
+    def add(self, embeddings, parents):
+        with self._lock:
+            self._add(embeddings, parents)
+
+    def _add(self, embeddings, parents):
+        try:
+            if len(parents) == 0:
+                return
+            self.index.add(np.ascontiguousarray(embeddings, dtype="float32"))
+            self.parents.extend(int(p) for p in parents)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    # ------------------------------------------------------
+    # SEARCH
+    # ------------------------------------------------------
+    def search(self, queries, k: int, eligible=None):
+        """
+        Nearest chunks of each query row as (distances, parent ids), padded
+        with inf / -1. `eligible` (message ids) restricts the scan to chunks
+        of those messages.
+        """
+        try:
+            with self._lock:
+                k = min(k, len(self))
+                if self.index is None or k == 0:
+                    empty = np.empty((len(queries), 0))
+                    return empty.astype("float32"), empty.astype("int64")
+
+                if eligible is None:
+                    distances, rows = self.index.search(queries, k)
+                else:
+                    mask = np.isin(np.array(self.parents, dtype="int64"), eligible)
+                    bitmap = np.packbits(mask, bitorder="little")
+                    selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+                    distances, rows = self.index.search(queries, k, params=faiss.SearchParameters(sel=selector))
+
+                parents = np.array([[self.parents[r] if r >= 0 else -1 for r in row] for row in rows.tolist()],
+                                   dtype="int64").reshape(rows.shape)
+            return distances, parents
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    # ------------------------------------------------------
+    # PERSISTENCE
+    # ------------------------------------------------------
+    def save(self, index_dir: str, rows: int = None):
+        """Writes chunk rows 0..rows-1 (default: every chunk)."""
+        try:
+            path = os.path.join(index_dir, self.FILE_NAME)
+            with self._lock:
+                if self.index is None:
+                    return
+                rows = self.index.ntotal if rows is None else min(rows, self.index.ntotal)
+                embeddings = self.index.reconstruct_n(0, rows)
+                parents = np.array(self.parents[:rows], dtype="int64")
+            with atomic_open(path) as f:
+                np.savez(f, embeddings=embeddings, parents=parents)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def load(self, index_dir: str, dim: int) -> bool:
+        """Loads saved chunks; returns False (and starts empty) if the artifact has none yet."""
+        try:
+            path = os.path.join(index_dir, self.FILE_NAME)
+            if not os.path.exists(path) or not verify_checksum(path):
+                self.build(dim)
+                return False
+            with np.load(path) as data:
+                embeddings, parents = data["embeddings"], data["parents"]
+            with self._lock:
+                self.index = faiss.IndexFlatL2(dim)
+                self.parents = array("q")
+                self._add(embeddings, parents)
+            return True
+        except Exception as e:
+            raise Project_Exception(e, sys)
@@ -0,0 +1,212 @@
+# embedding_service/column_store.py
+
+import os
+import sys
+import threading
+from array import array
+import numpy as np
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.utils.helpers import to_epoch, to_end_epoch
+from src.utils.atomic_io import atomic_open, verify_checksum
+
+
+class ColumnStore:
+    """
+    Structured message fields as NumPy columns, one row per vector-store row,
+    for vectorized aggregates (sums, counts, top senders) without touching
+    the message texts.
+
+    Columns:
+      - timestamp : epoch seconds (float64, NaN if unknown)
+      - amount    : details.amount (float64, NaN if none)
+      - action    : ACTIONS code of details.action (int8)
+      - sender    : code into `senders` (SMS sender / email from, lowercased)
+      - type      : code into `types`
+      - source    : SOURCES code (int8)
+
+    On disk, next to index.faiss: columns.npz (columns + the two vocabularies).
+    """
+
+    FILE_NAME = "columns.npz"
+    ACTIONS = ("", "debited", "credited")
+    SOURCES = ("", "sms", "email")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.timestamp = array("d")
+        self.amount = array("d")
+        self.action = array("b")
+        self.sender = array("i")
+        self.type = array("i")
+        self.source = array("b")
+        self.senders = []               # code -> lowercased sender
+        self.types = []                 # code -> type
+        self._sender_codes = {}
+        self._type_codes = {}
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    @staticmethod
+    def _code(value, values, codes):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    # ------------------------------------------------------
+    # BUILD / UPDATE
+    # ------------------------------------------------------
+    def build(self, metadata):
+        with self._lock:
+            self._reset()
+            self._add(metadata)
+        logging.info(f"[INFO] Built analytics columns over {len(self)} messages.")
+
+    def add(self, metas):
+        with self._lock:
+            self._add(metas)
+
+    def _add(self, metas):
+        try:
+            for meta in metas:
+                details = meta.get("details") or {}
+                source = (meta.get("source") or "").lower()
+                sender = meta.get("sender") if source == "sms" else meta.get("from")
+                amount = details.get("amount")
+                try:
+                    amount = float(amount) if amount is not None else np.nan
+                except (TypeError, ValueError):
+                    amount = np.nan
+
+                self.timestamp.append(to_epoch(meta.get("timestamp") or meta.get("date")))
+                self.amount.append(amount)
+                action = (details.get("action") or "").lower()
+                self.action.append(self.ACTIONS.index(action) if action in self.ACTIONS else 0)
+                self.sender.append(self._code((sender or "").lower(), self.senders, self._sender_codes))
+                self.type.append(self._code((meta.get("type") or "").lower(), self.types, self._type_codes))
+                self.source.append(self.SOURCES.index(source) if source in self.SOURCES else 0)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    # ------------------------------------------------------
+    # QUERY
+    # ------------------------------------------------------
+    def columns(self):
+        """
+        Zero-copy NumPy views of every column. Callers hold the lock and drop
+        the views before releasing it: add() cannot grow an exported array.
+        """
+        return {
+            "timestamp": np.frombuffer(self.timestamp, dtype=np.float64),
+            "amount": np.frombuffer(self.amount, dtype=np.float64),
+            "action": np.frombuffer(self.action, dtype=np.int8),
+            "sender": np.frombuffer(self.sender, dtype=np.int32),
+            "type": np.frombuffer(self.type, dtype=np.int32),
+            "source": np.frombuffer(self.source, dtype=np.int8),
+        }
+
+    def mask(self, filters: dict = None):
+        """
+        Boolean row mask for `filters` (AND of every given key):
+        "action", "source", "type", "sender" (str or list, case-insensitive),
+        "start" / "end" (inclusive, anything to_epoch accepts; a date-only
+        end includes that whole day).
+        """
+        try:
+            cols = self.columns()
+            mask = np.ones(len(cols["timestamp"]), dtype=bool)
+            filters = filters or {}
+
+            def codes_for(key, lookup):
+                values = filters[key]
+                values = [values] if isinstance(values, str) else list(values)
+                return [lookup(str(v).lower()) for v in values]
+
+            if filters.get("action") is not None:
+                mask &= np.isin(cols["action"], codes_for(
+                    "action", lambda v: self.ACTIONS.index(v) if v in self.ACTIONS else -1))
+            if filters.get("source") is not None:
+                mask &= np.isin(cols["source"], codes_for(
+                    "source", lambda v: self.SOURCES.index(v) if v in self.SOURCES else -1))
+            if filters.get("type") is not None:
+                mask &= np.isin(cols["type"], codes_for("type", lambda v: self._type_codes.get(v, -1)))
+            if filters.get("sender") is not None:
+                mask &= np.isin(cols["sender"], codes_for("sender", lambda v: self._sender_codes.get(v, -1)))
+            if filters.get("start") is not None:
+                mask &= cols["timestamp"] >= to_epoch(filters["start"])
+            if filters.get("end") is not None:
+                end, inclusive = to_end_epoch(filters["end"])
+                mask &= (cols["timestamp"] <= end) if inclusive else (cols["timestamp"] < end)
+            return mask
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def sum_amount(self, filters: dict = None) -> dict:
+        with self._lock:
+            mask = self.mask(filters)
+            amounts = self.columns()["amount"][mask]
+            amounts = amounts[~np.isnan(amounts)]
+            return {"total": float(amounts.sum()), "count": int(len(amounts))}
+
+    def count(self, filters: dict = None) -> int:
+        with self._lock:
+            return int(self.mask(filters).sum())
+
+    def top_senders(self, filters: dict = None, n: int = 5, by: str = "count"):
+        """[(sender, value)] ranked by message count or by summed amount (by="amount")."""
+        with self._lock:
+            mask = self.mask(filters)
+            codes = self.columns()["sender"][mask]
+            if by == "amount":
+                amounts = np.nan_to_num(self.columns()["amount"][mask])
+                totals = np.bincount(codes, weights=amounts, minlength=len(self.senders))
+            else:
+                totals = np.bincount(codes, minlength=len(self.senders)).astype(np.float64)
+            order = np.argsort(-totals, kind="stable")[:n]
+            return [(self.senders[c], float(totals[c])) for c in order if totals[c] > 0]
+
+    # ------------------------------------------------------
+    # PERSISTENCE
+    # ------------------------------------------------------
+    def save(self, index_dir: str, rows: int = None):
+        """Writes rows 0..rows-1 (default: every row)."""
+        try:
+            path = os.path.join(index_dir, self.FILE_NAME)
+            with self._lock:
+                arrays = {name: column[:rows].copy() for name, column in self.columns().items()}
+                arrays["senders"] = np.array(self.senders, dtype=str)
+                arrays["types"] = np.array(self.types, dtype=str)
+            with atomic_open(path) as f:
+                np.savez(f, **arrays)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def load(self, index_dir: str) -> bool:
+        """Loads saved columns; returns False if the artifact has none yet."""
+        try:
+            path = os.path.join(index_dir, self.FILE_NAME)
+            if not os.path.exists(path) or not verify_checksum(path):
+                return False
+            with self._lock:
+                self._reset()
+                with np.load(path) as data:
+                    self.timestamp = array("d", data["timestamp"].astype(np.float64).tobytes())
+                    self.amount = array("d", data["amount"].astype(np.float64).tobytes())
+                    self.action = array("b", data["action"].astype(np.int8).tobytes())
+                    self.sender = array("i", data["sender"].astype(np.int32).tobytes())
+                    self.type = array("i", data["type"].astype(np.int32).tobytes())
+                    self.source = array("b", data["source"].astype(np.int8).tobytes())
+                    self.senders = data["senders"].tolist()
+                    self.types = data["types"].tolist()
+                self._sender_codes = {v: i for i, v in enumerate(self.senders)}
+                self._type_codes = {v: i for i, v in enumerate(self.types)}
+            return True
+        except Exception as e:
+            raise Project_Exception(e, sys)
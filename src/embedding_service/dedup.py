@@ -0,0 +1,284 @@
+# embedding_service/dedup.py
+
+import hashlib
+import os
+import re
+import sys
+import threading
+from array import array
+from functools import lru_cache
+from itertools import chain
+import numpy as np
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.constants import message_pipeline
+from src.utils.preprocessor import preprocess_text
+from src.utils.atomic_io import atomic_open, verify_checksum
+
+DIGITS_REGEX = re.compile(r"\d+")
+_SHIFTS = np.arange(64, dtype=np.uint64)
+
+
+@lru_cache(maxsize=1 << 16)
+def _hash64(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash of the normalized text (preprocess_text, digit runs
+    folded to '#') over word unigrams + bigrams. Templated alerts that only
+    differ in amounts, OTPs or order numbers get identical or close hashes.
+    """
+    tokens = DIGITS_REGEX.sub("#", preprocess_text(text)).split()
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if not features:
+        return 0
+    hashes = np.fromiter((_hash64(f) for f in features), dtype=np.uint64, count=len(features))
+    votes = ((hashes[:, None] >> _SHIFTS) & np.uint64(1)).sum(axis=0) * 2 > len(features)
+    return int(np.packbits(votes, bitorder="little").view("<u8")[0])
+
+
+class NearDuplicateIndex:
+    """
+    Clusters near-duplicate rows by SimHash, one entry per vector-store row.
+
+    A row joins the cluster of the first representative whose fingerprint
+    is within `max_distance` bits, otherwise it starts a new cluster.
+    Candidates come from LSH banding: the 64 bits are cut into `bands`
+    slices and only representatives sharing a slice are compared, which
+    finds every match when bands > max_distance.
+
+    VectorStore embeds only representatives (members reuse their vectors)
+    and searches one row per cluster, attaching the other member ids.
+    On disk, next to index.faiss: dedup.npz (fingerprints + cluster ids).
+    """
+
+    FILE_NAME = "dedup.npz"
+
+    def __init__(self, bands: int = message_pipeline.DEDUP_LSH_BANDS,
+                 max_distance: int = message_pipeline.DEDUP_MAX_HAMMING):
+        self.bands = bands
+        self.max_distance = max_distance
+        self._width = 64 // bands
+        self._lock = threading.Lock()
+        self.version = 0                    # bumped whenever existing rows may change cluster
+        self._reset()
+
+    def _reset(self):
+        self.version += 1
+        self.fingerprints = array("Q")
+        self.cluster_of = array("q")        # row -> representative row
+        self._buckets = [{} for _ in range(self.bands)]
+        self._members = {}                  # representative -> every row of its cluster
+        self._snapshot = None               # cached (cluster_of, representatives) arrays
+        self._loaded = None                 # (rows by cluster, their clusters) until _buckets / _members exist
+
+    def __len__(self):
+        return len(self.cluster_of)
+
+    @property
+    def n_clusters(self) -> int:
+        return len(self._arrays()[1])
+
+    # ------------------------------------------------------
+    # BUILD / UPDATE
+    # ------------------------------------------------------
+    def _band_keys(self, fingerprint: int):
+        mask = (1 << self._width) - 1
+        return [(fingerprint >> (band * self._width)) & mask for band in range(self.bands)]
+
+    def _build_tables(self):
+        """
+        LSH buckets and member lists of a loaded index, built on the first
+        add: query processes that never add rows only need the arrays.
+        """
+        if self._loaded is None:
+            return
+        order, clusters = self._loaded
+        self._loaded = None
+        representatives, starts = np.unique(clusters, return_index=True)
+        for rep, members in zip(representatives.tolist(), np.split(order, starts[1:])):
+            self._members[rep] = array("q", members.tobytes())
+        fingerprints = np.array(self.fingerprints, dtype=np.uint64)[representatives]
+        mask = np.uint64((1 << self._width) - 1)
+        for band in range(self.bands):
+            keys = ((fingerprints >> np.uint64(band * self._width)) & mask).tolist()
+            buckets = self._buckets[band]
+            for key, rep in zip(keys, representatives.tolist()):
+                buckets.setdefault(key, []).append(rep)
+
+    def _add_row(self, fingerprint: int, rep: int = None) -> int:
+        self._build_tables()
+        row = len(self.cluster_of)
+        keys = self._band_keys(fingerprint)
+        if rep is None:
+            rep = -1
+            for band, key in enumerate(keys):
+                for candidate in self._buckets[band].get(key, ()):
+                    if bin(fingerprint ^ self.fingerprints[candidate]).count("1") <= self.max_distance:
+                        rep = candidate
+                        break
+                if rep >= 0:
+                    break
+        if rep < 0 or rep == row:
+            rep = row
+            for band, key in enumerate(keys):
+                self._buckets[band].setdefault(key, []).append(row)
+            self._members[row] = array("q")
+
+        self.fingerprints.append(fingerprint)
+        self.cluster_of.append(rep)
+        self._members[rep].append(row)
+        self._snapshot = None
+        return rep
+
+    def build(self, texts):
+        with self._lock:
+            self._reset()
+            for text in texts:
+                self._add_row(simhash(text))
+        logging.info(f"[INFO] Grouped {len(self)} messages into {self.n_clusters} near-duplicate clusters.")
+
+    def assign(self, texts, start_row: int, fingerprints=None):
+        """
+        Adds rows start_row.. and returns the representative row of each.
+        Rows at or past `start_row` left behind by a batch that never reached
+        the index are dropped first. `fingerprints` (from match()) saves
+        hashing the texts again.
+        """
+        try:
+            if fingerprints is None:
+                fingerprints = [simhash(text) for text in texts]
+            with self._lock:
+                if start_row < len(self):
+                    kept, cluster_of = self.fingerprints[:start_row], self.cluster_of[:start_row]
+                    self._reset()
+                    for fingerprint, rep in zip(kept, cluster_of):
+                        self._add_row(fingerprint, rep)
+                elif start_row > len(self):
+                    raise ValueError(f"dedup index has {len(self)} rows, cannot assign from row {start_row}")
+                return [self._add_row(fingerprint) for fingerprint in fingerprints]
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def match(self, texts, start_row: int):
+        """
+        assign() without adding anything: the representative each text would
+        get as rows start_row.., plus the fingerprints to pass to assign()
+        later. Lets a writer pick what to encode before it takes the store lock.
+        """
+        try:
+            fingerprints = [simhash(text) for text in texts]
+            batch_buckets = [{} for _ in range(self.bands)]
+            batch = {}                      # row -> fingerprint of batch rows that start a cluster
+            reps = []
+            with self._lock:
+                self._build_tables()
+                for row, fingerprint in enumerate(fingerprints, start=start_row):
+                    keys = self._band_keys(fingerprint)
+                    rep = -1
+                    for band, key in enumerate(keys):
+                        candidates = chain(
+                            ((c, self.fingerprints[c]) for c in self._buckets[band].get(key, ()) if c < start_row),
+                            ((c, batch[c]) for c in batch_buckets[band].get(key, ())),
+                        )
+                        for candidate, other in candidates:
+                            if bin(fingerprint ^ other).count("1") <= self.max_distance:
+                                rep = candidate
+                                break
+                        if rep >= 0:
+                            break
+                    if rep < 0:
+                        rep = row
+                        batch[row] = fingerprint
+                        for band, key in enumerate(keys):
+                            batch_buckets[band].setdefault(key, []).append(row)
+                    reps.append(rep)
+            return reps, fingerprints
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    # ------------------------------------------------------
+    # QUERY
+    # ------------------------------------------------------
+    def _arrays(self):
+        with self._lock:
+            if self._snapshot is None:
+                cluster_of = np.array(self.cluster_of, dtype=np.int64)
+                self._snapshot = (cluster_of, np.flatnonzero(cluster_of == np.arange(len(cluster_of))))
+            return self._snapshot
+
+    def leaders(self, eligible=None):
+        """
+        One row per cluster among `eligible` (sorted row ids, None = every
+        row): the lowest eligible id of each cluster. Returns None when
+        nothing would be collapsed.
+        """
+        cluster_of, representatives = self._arrays()
+        if eligible is None:
+            return None if len(representatives) == len(cluster_of) else representatives
+        eligible = eligible[eligible < len(cluster_of)]
+        _, first = np.unique(cluster_of[eligible], return_index=True)
+        return eligible[np.sort(first)]
+
+    def representatives(self, start: int, stop: int):
+        """Row ids in start..stop-1 that lead their cluster (rows not added yet count as leaders)."""
+        with self._lock:
+            cluster_of = np.array(self.cluster_of[start:stop], dtype=np.int64)
+        rows = np.arange(start, stop, dtype=np.int64)
+        known = len(cluster_of)
+        return np.concatenate([rows[:known][cluster_of == rows[:known]], rows[known:]])
+
+    def representative_of(self, rows):
+        """Representative row of each of `rows` (rows not added yet represent themselves)."""
+        with self._lock:
+            n = len(self.cluster_of)
+            return np.array([self.cluster_of[r] if 0 <= r < n else r for r in rows], dtype=np.int64)
+
+    def cluster(self, row: int):
+        """Every row in the cluster of `row`, representative first."""
+        with self._lock:
+            if row >= len(self.cluster_of):
+                return [row]
+            rep = self.cluster_of[row]
+            if self._loaded is None:
+                return self._members[rep].tolist()
+            order, clusters = self._loaded
+            return order[np.searchsorted(clusters, rep):np.searchsorted(clusters, rep, side="right")].tolist()
+
+    # ------------------------------------------------------
+    # PERSISTENCE
+    # ------------------------------------------------------
+    def save(self, index_dir: str, rows: int = None):
+        """Writes rows 0..rows-1 (default: every row)."""
+        try:
+            path = os.path.join(index_dir, self.FILE_NAME)
+            with self._lock:
+                fingerprints = np.array(self.fingerprints[:rows], dtype=np.uint64)
+                cluster_of = np.array(self.cluster_of[:rows], dtype=np.int64)
+            with atomic_open(path) as f:
+                np.savez(f, fingerprints=fingerprints, cluster_of=cluster_of)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def load(self, index_dir: str) -> bool:
+        """Loads saved clusters; returns False if the artifact has none yet."""
+        try:
+            path = os.path.join(index_dir, self.FILE_NAME)
+            if not os.path.exists(path) or not verify_checksum(path):
+                return False
+            with np.load(path) as data:
+                fingerprints = data["fingerprints"].astype(np.uint64)
+                cluster_of = data["cluster_of"].astype(np.int64)
+            with self._lock:
+                self._reset()
+                self.fingerprints = array("Q", fingerprints.tobytes())
+                self.cluster_of = array("q", cluster_of.tobytes())
+                # Rows grouped by cluster, lowest (representative) first: cluster() without Python tables
+                order = np.argsort(cluster_of, kind="stable")
+                self._loaded = (order, cluster_of[order])
+            return True
+        except Exception as e:
+            raise Project_Exception(e, sys)
@@ -0,0 +1,226 @@
+# embedding_service/document_store.py
+
+import json
+import math
+import os
+import sqlite3
+import sys
+import threading
+import numpy as np
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.utils.helpers import to_epoch, to_end_epoch
+
+
+class DocumentStore:
+    """
+    Message texts and metadata of a VectorStore, one SQLite row per FAISS
+    row id, so a process only holds the rows a query actually touches.
+
+    Filter columns are stored next to the JSON metadata and indexed, and
+    search filters run as SQL over them (all optional, combined with AND):
+      - "source" : "sms" / "email"          (str or list of str)
+      - "type"   : "transaction", "meeting"  (str or list of str)
+      - "sender" : SMS sender or email from  (str or list of str, case-insensitive)
+      - "start" / "end" : inclusive time range on timestamp/date
+                          (ISO string, datetime or epoch seconds); a date
+                          without a time as "end" includes that whole day
+
+    The database runs in WAL mode with separate write and read
+    connections: searches read committed rows while a writer is inserting
+    a batch, without waiting on it. On disk, next to index.faiss:
+    documents.sqlite3.
+    """
+
+    FILE_NAME = "documents.sqlite3"
+    FIELDS = ("source", "type", "sender")
+    SCAN_ROWS = 10_000          # rows per query when a caller iterates a whole column
+
+    def __init__(self, index_dir: str):
+        try:
+            self.path = os.path.join(index_dir, self.FILE_NAME)
+            self._lock = threading.Lock()
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "id INTEGER PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL, "
+                "source TEXT, type TEXT, sender TEXT, ts REAL)"
+            )
+            for column in self.FIELDS + ("ts",):
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS documents_{column} ON documents({column})")
+            self._conn.commit()
+            self._rows = self._conn.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM documents").fetchone()[0]
+
+            self._read_lock = threading.Lock()
+            self._reader = sqlite3.connect(self.path, check_same_thread=False)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def __len__(self):
+        return self._rows
+
+    @staticmethod
+    def _filter_columns(meta: dict):
+        sender = meta.get("sender") if meta.get("source") == "sms" else meta.get("from")
+        ts = to_epoch(meta.get("timestamp") or meta.get("date"))
+        return ((meta.get("source") or "").lower(), (meta.get("type") or "").lower(),
+                (sender or "").lower(), None if math.isnan(ts) else ts)
+
+    # ------------------------------------------------------
+    # WRITE
+    # ------------------------------------------------------
+    def _insert(self, start: int, texts, metas):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((start + i, text, json.dumps(meta, ensure_ascii=False)) + self._filter_columns(meta)
+             for i, (text, meta) in enumerate(zip(texts, metas)))
+        )
+        self._rows = max(self._rows, start + len(texts))
+
+    def replace(self, texts, metas):
+        """Replaces every row with texts / metas (a full save)."""
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM documents")
+                self._rows = 0
+                self._insert(0, texts, metas)
+                self._conn.commit()
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def append(self, texts, metas, start: int = None):
+        """Writes rows start.. (default: after the last row), overwriting any already there."""
+        try:
+            with self._lock:
+                self._insert(self._rows if start is None else start, texts, metas)
+                self._conn.commit()
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def truncate(self, rows: int):
+        """Drops rows past `rows`, e.g. ones written for a batch the index never got."""
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM documents WHERE id >= ?", (rows,))
+                self._conn.commit()
+                self._rows = min(self._rows, rows)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def import_json(self, messages_path: str, metadata_path: str):
+        """One-time migration of an artifact saved as messages.json / metadata.json."""
+        try:
+            with open(messages_path, "r", encoding="utf-8") as f:
+                texts = json.load(f)
+            with open(metadata_path, "r", encoding="utf-8") as f:
+                metas = json.load(f)
+            self.replace(texts, metas)
+            logging.info(f"[INFO] Imported {len(texts)} messages from {messages_path} into {self.path}")
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def checkpoint(self):
+        """Folds the SQLite WAL back into the main file (run after a compaction)."""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    # ------------------------------------------------------
+    # READ
+    # ------------------------------------------------------
+    def fetch(self, ids):
+        """{id: (text, metadata)} for the given row ids, in one query."""
+        try:
+            with self._read_lock:
+                rows = self._reader.execute(
+                    "SELECT id, text, metadata FROM documents WHERE id IN (SELECT value FROM json_each(?))",
+                    (json.dumps([int(i) for i in ids]),)
+                ).fetchall()
+            return {row_id: (text, json.loads(meta)) for row_id, text, meta in rows}
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def column(self, name: str, start: int, stop: int):
+        """Values of column "text" or "metadata" for rows start..stop-1, in row order."""
+        try:
+            if name not in ("text", "metadata"):
+                raise ValueError(f"unknown document column '{name}'")
+            with self._read_lock:
+                rows = self._reader.execute(
+                    f"SELECT {name} FROM documents WHERE id >= ? AND id < ? ORDER BY id", (start, stop)
+                ).fetchall()
+            return [value if name == "text" else json.loads(value) for value, in rows]
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def eligible_ids(self, filters: dict):
+        """
+        Sorted int64 row ids matching every filter, or None when no filter
+        applies (meaning every row is eligible).
+        """
+        try:
+            if not filters:
+                return None
+
+            clauses, params = [], []
+            for field in self.FIELDS:
+                if filters.get(field) is None:
+                    continue
+                values = filters[field]
+                values = [values] if isinstance(values, str) else list(values)
+                clauses.append(f"{field} IN ({', '.join('?' * len(values))})" if values else "0")
+                params.extend(str(v).lower() for v in values)
+            if filters.get("start") is not None:
+                clauses.append("ts >= ?")
+                params.append(to_epoch(filters["start"]))
+            if filters.get("end") is not None:
+                end, inclusive = to_end_epoch(filters["end"])
+                clauses.append("ts <= ?" if inclusive else "ts < ?")
+                params.append(end)
+            if not clauses:
+                return None
+
+            with self._read_lock:
+                rows = self._reader.execute(
+                    f"SELECT id FROM documents WHERE id < ? AND {' AND '.join(clauses)} ORDER BY id",
+                    [self._rows] + params
+                ).fetchall()
+            return np.fromiter((row_id for row_id, in rows), dtype=np.int64, count=len(rows))
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def close(self):
+        with self._lock, self._read_lock:
+            self._conn.close()
+            self._reader.close()
+
+
+class DocumentColumn:
+    """
+    Read-only list view of one DocumentStore column ("text" / "metadata"):
+    len(), indexing, slicing and iteration, each served from SQLite.
+    """
+
+    def __init__(self, store: DocumentStore, name: str):
+        self.store = store
+        self.name = name
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return [self[row] for row in range(start, stop, step)]
+            return self.store.column(self.name, start, stop)
+        row = key + len(self) if key < 0 else key
+        if not 0 <= row < len(self):
+            raise IndexError(f"document row {key} out of range")
+        return self.store.column(self.name, row, row + 1)[0]
+
+    def __iter__(self):
+        for start in range(0, len(self), self.store.SCAN_ROWS):
+            yield from self.store.column(self.name, start, min(start + self.store.SCAN_ROWS, len(self)))
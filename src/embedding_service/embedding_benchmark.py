@@ -0,0 +1,113 @@
+# embedding_service/embedding_benchmark.py
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import numpy as np
+import faiss
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.embedding_service.embedding_generator import EmbeddingGenerator
+from src.embedding_service.index_benchmark import recall_at_k
+
+
+def _normalized(vectors):
+    vectors = np.ascontiguousarray(vectors, dtype="float32").copy()
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def benchmark_backends(texts, queries, backends=("torch", "onnx", "onnx_int8"),
+                       model_name="sentence-transformers/all-MiniLM-L6-v2", batch_size=64, top_k=10):
+    """
+    Encodes the same corpus and queries with every backend.
+
+    Returns one row per backend with bulk throughput, single-query p50/p99
+    latency, and agreement with the first backend: mean / min cosine of the
+    corpus vectors and recall@k of each query's top-k neighbours.
+    """
+    try:
+        rows = []
+        reference = None
+        for backend in backends:
+            generator = EmbeddingGenerator(model_name, use_cache=False, backend=backend)
+            generator.generate_embeddings(texts[:batch_size], batch_size=batch_size, show_progress_bar=False)  # warm-up
+
+            started = time.perf_counter()
+            corpus = generator.generate_embeddings(texts, batch_size=batch_size, show_progress_bar=False)
+            bulk_seconds = time.perf_counter() - started
+
+            latencies = []
+            for query in queries:
+                t0 = time.perf_counter()
+                generator.generate_embeddings([query], show_progress_bar=False)
+                latencies.append((time.perf_counter() - t0) * 1000)
+            query_vectors = generator.generate_embeddings(queries, batch_size=batch_size, show_progress_bar=False)
+
+            corpus, query_vectors = _normalized(corpus), _normalized(query_vectors)
+            index = faiss.IndexFlatIP(corpus.shape[1])
+            index.add(corpus)
+            _, neighbours = index.search(query_vectors, top_k)
+            if reference is None:
+                reference = (corpus, neighbours)
+            cosines = (corpus * reference[0]).sum(axis=1)
+
+            rows.append({
+                "backend": backend,
+                "texts_per_s": len(texts) / bulk_seconds,
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p99_ms": float(np.percentile(latencies, 99)),
+                "mean_cosine": float(cosines.mean()),
+                "min_cosine": float(cosines.min()),
+                f"recall@{top_k}": recall_at_k(neighbours, reference[1], top_k),
+            })
+            logging.info(f"[INFO] Benchmarked {backend} embedding backend: {rows[-1]}")
+        return rows
+    except Exception as e:
+        raise Project_Exception(e, sys)
+
+
+def print_report(rows, top_k):
+    header = f"{'backend':<10} {'texts/s':>9} {'p50_ms':>8} {'p99_ms':>8} {'mean_cos':>9} {'min_cos':>8} {'recall@' + str(top_k):>10}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(f"{r['backend']:<10} {r['texts_per_s']:>9.1f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['mean_cosine']:>9.4f} {r['min_cosine']:>8.4f} {r[f'recall@{top_k}']:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput / latency / agreement benchmark for embedding backends")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2",
+                        help="local model directory or a model already in the local Hugging Face cache")
+    parser.add_argument("--messages", help="JSON list of message texts (default: built-in sample texts)")
+    parser.add_argument("--size", type=int, default=2000, help="corpus size when using sample texts")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx_int8"])
+    args = parser.parse_args()
+
+    if args.messages and os.path.exists(args.messages):
+        with open(args.messages, "r", encoding="utf-8") as f:
+            corpus_texts = json.load(f)
+    else:
+        rng = random.Random(0)
+        senders = ["HDFC Bank", "Google Pay", "Amazon", "Swiggy", "HR Team", "BookMyShow"]
+        templates = [
+            "SMS from {s}: Rs. {n} debited from your account for order {n}.",
+            "SMS from {s}: Your order {n} has been delivered. Rate your experience.",
+            "Email from {s} about 'Weekly review': The meeting is moved to {n} pm tomorrow, please confirm.",
+            "Email from {s} about 'Offer letter': Congratulations, you are selected. Onboarding on {n} December.",
+            "SMS from {s}: Payment of Rs. {n} to Rajesh for dinner was successful. Ref ID: GP{n}.",
+        ]
+        corpus_texts = [rng.choice(templates).format(s=rng.choice(senders), n=rng.randint(1, 99999))
+                        for _ in range(args.size)]
+
+    query_texts = random.Random(1).sample(corpus_texts, min(args.queries, len(corpus_texts)))
+    report = benchmark_backends(corpus_texts, query_texts, args.backends, args.model, args.batch_size, args.top_k)
+    print_report(report, args.top_k)
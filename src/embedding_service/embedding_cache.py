@@ -0,0 +1,266 @@
+# embedding_service/embedding_cache.py
+
+import atexit
+import glob
+import hashlib
+import os
+import sys
+import threading
+import weakref
+import numpy as np
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.utils.atomic_io import atomic_open, verify_checksum
+from src.constants import message_pipeline
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by (model name, normalized text hash).
+
+    Each model gets its own <cache_dir>/<model>/cache.npz holding three arrays:
+      - keys    : 16-byte blake2b digests of the normalized text (uint8 rows)
+      - vectors : float32 embeddings aligned with keys
+      - ticks   : last-use counters, used to evict the least recently used
+                  rows once the cache grows past `max_entries`
+
+    New rows are appended every `flush_every` rows to a small segment file
+    (cache.seg-<n>.npz, same three arrays) instead of rewriting cache.npz,
+    so writes during ingestion stay linear in the rows added. save() folds
+    the segments into cache.npz once, at exit (or on close()).
+
+    put() evicts down to EMBEDDING_CACHE_EVICT_TO of `max_entries` as soon as
+    the cache grows past it. Hits only refresh ticks in memory; when nothing
+    else changed, save() writes them to the small cache.ticks.npy instead of
+    rewriting cache.npz.
+    """
+
+    def __init__(self, model_name: str,
+                 cache_dir: str = os.path.join(message_pipeline.ARTIFACT_DIR_NAME,
+                                               message_pipeline.EMBEDDING_CACHE_DIR_NAME),
+                 max_entries: int = message_pipeline.EMBEDDING_CACHE_MAX_ENTRIES,
+                 flush_every: int = message_pipeline.EMBEDDING_CACHE_FLUSH_EVERY):
+        try:
+            self.model_name = model_name
+            self.max_entries = max_entries
+            self.flush_every = flush_every
+            self.path = os.path.join(cache_dir, model_name.replace("/", "__"), "cache.npz")
+
+            self._lock = threading.Lock()
+            self._rows = {}             # digest -> row id
+            self._vectors = None        # rows loaded from disk
+            self._ticks = np.zeros(0, dtype=np.int64)
+            self._new_vectors = []      # rows added since the last save
+            self._new_ticks = []
+            self._segmented = 0         # leading rows of _new_vectors already in a segment file
+            self._tick = 0
+            self._dirty = False         # rows added or evicted since cache.npz was written
+            self._ticks_dirty = False   # ticks refreshed by hits since they were written
+
+            self.hits = 0
+            self.misses = 0
+
+            self._load()
+            # Weak: the exit hook must not keep every cache (and its vectors) alive
+            self._exit_hook = lambda ref=weakref.ref(self): ref() is not None and ref().save()
+            atexit.register(self._exit_hook)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def close(self):
+        """Saves the cache and drops its exit hook."""
+        self.save()
+        atexit.unregister(self._exit_hook)
+
+    # ------------------------------------------------------
+    # KEYS
+    # ------------------------------------------------------
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Whitespace-only normalization so the cached vector matches what the model would see."""
+        return " ".join(str(text).split())
+
+    def key(self, text: str) -> bytes:
+        return hashlib.blake2b(self.normalize(text).encode("utf-8"), digest_size=16).digest()
+
+    # ------------------------------------------------------
+    # LOAD / SAVE
+    # ------------------------------------------------------
+    @property
+    def ticks_path(self):
+        return self.path[:-len(".npz")] + ".ticks.npy"
+
+    def _segment_paths(self):
+        segments = glob.glob(self.path[:-len(".npz")] + ".seg-*.npz")
+        return sorted(segments, key=lambda path: int(path.rsplit("-", 1)[1][:-len(".npz")]))
+
+    def _load(self):
+        keys, vectors, ticks = [], [], []
+        paths = ([self.path] if os.path.exists(self.path) else []) + self._segment_paths()
+        for path in paths:
+            if not verify_checksum(path):
+                continue
+            with np.load(path) as data:
+                keys.append(data["keys"])
+                vectors.append(data["vectors"])
+                ticks.append(data["ticks"])
+        if not keys:
+            return
+        if paths[0] == self.path and os.path.exists(self.ticks_path) and verify_checksum(self.ticks_path):
+            # Ticks of cache.npz refreshed after it was written
+            saved = np.load(self.ticks_path)
+            if len(saved) == len(ticks[0]):
+                ticks[0] = np.maximum(ticks[0], saved)
+
+        # A segment already folded into cache.npz (crash before it was deleted) repeats its keys
+        keys = np.concatenate(keys)
+        _, first = np.unique(keys, axis=0, return_index=True)
+        first = np.sort(first)
+        keys = keys[first]
+        self._vectors = np.concatenate(vectors)[first]
+        self._ticks = np.concatenate(ticks)[first]
+        self._rows = {k.tobytes(): i for i, k in enumerate(keys)}
+        self._tick = int(self._ticks.max()) if len(self._ticks) else 0
+        self._dirty = len(paths) > 1
+        if len(self._rows) > self.max_entries:
+            self._evict()
+        logging.info(f"[INFO] Loaded {len(self._rows)} cached embeddings from {self.path} "
+                     f"and {len(paths) - 1} segment(s)")
+
+    def _flush_segment(self):
+        """Appends the rows added since the last segment as a new segment file (lock held)."""
+        new_keys = [b""] * (len(self._new_vectors) - self._segmented)
+        n_loaded = len(self._ticks)
+        for k, i in self._rows.items():
+            if i >= n_loaded + self._segmented:
+                new_keys[i - n_loaded - self._segmented] = k
+        segments = self._segment_paths()
+        number = int(segments[-1].rsplit("-", 1)[1][:-len(".npz")]) + 1 if segments else 0
+        path = self.path[:-len(".npz")] + f".seg-{number}.npz"
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with atomic_open(path) as f:
+            np.savez(f, keys=np.frombuffer(b"".join(new_keys), dtype=np.uint8).reshape(-1, 16),
+                     vectors=np.vstack(self._new_vectors[self._segmented:]).astype(np.float32),
+                     ticks=np.asarray(self._new_ticks[self._segmented:], dtype=np.int64))
+        self._segmented = len(self._new_vectors)
+
+    def _merged(self):
+        """(keys, vectors, ticks) of every row, loaded and new, in row order (lock held)."""
+        ordered = [b""] * len(self._rows)
+        for k, i in self._rows.items():
+            ordered[i] = k
+        keys = np.frombuffer(b"".join(ordered), dtype=np.uint8).reshape(-1, 16)
+        parts = ([self._vectors] if self._vectors is not None else []) + self._new_vectors
+        vectors = np.vstack(parts).astype(np.float32)
+        ticks = np.concatenate([self._ticks, np.asarray(self._new_ticks, dtype=np.int64)])
+        return keys, vectors, ticks
+
+    def _replace_rows(self, keys, vectors, ticks):
+        self._rows = {k.tobytes(): i for i, k in enumerate(keys)}
+        self._vectors = vectors
+        self._ticks = ticks
+        self._new_vectors = []
+        self._new_ticks = []
+        self._segmented = 0
+
+    def _evict(self):
+        """Drops least recently used rows down to EMBEDDING_CACHE_EVICT_TO of max_entries (lock held)."""
+        if len(self._new_vectors) > self._segmented:
+            self._flush_segment()
+        keys, vectors, ticks = self._merged()
+        n_keep = int(self.max_entries * message_pipeline.EMBEDDING_CACHE_EVICT_TO)
+        keep = np.sort(np.argpartition(ticks, -n_keep)[-n_keep:])
+        logging.info(f"[INFO] Evicting {len(keys) - len(keep)} least recently used cached embeddings.")
+        self._replace_rows(keys[keep], vectors[keep], ticks[keep])
+        self._dirty = True
+
+    def save(self):
+        """
+        Folds everything into cache.npz via temp file + rename, then drops
+        the segment files. When only ticks changed, writes cache.ticks.npy.
+        Runs at exit; call it directly after a long ingestion.
+        """
+        try:
+            with self._lock:
+                if not self._dirty:
+                    if self._ticks_dirty and len(self._ticks):
+                        with atomic_open(self.ticks_path) as f:
+                            np.save(f, self._ticks)
+                        self._ticks_dirty = False
+                    return
+
+                keys, vectors, ticks = self._merged()
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                # Stale ticks must never be paired with the new cache.npz
+                for path in (self.ticks_path, self.ticks_path + message_pipeline.ARTIFACT_CHECKSUM_SUFFIX):
+                    if os.path.exists(path):
+                        os.remove(path)
+                with atomic_open(self.path) as f:
+                    np.savez(f, keys=keys, vectors=vectors, ticks=ticks)
+                for path in self._segment_paths():
+                    os.remove(path)
+                    if os.path.exists(path + message_pipeline.ARTIFACT_CHECKSUM_SUFFIX):
+                        os.remove(path + message_pipeline.ARTIFACT_CHECKSUM_SUFFIX)
+
+                self._replace_rows(keys, vectors, ticks)
+                self._dirty = False
+                self._ticks_dirty = False
+                logging.info(f"[INFO] Saved {len(keys)} cached embeddings to {self.path}")
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    # ------------------------------------------------------
+    # LOOKUP / INSERT
+    # ------------------------------------------------------
+    def lookup(self, keys):
+        """
+        Returns a list aligned with `keys` holding the cached vector for every
+        hit and None for every miss.
+        """
+        try:
+            with self._lock:
+                self._tick += 1
+                n_loaded = len(self._ticks)
+                found = []
+                for k in keys:
+                    row = self._rows.get(k)
+                    if row is None:
+                        found.append(None)
+                    elif row < n_loaded:
+                        self._ticks[row] = self._tick
+                        found.append(self._vectors[row])
+                    else:
+                        self._new_ticks[row - n_loaded] = self._tick
+                        found.append(self._new_vectors[row - n_loaded][0])
+
+                n_hits = sum(v is not None for v in found)
+                self.hits += n_hits
+                self.misses += len(keys) - n_hits
+                self._ticks_dirty = self._ticks_dirty or n_hits > 0
+                return found
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def put(self, keys, vectors):
+        """
+        Adds freshly encoded vectors; appends them to a segment file every
+        `flush_every` new rows and evicts once over `max_entries`.
+        """
+        try:
+            with self._lock:
+                vectors = np.asarray(vectors, dtype=np.float32)
+                for k, vector in zip(keys, vectors):
+                    if k in self._rows:
+                        continue
+                    self._rows[k] = len(self._ticks) + len(self._new_vectors)
+                    self._new_vectors.append(vector[None, :])
+                    self._new_ticks.append(self._tick)
+                    self._dirty = True
+                if len(self._rows) > self.max_entries:
+                    self._evict()
+                elif len(self._new_vectors) - self._segmented >= self.flush_every:
+                    self._flush_segment()
+        except Exception as e:
+            raise Project_Exception(e, sys)
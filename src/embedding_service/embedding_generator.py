@@ -1,26 +1,177 @@
 # embedding_service/embedding_generator.py
 
 import os
+import re
 import numpy as np
 import sys
-from sentence_transformers import SentenceTransformer
 
 from src.exception.exception import Project_Exception
 from src.logging.logger import logging
+from src.constants import message_pipeline
+from src.embedding_service.embedding_cache import EmbeddingCache
+
+
+def padding_waste(lengths, batch_size):
+    """Share of token slots that are padding when `lengths` are batched in this order."""
+    lengths = np.asarray(lengths)
+    padded = sum(int(lengths[i:i + batch_size].max()) * len(lengths[i:i + batch_size])
+                 for i in range(0, len(lengths), batch_size))
+    return 1.0 - lengths.sum() / max(padded, 1)
+
 
 class EmbeddingGenerator:
     try:
 
-        def __init__(self, model_name="sentence-transformers/all-MiniLM-L6-v2"):
+        def __init__(self, model_name="sentence-transformers/all-MiniLM-L6-v2", use_cache=True,
+                     backend=message_pipeline.EMBEDDING_BACKEND):
+            """
+            backend: "torch" (SentenceTransformer, fp32), "onnx" (ONNX Runtime, fp32)
+            or "onnx_int8" (ONNX Runtime, dynamically quantized int8 weights).
+            """
             logging.info("[INFO] Loading embedding model...")
-            logging.info(f"loading {model_name} ")
-            self.model = SentenceTransformer(model_name)
+            logging.info(f"loading {model_name} ({backend} backend)")
+            self.model_name = model_name
+            self.backend = backend
+            if backend == "torch":
+                from sentence_transformers import SentenceTransformer
+                self.model = SentenceTransformer(model_name)
+            elif backend in ("onnx", "onnx_int8"):
+                from src.embedding_service.onnx_backend import OnnxEmbeddingBackend
+                self.model = OnnxEmbeddingBackend(model_name, quantize=backend == "onnx_int8")
+            else:
+                raise ValueError(f"Unknown embedding backend '{backend}'")
+            # Persistent (model, text hash) -> vector cache shared across artifact runs;
+            # backends give slightly different vectors, so each keeps its own
+            cache_name = model_name if backend == "torch" else f"{model_name}@{backend}"
+            self.cache = EmbeddingCache(cache_name) if use_cache else None
+
+            # Both backends expose their Hugging Face tokenizer; it drives bucketing and chunking
+            self.tokenizer = getattr(self.model, "tokenizer", None)
+            self.max_seq_length = (getattr(self.model, "max_seq_length", None)
+                                   or getattr(self.model, "max_length", None)
+                                   or message_pipeline.EMBEDDING_MAX_SEQ_LENGTH)
+
+        def _token_lengths(self, texts):
+            """Token count of each text (special tokens included), or its word count without a tokenizer."""
+            if self.tokenizer is None:
+                return [len(text.split()) for text in texts]
+            ids = self.tokenizer(list(texts), add_special_tokens=True, truncation=False, verbose=False)["input_ids"]
+            return [len(i) for i in ids]
+
+        def _token_spans(self, texts):
+            """(start, end) character offsets of every token of every text, without special tokens."""
+            if self.tokenizer is not None and getattr(self.tokenizer, "is_fast", False):
+                return self.tokenizer(list(texts), add_special_tokens=False, return_offsets_mapping=True,
+                                      verbose=False)["offset_mapping"]
+            return [[m.span() for m in re.finditer(r"\S+", text)] for text in texts]
+
+        def _encode(self, texts, batch_size, show_progress_bar):
+            """
+            Encodes texts sorted by token length so each batch pads to about
+            the same length, then scatters the vectors back to input order.
+            """
+            if len(texts) <= 1:
+                embeddings = self.model.encode(texts, batch_size=batch_size, show_progress_bar=show_progress_bar)
+                return np.asarray(embeddings, dtype=np.float32)
+
+            lengths = np.minimum(self._token_lengths(texts), self.max_seq_length)
+            order = np.argsort(lengths, kind="stable")
+            embeddings = self.model.encode([texts[i] for i in order], batch_size=batch_size,
+                                           show_progress_bar=show_progress_bar)
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            restored = np.empty_like(embeddings)
+            restored[order] = embeddings
+
+            if len(texts) > batch_size:
+                logging.info(
+                    f"[INFO] Length bucketing: padding {padding_waste(lengths, batch_size):.1%} -> "
+                    f"{padding_waste(lengths[order], batch_size):.1%} of token slots."
+                )
+            return restored
 
-        def generate_embeddings(self, texts):
-            """Convert list of texts to embeddings"""
+        def chunk_text(self, text, spans=None, overlap=message_pipeline.EMBEDDING_CHUNK_OVERLAP):
+            """
+            Splits a text longer than the model window into overlapping token
+            windows. Every chunk repeats the "SMS from ...:" / "Email from ...
+            about '...':" header so it stays attributable on its own; the first
+            chunk is what truncation used to keep. Short texts return [text].
+            """
+            spans = self._token_spans([text])[0] if spans is None else spans
+            window = self.max_seq_length - 2            # room for [CLS] / [SEP]
+            if len(spans) <= window:
+                return [text]
+
+            cut = text.find(": ")
+            header_end = cut + 2 if cut >= 0 else 0
+            body = [span for span in spans if span[0] >= header_end]
+            size = window - (len(spans) - len(body))
+            if size < window // 2:                      # header too long to repeat
+                header_end, body, size = 0, spans, window
+
+            header = text[:header_end]
+            step = size - min(overlap, size // 2)
+            chunks = []
+            for start in range(0, len(body), step):
+                piece = body[start:start + size]
+                chunks.append(header + text[piece[0][0]:piece[-1][1]])
+                if start + size >= len(body):
+                    break
+            return chunks
+
+        def generate_embeddings(self, texts, batch_size=message_pipeline.EMBEDDING_BATCH_SIZE, show_progress_bar=True,
+                                cache=True):
+            """
+            Convert list of texts to embeddings. Queries pass cache=False: they
+            rarely repeat verbatim and would only grow the on-disk cache.
+            """
             logging.info(f"[INFO] Generating embeddings for {len(texts)} texts...")
-            embeddings = self.model.encode(texts, show_progress_bar=True)
-            return np.array(embeddings)
+            if self.cache is None or not cache or not texts:
+                return self._encode(texts, batch_size, show_progress_bar)
+
+            # Only cache misses go through the model; duplicates inside the batch are encoded once
+            keys = [self.cache.key(text) for text in texts]
+            found = self.cache.lookup(keys)
+            missing = {}
+            for text, key, vector in zip(texts, keys, found):
+                if vector is None and key not in missing:
+                    missing[key] = text
+
+            if missing:
+                encoded = self._encode(list(missing.values()), batch_size, show_progress_bar)
+                self.cache.put(list(missing.keys()), encoded)
+                fresh = dict(zip(missing.keys(), encoded))
+                found = [fresh[key] if vector is None else vector for key, vector in zip(keys, found)]
+
+            logging.info(f"[INFO] Embedding cache: {len(texts) - len(missing)} served from cache, {len(missing)} encoded.")
+            return np.vstack(found).astype(np.float32)
+
+        def generate_chunked_embeddings(self, texts, batch_size=message_pipeline.EMBEDDING_BATCH_SIZE,
+                                        show_progress_bar=True):
+            """
+            generate_embeddings for documents that may not fit the model window.
+
+            Returns (embeddings, chunk_embeddings, chunk_parents): one vector
+            per text (its first chunk), one vector per further chunk of long
+            texts, and for each of those the position of its text in `texts`.
+            """
+            texts = list(texts)
+            spans = self._token_spans(texts) if message_pipeline.EMBEDDING_CHUNK_LONG_TEXTS and texts else None
+            pieces, first, parents = [], [], []
+            for i, text in enumerate(texts):
+                chunks = self.chunk_text(text, spans[i]) if spans is not None else [text]
+                first.append(len(pieces))
+                pieces.extend(chunks)
+                parents.extend([i] * len(chunks))
+
+            vectors = self.generate_embeddings(pieces, batch_size, show_progress_bar)
+            if not texts:
+                return vectors, vectors[:0], np.empty(0, dtype=np.int64)
+            extra = np.ones(len(pieces), dtype=bool)
+            extra[first] = False
+            if extra.any():
+                logging.info(f"[INFO] Split {len(set(np.asarray(parents)[extra].tolist()))} long texts "
+                             f"into {int(extra.sum())} extra chunk vectors.")
+            return vectors[first], vectors[extra], np.asarray(parents, dtype=np.int64)[extra]
         
     except Exception as e:
         raise Project_Exception(e,sys)
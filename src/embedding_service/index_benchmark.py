@@ -0,0 +1,177 @@
+# embedding_service/index_benchmark.py
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import faiss
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.entity.config_entity import VectorIndexConfig
+from src.embedding_service.index_factory import build_faiss_index, rescore_candidates
+
+
+def recall_at_k(found, truth, k):
+    """Mean fraction of the exact top-k neighbours that the approximate index returned."""
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def benchmark_index_types(corpus, queries, index_types=("flat", "ivf_flat", "ivf_pq", "hnsw"), top_k=10):
+    """
+    Builds every index type over `corpus` and compares it with an exact flat
+    index on held-out `queries`.
+
+    Returns one row per index type with build time, serialized size,
+    recall@k against the flat baseline and p50/p99 single-query latency.
+    """
+    try:
+        corpus = np.ascontiguousarray(corpus, dtype="float32")
+        queries = np.ascontiguousarray(queries, dtype="float32")
+
+        exact = faiss.IndexFlatL2(corpus.shape[1])
+        exact.add(corpus)
+        _, truth = exact.search(queries, top_k)
+
+        rows = []
+        for index_type in index_types:
+            started = time.perf_counter()
+            index, spec = build_faiss_index(corpus, VectorIndexConfig(index_type))
+            build_seconds = time.perf_counter() - started
+
+            latencies = []
+            found = []
+            for query in queries:
+                t0 = time.perf_counter()
+                _, ids = index.search(query[None, :], top_k)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                found.append(ids[0])
+
+            rows.append({
+                "index_type": index_type,
+                "factory": spec["factory"],
+                "build_s": build_seconds,
+                "size_mb": faiss.serialize_index(index).nbytes / 1e6,
+                f"recall@{top_k}": recall_at_k(found, truth, top_k),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p99_ms": float(np.percentile(latencies, 99)),
+            })
+            logging.info(f"[INFO] Benchmarked {spec['factory']}: {rows[-1]}")
+        return rows
+    except Exception as e:
+        raise Project_Exception(e, sys)
+
+
+def benchmark_storage(corpus, queries, storages=("float32", "float16", "int8"), index_type="flat",
+                      top_k=10, rescore_factor=None):
+    """
+    Compares vector storage formats of one index type against exact search.
+
+    Returns one row per storage with the index's in-memory size, the disk
+    footprint (index + the fp32 embeddings.npy kept for rescoring), recall@k
+    of the compressed scan alone and after exact rescoring of
+    top_k * rescore_factor candidates, and p50/p99 latency of the
+    two-stage search.
+    """
+    try:
+        corpus = np.ascontiguousarray(corpus, dtype="float32")
+        queries = np.ascontiguousarray(queries, dtype="float32")
+
+        exact = faiss.IndexFlatL2(corpus.shape[1])
+        exact.add(corpus)
+        _, truth = exact.search(queries, top_k)
+
+        rows = []
+        for storage in storages:
+            config = VectorIndexConfig(index_type, storage)
+            if rescore_factor is not None:
+                config.rescore_factor = rescore_factor
+            index, spec = build_faiss_index(corpus, config)
+            factor = spec["rescore_factor"]
+            index_bytes = faiss.serialize_index(index).nbytes
+
+            latencies, raw, rescored = [], [], []
+            for query in queries:
+                t0 = time.perf_counter()
+                _, ids = index.search(query[None, :], top_k * max(factor, 1))
+                if factor:
+                    _, best = rescore_candidates(query[None, :], ids, lambda rows: corpus[rows], top_k)
+                else:
+                    best = ids
+                latencies.append((time.perf_counter() - t0) * 1000)
+                raw.append(ids[0][:top_k])
+                rescored.append(best[0])
+
+            rows.append({
+                "storage": storage,
+                "factory": spec["factory"],
+                "index_mb": index_bytes / 1e6,
+                "disk_mb": (index_bytes + (corpus.nbytes if factor else 0)) / 1e6,
+                f"recall@{top_k}": recall_at_k(raw, truth, top_k),
+                f"rescored@{top_k}": recall_at_k(rescored, truth, top_k),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p99_ms": float(np.percentile(latencies, 99)),
+            })
+            logging.info(f"[INFO] Benchmarked {storage} storage: {rows[-1]}")
+        return rows
+    except Exception as e:
+        raise Project_Exception(e, sys)
+
+
+def synthetic_corpus(n_vectors, dim, n_clusters=256, seed=0):
+    """Clustered, L2-normalized random vectors that roughly mimic sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype("float32")
+    data = centers[rng.integers(0, n_clusters, n_vectors)] + 0.3 * rng.standard_normal((n_vectors, dim)).astype("float32")
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return data
+
+
+def print_report(rows, top_k):
+    header = f"{'index':<10} {'factory':<22} {'build_s':>8} {'size_mb':>9} {'recall@' + str(top_k):>10} {'p50_ms':>8} {'p99_ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(f"{r['index_type']:<10} {r['factory']:<22} {r['build_s']:>8.2f} {r['size_mb']:>9.1f} "
+              f"{r[f'recall@{top_k}']:>10.3f} {r['p50_ms']:>8.3f} {r['p99_ms']:>8.3f}")
+
+
+def print_storage_report(rows, top_k):
+    header = (f"{'storage':<8} {'factory':<14} {'index_mb':>9} {'disk_mb':>9} {'recall@' + str(top_k):>10} "
+              f"{'rescored':>9} {'p50_ms':>8} {'p99_ms':>8}")
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(f"{r['storage']:<8} {r['factory']:<14} {r['index_mb']:>9.1f} {r['disk_mb']:>9.1f} "
+              f"{r[f'recall@{top_k}']:>10.3f} {r[f'rescored@{top_k}']:>9.3f} {r['p50_ms']:>8.3f} {r['p99_ms']:>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall / latency benchmark for VectorStore index types")
+    parser.add_argument("--embeddings", help="embeddings.npy from an artifact dir (default: synthetic corpus)")
+    parser.add_argument("--size", type=int, default=100_000, help="synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384, help="synthetic vector dimension")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=["flat", "ivf_flat", "ivf_pq", "hnsw"],
+                        help="index types or FAISS factory strings")
+    parser.add_argument("--storage", nargs="+", choices=["float32", "float16", "int8"],
+                        help="compare vector storage formats of the first --types entry instead")
+    parser.add_argument("--rescore-factor", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.embeddings and os.path.exists(args.embeddings):
+        data = np.load(args.embeddings).astype("float32")
+    else:
+        data = synthetic_corpus(args.size + args.queries, args.dim)
+
+    # Hold the queries out of the indexed corpus
+    corpus, queries = data[:-args.queries], data[-args.queries:]
+    if args.storage:
+        report = benchmark_storage(corpus, queries, args.storage, args.types[0], args.top_k, args.rescore_factor)
+        print_storage_report(report, args.top_k)
+    else:
+        report = benchmark_index_types(corpus, queries, args.types, args.top_k)
+        print_report(report, args.top_k)
@@ -0,0 +1,186 @@
+# embedding_service/index_factory.py
+
+import json
+import os
+import sys
+import numpy as np
+import faiss
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.utils.atomic_io import write_json_atomic, verify_checksum
+from src.constants import message_pipeline
+from src.entity.config_entity import VectorIndexConfig
+
+
+# ------------------------------------------------------
+# FACTORY STRINGS
+# ------------------------------------------------------
+def _pq_subquantizers(dim: int, requested: int) -> int:
+    """Largest divisor of `dim` that is <= `requested` (PQ needs dim % m == 0)."""
+    for m in range(min(requested, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+STORAGE_CODECS = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8"}
+
+
+def factory_string(config: VectorIndexConfig, dim: int, n_vectors: int) -> str:
+    """
+    Maps the configured index type and vector storage to a FAISS
+    index_factory string. nlist is capped so every IVF centroid gets enough
+    training points. float16 / int8 storage swaps the flat codes for a
+    scalar quantizer (int8 learns a min / max per dimension); ivf_pq and
+    raw factory strings bring their own codes.
+    """
+    index_type = config.index_type.lower()
+    nlist = max(1, min(config.nlist, n_vectors // 39))
+    codec = STORAGE_CODECS[getattr(config, "storage", "float32")]
+
+    if index_type == "flat":
+        return codec
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},{codec}"
+    if index_type == "ivf_pq":
+        return f"IVF{nlist},PQ{_pq_subquantizers(dim, config.pq_m)}x{config.pq_nbits}"
+    if index_type == "hnsw":
+        return f"HNSW{config.hnsw_m}" if codec == "Flat" else f"HNSW{config.hnsw_m}_{codec}"
+    # Anything else is taken as a raw FAISS factory string, e.g. "OPQ16,IVF256,PQ16"
+    return config.index_type
+
+
+def search_params_for(config: VectorIndexConfig, factory: str) -> dict:
+    """Query-time knobs that must be restored whenever the index is loaded."""
+    params = {}
+    if "IVF" in factory:
+        params["nprobe"] = config.nprobe
+    if factory.startswith("HNSW"):
+        params["efSearch"] = config.ef_search
+    return params
+
+
+def apply_search_params(index, params: dict):
+    """Sets nprobe / efSearch through ParameterSpace so wrapped indexes (OPQ, IDMap...) work too."""
+    try:
+        space = faiss.ParameterSpace()
+        for name, value in params.items():
+            space.set_index_parameter(index, name, value)
+    except Exception as e:
+        raise Project_Exception(e, sys)
+
+
+def make_search_parameters(index, search_params: dict, selector):
+    """
+    Per-call SearchParameters carrying an ID selector. Per-call parameters
+    replace the index-level nprobe / efSearch, so those are copied in as well.
+    Returns None when the index type cannot take a selector.
+    """
+    inner = faiss.downcast_index(index)
+    if isinstance(inner, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=search_params.get("nprobe", inner.nprobe))
+    if hasattr(inner, "hnsw"):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=search_params.get("efSearch", inner.hnsw.efSearch))
+    if isinstance(inner, (faiss.IndexFlat, faiss.IndexPQ, faiss.IndexScalarQuantizer)):
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+
+def rescore_candidates(queries, indices, vectors_for, top_k):
+    """
+    Second search stage for lossy indexes: exact squared L2 between each
+    query and its candidate ids (vectors_for(ids) -> float32 rows), keeping
+    the best top_k. Returns (distances, indices) padded with inf / -1.
+    """
+    out_d = np.full((len(queries), top_k), np.inf, dtype="float32")
+    out_i = np.full((len(queries), top_k), -1, dtype="int64")
+    for row, query in enumerate(queries):
+        ids = indices[row][indices[row] >= 0]
+        if not len(ids):
+            continue
+        diff = np.asarray(vectors_for(ids), dtype="float32") - query
+        exact = np.einsum("ij,ij->i", diff, diff)
+        best = np.argsort(exact, kind="stable")[:top_k]
+        out_i[row, :len(best)] = ids[best]
+        out_d[row, :len(best)] = exact[best]
+    return out_d, out_i
+
+
+# ------------------------------------------------------
+# BUILD
+# ------------------------------------------------------
+def build_faiss_index(embeddings, config: VectorIndexConfig = None):
+    """
+    Builds, trains (on a random sample when needed) and fills a FAISS index.
+    Returns (index, spec) where spec is what gets persisted in index_config.json.
+    """
+    try:
+        config = config or VectorIndexConfig()
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        n_vectors, dim = embeddings.shape
+
+        factory = factory_string(config, dim, n_vectors)
+        index = faiss.index_factory(dim, factory)
+
+        # A scalar quantizer only learns per-dimension ranges; IVF / PQ need real training data
+        if not index.is_trained and n_vectors < config.min_train_size and ("IVF" in factory or "PQ" in factory):
+            # Still with the configured float16 / int8 codes: only the partitioning is dropped
+            fallback = STORAGE_CODECS[getattr(config, "storage", "float32")]
+            logging.warning(
+                f"[WARN] {n_vectors} vectors are too few to train '{factory}', falling back to '{fallback}'."
+            )
+            factory = fallback
+            index = faiss.index_factory(dim, factory)
+
+        hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+        if hnsw is not None:
+            hnsw.efConstruction = config.ef_construction
+
+        if not index.is_trained:
+            sample_size = min(n_vectors, config.train_sample_size)
+            sample = embeddings[np.random.default_rng(0).choice(n_vectors, sample_size, replace=False)]
+            logging.info(f"[INFO] Training '{factory}' on {sample_size} sampled vectors...")
+            index.train(sample)
+
+        index.add(embeddings)
+
+        spec = {
+            "index_type": config.index_type,
+            "storage": getattr(config, "storage", "float32"),
+            "factory": factory,
+            "dim": dim,
+            "search_params": search_params_for(config, factory),
+            # Lossy codes: search over-fetches and re-ranks on the fp32 vectors in embeddings.npy
+            "rescore_factor": config.rescore_factor if ("SQ" in factory or "PQ" in factory) else 0,
+        }
+        apply_search_params(index, spec["search_params"])
+        logging.info(f"[INFO] Built '{factory}' index with {index.ntotal} vectors.")
+        return index, spec
+    except Exception as e:
+        raise Project_Exception(e, sys)
+
+
+# ------------------------------------------------------
+# PERSISTENCE
+# ------------------------------------------------------
+def save_index_spec(index_dir: str, spec: dict):
+    try:
+        path = os.path.join(index_dir, message_pipeline.VECTOR_INDEX_CONFIG_FILE_NAME)
+        write_json_atomic(path, spec, indent=2)
+    except Exception as e:
+        raise Project_Exception(e, sys)
+
+
+def load_index_spec(index_dir: str):
+    """Returns the persisted spec, or None for artifacts built before index types were configurable."""
+    try:
+        path = os.path.join(index_dir, message_pipeline.VECTOR_INDEX_CONFIG_FILE_NAME)
+        if not os.path.exists(path):
+            return None
+        if not verify_checksum(path):
+            raise ValueError(f"{path} does not match its checksum")
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        raise Project_Exception(e, sys)
@@ -0,0 +1,125 @@
+# embedding_service/onnx_backend.py
+
+import os
+import sys
+import numpy as np
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.constants import message_pipeline
+
+
+class OnnxEmbeddingBackend:
+    """
+    Sentence-embedding model exported to ONNX and run with ONNX Runtime on
+    CPU, optionally with dynamic int8 weight quantization.
+
+    The first use exports <model> (from a local directory or the local
+    Hugging Face cache, never the network) into
+    <onnx_dir>/<model>/model.onnx (+ model.int8.onnx) along with its
+    tokenizer; later runs only read those files. Pooling matches the
+    sentence-transformers pipeline: attention-masked mean, then L2
+    normalization (when `normalize`).
+
+    onnx / onnxruntime / transformers / torch are imported lazily, and torch
+    is only needed for the one-off export.
+    """
+
+    FP32_FILE_NAME = "model.onnx"
+    INT8_FILE_NAME = "model.int8.onnx"
+
+    def __init__(self, model_name: str, quantize: bool = True,
+                 onnx_dir: str = os.path.join(message_pipeline.ARTIFACT_DIR_NAME,
+                                              message_pipeline.EMBEDDING_ONNX_DIR_NAME),
+                 intra_op_threads: int = message_pipeline.EMBEDDING_ONNX_THREADS,
+                 max_length: int = message_pipeline.EMBEDDING_MAX_SEQ_LENGTH,
+                 normalize: bool = True):
+        try:
+            self.model_name = model_name
+            self.quantize = quantize
+            self.max_length = max_length
+            self.normalize = normalize
+            self.model_dir = os.path.join(onnx_dir, os.path.basename(os.path.normpath(model_name)))
+
+            fp32_path = os.path.join(self.model_dir, self.FP32_FILE_NAME)
+            if not os.path.exists(fp32_path):
+                self._export(fp32_path)
+            model_path = fp32_path
+            if quantize:
+                model_path = os.path.join(self.model_dir, self.INT8_FILE_NAME)
+                if not os.path.exists(model_path):
+                    self._quantize(fp32_path, model_path)
+
+            from transformers import AutoTokenizer
+            import onnxruntime as ort
+
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir, local_files_only=True)
+
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = intra_op_threads or os.cpu_count() or 1
+            options.inter_op_num_threads = 1
+            options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+            self.input_names = [i.name for i in self.session.get_inputs()]
+            logging.info(
+                f"[INFO] ONNX Runtime session for {model_name} ({'int8' if quantize else 'fp32'}, "
+                f"{options.intra_op_num_threads} intra-op threads)"
+            )
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    # ------------------------------------------------------
+    # EXPORT / QUANTIZE (one-off)
+    # ------------------------------------------------------
+    def _export(self, path: str):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        logging.info(f"[INFO] Exporting {self.model_name} to ONNX at {path}...")
+        os.makedirs(self.model_dir, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name, local_files_only=True)
+        model = AutoModel.from_pretrained(self.model_name, local_files_only=True).eval()
+
+        sample = tokenizer(["export sample sentence"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+        with torch.no_grad():
+            torch.onnx.export(
+                model, tuple(sample[name] for name in input_names), path,
+                input_names=input_names, output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes, opset_version=14, do_constant_folding=True,
+            )
+        tokenizer.save_pretrained(self.model_dir)
+
+    @staticmethod
+    def _quantize(fp32_path: str, int8_path: str):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logging.info(f"[INFO] Quantizing {fp32_path} to int8...")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    # ------------------------------------------------------
+    # ENCODE
+    # ------------------------------------------------------
+    def encode(self, texts, batch_size: int = message_pipeline.EMBEDDING_BATCH_SIZE, show_progress_bar: bool = False):
+        """Same contract as SentenceTransformer.encode: (len(texts), dim) float32."""
+        parts = []
+        for start in range(0, len(texts), batch_size):
+            batch = list(texts[start:start + batch_size])
+            encoded = self.tokenizer(batch, padding=True, truncation=True,
+                                     max_length=self.max_length, return_tensors="np")
+            feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            parts.append(pooled.astype(np.float32))
+            if show_progress_bar:
+                logging.info(f"[INFO] ONNX encoded {min(start + batch_size, len(texts))}/{len(texts)} texts")
+        if not parts:
+            dim = self.session.get_outputs()[0].shape[-1]
+            return np.empty((0, dim if isinstance(dim, int) else 0), dtype=np.float32)
+        return np.vstack(parts)
@@ -0,0 +1,193 @@
+# embedding_service/segment_log.py
+
+import json
+import os
+import sys
+import numpy as np
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.constants import message_pipeline
+
+
+class SegmentLog:
+    """
+    Append-only write-ahead log for VectorStore.
+
+    Every segment is a pair of files named after the global row id of its
+    first record:
+      - segment_<start>.f32   : raw float32 embedding rows
+      - segment_<start>.jsonl : one {"text", "metadata"} record per row
+
+    New messages are appended to the newest (active) segment, so an add costs
+    O(rows added) instead of rewriting the whole corpus. Compaction folds
+    sealed segments into the base files and then drops them.
+    """
+
+    def __init__(self, segment_dir: str, max_rows: int = message_pipeline.VECTOR_STORE_SEGMENT_MAX_ROWS):
+        try:
+            self.segment_dir = segment_dir
+            self.max_rows = max_rows
+            os.makedirs(self.segment_dir, exist_ok=True)
+
+            self.dim = None
+            self.active_start = None    # global row id of the first record in the active segment
+            self.active_rows = 0        # records already written to the active segment
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    # ------------------------------------------------------
+    # FILE HELPERS
+    # ------------------------------------------------------
+    def _paths(self, start: int):
+        name = f"segment_{start:012d}"
+        return (os.path.join(self.segment_dir, name + ".f32"),
+                os.path.join(self.segment_dir, name + ".jsonl"))
+
+    def segment_starts(self):
+        """Sorted start row ids of every segment on disk."""
+        starts = set()
+        for name in os.listdir(self.segment_dir):
+            if name.startswith("segment_") and name.endswith(".jsonl"):
+                starts.add(int(name[len("segment_"):-len(".jsonl")]))
+        return sorted(starts)
+
+    def _read_segment(self, start: int):
+        """
+        Returns (records, embeddings) for the consistent prefix of a segment.
+        A crash can leave one side of the pair longer than the other (or a
+        half-written last line), so only rows present in both are kept.
+        """
+        vec_path, rec_path = self._paths(start)
+
+        records = []
+        with open(rec_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                records.append(json.loads(line))
+
+        embeddings = np.fromfile(vec_path, dtype=np.float32) if os.path.exists(vec_path) else np.empty(0, np.float32)
+        embeddings = embeddings[: (embeddings.size // self.dim) * self.dim].reshape(-1, self.dim)
+
+        rows = min(len(records), embeddings.shape[0])
+        return records[:rows], embeddings[:rows]
+
+    def _truncate(self, start: int, rows: int):
+        """Cuts both files of a segment back to `rows` complete records."""
+        vec_path, rec_path = self._paths(start)
+        with open(rec_path, "rb+") as f:
+            kept = 0
+            for _ in range(rows):
+                kept += len(f.readline())
+            f.truncate(kept)
+        with open(vec_path, "ab+") as f:
+            f.truncate(rows * self.dim * 4)
+
+    # ------------------------------------------------------
+    # APPEND
+    # ------------------------------------------------------
+    def append(self, start_row: int, texts, metas, embeddings):
+        """
+        Appends rows whose global ids begin at `start_row`.
+        Embeddings are written before records so a torn write never leaves a
+        record without its vector.
+        """
+        try:
+            embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+
+            if (self.active_start is None or self.active_rows >= self.max_rows
+                    or start_row != self.active_start + self.active_rows):
+                self.active_start = start_row
+                self.active_rows = 0
+
+            vec_path, rec_path = self._paths(self.active_start)
+            with open(vec_path, "ab") as f:
+                f.write(embeddings.tobytes())
+            with open(rec_path, "a", encoding="utf-8") as f:
+                for text, meta in zip(texts, metas):
+                    f.write(json.dumps({"text": text, "metadata": meta}, ensure_ascii=False) + "\n")
+
+            self.active_rows += len(texts)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def rollback(self, start_row: int):
+        """Undoes appends from global row `start_row` on, e.g. when the document write after them failed."""
+        try:
+            if self.active_start is None or start_row < self.active_start:
+                return
+            rows = start_row - self.active_start
+            if os.path.exists(self._paths(self.active_start)[1]):
+                self._truncate(self.active_start, rows)
+            if rows == 0:
+                for path in self._paths(self.active_start):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self.active_start = None
+            self.active_rows = rows
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    # ------------------------------------------------------
+    # REPLAY
+    # ------------------------------------------------------
+    def replay(self, dim: int, truncate: bool = True):
+        """
+        Yields (start_row, texts, metas, embeddings) for every segment in row
+        order and re-opens the newest segment as the active one.
+
+        truncate=True (the writer) cuts a torn last record off the newest
+        segment so new appends follow whole records. Readers pass False: the
+        incomplete record may be one a writer process is still appending, so
+        it is only skipped, never written to.
+        """
+        try:
+            self.dim = dim
+            starts = self.segment_starts()
+            for start in starts:
+                records, embeddings = self._read_segment(start)
+                yield (start,
+                       [r["text"] for r in records],
+                       [r["metadata"] for r in records],
+                       embeddings)
+
+                if start == starts[-1]:
+                    if truncate:
+                        self._truncate(start, len(records))
+                    self.active_start = start
+                    self.active_rows = len(records)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    # ------------------------------------------------------
+    # COMPACTION SUPPORT
+    # ------------------------------------------------------
+    def seal(self):
+        """
+        Closes the active segment so new appends start a fresh one.
+        Returns the start ids of every segment that is now sealed.
+        """
+        sealed = self.segment_starts()
+        self.active_start = None
+        self.active_rows = 0
+        return sealed
+
+    def drop(self, starts):
+        """Deletes segments that have been folded into the base files."""
+        try:
+            for start in starts:
+                for path in self._paths(start):
+                    if os.path.exists(path):
+                        os.remove(path)
+            logging.info(f"[INFO] Dropped {len(starts)} compacted WAL segments.")
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def reset(self):
+        """Forgets every segment, e.g. after the base files were rebuilt from scratch."""
+        self.drop(self.segment_starts())
+        self.active_start = None
+        self.active_rows = 0
@@ -0,0 +1,91 @@
+# embedding_service/snapshot.py
+
+import numpy as np
+import faiss
+
+
+class DeltaBuffer:
+    """
+    fp32 vectors of the rows appended after the base index, row `start`
+    first. Appends only ever write past the published length, and growing
+    moves to a new array, so a view() handed to readers never changes.
+    """
+
+    def __init__(self, dim: int, start: int, capacity: int = 1024):
+        self.dim = dim
+        self.start = start
+        self._rows = np.empty((capacity, dim), dtype="float32")
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def append(self, embeddings):
+        embeddings = np.asarray(embeddings, dtype="float32").reshape(-1, self.dim)
+        needed = self._n + len(embeddings)
+        if needed > len(self._rows):
+            grown = np.empty((max(needed, 2 * len(self._rows)), self.dim), dtype="float32")
+            grown[:self._n] = self._rows[:self._n]
+            self._rows = grown
+        self._rows[self._n:needed] = embeddings
+        self._n = needed
+
+    def view(self):
+        return self._rows[:self._n]
+
+    def rebase(self, start: int):
+        """New buffer holding only rows start.. (the ones before were folded into the base index)."""
+        rebased = DeltaBuffer(self.dim, start, max(len(self._rows) // 2, 1024))
+        rebased.append(self.view()[start - self.start:])
+        return rebased
+
+
+class StoreSnapshot:
+    """
+    Immutable view of a VectorStore that one search runs against: the base
+    FAISS index and embeddings.npy (rows 0..base_rows-1) plus a frozen
+    prefix of the delta rows. Row ids >= `rows` belong to writes published
+    after the snapshot was taken and are ignored.
+    """
+
+    __slots__ = ("index", "embeddings", "base_rows", "delta", "rows", "generation")
+
+    def __init__(self, index, embeddings, base_rows: int, delta, generation: int):
+        self.index = index
+        self.embeddings = embeddings
+        self.base_rows = base_rows
+        self.delta = delta
+        self.rows = base_rows + len(delta)
+        self.generation = generation
+
+    def search_delta(self, queries, k, eligible=None):
+        """Exact L2 search over the delta rows; (distances, row ids) padded with inf / -1."""
+        vectors, local = self.delta, None
+        if eligible is not None:
+            local = eligible[(eligible >= self.base_rows) & (eligible < self.rows)] - self.base_rows
+            vectors = vectors[local]
+        out_d = np.full((len(queries), k), np.inf, dtype="float32")
+        out_i = np.full((len(queries), k), -1, dtype="int64")
+        if not len(vectors):
+            return out_d, out_i
+        n = min(k, len(vectors))
+        distances, rows = faiss.knn(queries, np.ascontiguousarray(vectors), n)
+        out_d[:, :n] = distances
+        out_i[:, :n] = np.where(rows >= 0, (local[rows] if local is not None else rows) + self.base_rows, -1)
+        return out_d, out_i
+
+
+def merge_hits(parts, k):
+    """Best k of several (distances, ids) result blocks for the same queries, padded with inf / -1."""
+    distances = np.hstack([d for d, _ in parts])
+    indices = np.hstack([i for _, i in parts])
+    distances = np.where(indices >= 0, distances, np.inf)
+    order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+    distances = np.take_along_axis(distances, order, axis=1)
+    indices = np.take_along_axis(indices, order, axis=1)
+    indices[~np.isfinite(distances)] = -1
+    pad = k - indices.shape[1]
+    if pad > 0:
+        distances = np.pad(distances, ((0, 0), (0, pad)), constant_values=np.inf)
+        indices = np.pad(indices, ((0, 0), (0, pad)), constant_values=-1)
+    return distances, indices
@@ -3,16 +3,36 @@ import numpy as np
 import faiss
 import os
 import sys
+import threading
+import time
+from itertools import chain
 
 from src.exception.exception import Project_Exception
 from src.logging.logger import logging
 from src.entity.artifact_entity import DataIngestionArtifact
+from src.entity.config_entity import VectorIndexConfig
+from src.embedding_service.index_factory import (
+    build_faiss_index, apply_search_params, make_search_parameters, save_index_spec, load_index_spec,
+    rescore_candidates,
+)
+from src.embedding_service.document_store import DocumentStore, DocumentColumn
+from src.embedding_service.snapshot import DeltaBuffer, StoreSnapshot, merge_hits
+from src.embedding_service.bm25_index import BM25Index
+from src.query_engine.entity_index import EntityIndex
+from src.embedding_service.column_store import ColumnStore
+from src.embedding_service.chunk_index import ChunkIndex
+from src.embedding_service.dedup import NearDuplicateIndex
+from src.data_ingestion.message_parser import iter_jsonl
+from src.utils.helpers import iter_chunks
+from src.embedding_service.segment_log import SegmentLog
+from src.utils.atomic_io import atomic_open, commit_tmp, is_dirty, marked_dirty, verify_checksum
+from src.constants import message_pipeline
 
 # embedding_service/vector_store.py
 
 class VectorStore:
     try:
-        def __init__(self, data_ingestion_artifact:DataIngestionArtifact):
+        def __init__(self, data_ingestion_artifact:DataIngestionArtifact, vector_index_config:VectorIndexConfig=None):
             """
             VectorStore handles loading processed messages (SMS & Emails),
             storing their embeddings, and enabling semantic search with FAISS.
@@ -24,61 +44,71 @@ class VectorStore:
             self.sms_path = data_ingestion_artifact.sms_path
             os.makedirs(self.index_dir, exist_ok=True)
 
-            self.index = None
-            self.messages = []          # list of combined message texts
-            self.metadata = []          # stores sender, date, etc.
-            self.embeddings = None
+            # Which FAISS index to build (flat / ivf_flat / ivf_pq / hnsw / factory string)
+            self.vector_index_config = vector_index_config or VectorIndexConfig()
+            self.index_spec = None
+
+            self.index = None           # base index (index.faiss); never modified once published
+            self.delta = None           # fp32 rows appended since, searched exactly next to the base
+            self.messages = []          # combined message texts; a DocumentColumn view once saved / loaded
+            self.metadata = []          # sender, date, etc.; likewise
+            self.embeddings = None      # base (compacted) embedding matrix
+            self.documents = DocumentStore(self.index_dir)  # texts + metadata by row id, filter columns in SQL
+            self.bm25_index = BM25Index()           # exact-token retrieval fused with FAISS in hybrid_search
+            self.entity_index = EntityIndex()       # entity spans per row, masks results without regex work
+            self.column_store = ColumnStore()       # amount / action / sender / time columns for local analytics
+            self.chunk_index = ChunkIndex()         # extra chunk vectors of long emails -> parent message id
+            self.dedup_index = NearDuplicateIndex() # SimHash clusters of templated alerts / OTPs
+            self.dedup = message_pipeline.DEDUP_ENABLED
+
+            # Append-only log for messages added after the last full save
+            self.segment_log = SegmentLog(
+                os.path.join(self.index_dir, message_pipeline.VECTOR_STORE_SEGMENT_DIR_NAME)
+            )
+            self.chunk_log = SegmentLog(
+                os.path.join(self.index_dir, message_pipeline.VECTOR_STORE_CHUNK_SEGMENT_DIR_NAME)
+            )
+            self.compaction_threshold = message_pipeline.VECTOR_STORE_COMPACTION_THRESHOLD
+            self._lock = threading.RLock()
+            self._compaction_lock = threading.Lock()
+
+            # Bumped on every change to the searchable rows; listeners (e.g. QueryCache) are told why
+            self.generation = 0
+            self._listeners = []
+            # What searches read: swapped in one assignment once a write is complete
+            self._snapshot = None
+            self._read_only = False     # load_index(mmap=True): never truncate the WAL or documents
+            self._leader_cache = None   # ((base index, dedup version), leader selector) of unfiltered searches
     except Exception as e:
         raise Project_Exception(e,sys)
 
     # ----------------------------------------------------------------
     # 1️⃣ Load and preprocess SMS + Email messages
     # ----------------------------------------------------------------
+    def _iter_processed(self, path):
+        """Yields processed records from sms/email data files (.json list or streamed .jsonl)."""
+        if not path or not os.path.exists(path):
+            return
+        if path.endswith(".jsonl"):
+            yield from iter_jsonl(path)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                yield from json.load(f)
+
     def load_messages(self):
         try:
-            # sms_path = os.path.join(self.base_dir, "sms.json")
-            # email_path = os.path.join(self.base_dir, "email.json")
-            sms_path = self.sms_path
-            email_path = self.email_path
-
             all_texts = []
             meta = []
 
-            # --- Load SMS messages ---
-            if os.path.exists(sms_path):
-                with open(sms_path, "r", encoding="utf-8") as f:
-                    sms_data = json.load(f)
-                    for msg in sms_data:
-                        # Construct a searchable text form
-                        text = f"SMS from {msg.get('sender', 'Unknown')}: {msg.get('text', '')}"
-                        all_texts.append(text.strip())
-
-                        meta.append({
-                            "source": "sms",
-                            "sender": msg.get("sender"),
-                            "timestamp": msg.get("timestamp"),
-                            "type": msg.get("type"),
-                            "details": msg.get("details", {})
-                        })
-
-            # --- Load Emails ---
-            if os.path.exists(email_path):
-                with open(email_path, "r", encoding="utf-8") as f:
-                    email_data = json.load(f)
-                    for mail in email_data:
-                        # Combine subject and body
-                        subject = mail.get("subject", "")
-                        body = mail.get("body", "")
-                        text = f"Email from {mail.get('from', 'Unknown')} about '{subject}': {body}"
-                        all_texts.append(text.strip())
-
-                        meta.append({
-                            "source": "email",
-                            "from": mail.get("from"),
-                            "date": mail.get("date"),
-                            "type": mail.get("type"),
-                            "details": mail.get("details", {})
-                        })
+            # --- Load SMS messages, then Emails ---
+            # _prepare_message builds "SMS from ..." / "Email from ... about ..." text forms
+            for path in (self.sms_path, self.email_path):
+                for record in self._iter_processed(path):
+                    prepared = self._prepare_message(record)
+                    if prepared is None:
+                        continue
+                    all_texts.append(prepared[0])
+                    meta.append(prepared[1])
 
             self.messages = all_texts
             self.metadata = meta
@@ -87,6 +117,118 @@ class VectorStore:
             return all_texts, meta
         except Exception as e:
             raise Project_Exception(e,sys)
+
+    def iter_message_chunks(self, chunk_size=message_pipeline.DATA_INGESTION_CHUNK_SIZE):
+        """Yields (texts, metas) chunks from the processed files without loading them whole."""
+        records = chain(self._iter_processed(self.sms_path), self._iter_processed(self.email_path))
+        for chunk in iter_chunks(records, chunk_size):
+            prepared = [p for p in map(self._prepare_message, chunk) if p is not None]
+            yield [p[0] for p in prepared], [p[1] for p in prepared]
+
+    def ingest_stream(self, embedder, chunk_size=message_pipeline.DATA_INGESTION_CHUNK_SIZE):
+        """
+        Streaming replacement for load_messages -> generate_embeddings ->
+        save_data -> build_index. Each chunk is encoded and handed to the
+        index on its own; the first chunk creates the base files (and trains
+        the index if the configured type needs it), later chunks go through
+        the WAL and a single compaction at the end writes the base files.
+        """
+        try:
+            total = 0
+            for texts, metas in self.iter_message_chunks(chunk_size):
+                if not texts:
+                    continue
+                start_row = 0 if self.index is None else len(self.messages)
+                embeddings, chunk_embeddings, chunk_parents = self.embed_rows(embedder, texts, start_row)
+                if self.index is None:
+                    self.messages, self.metadata = texts, metas
+                    self.save_data(embeddings)
+                    self.build_index(embeddings, chunk_embeddings, chunk_parents)
+                else:
+                    self._append_rows(texts, metas, embeddings, chunk_embeddings, chunk_parents)
+                total += len(texts)
+                logging.info(f"[INFO] Streamed {total} messages into the vector store...")
+
+            if self.index is not None:
+                self.compact()
+            logging.info(f"[INFO] Streaming ingestion finished: {total} messages.")
+            return total
+        except Exception as e:
+            raise Project_Exception(e,sys)
+
+    def ingest_delta(self, embedder, chunk_size=message_pipeline.DATA_INGESTION_CHUNK_SIZE):
+        """
+        Incremental counterpart of ingest_stream: appends the messages of this
+        artifact's processed files to the index loaded from the previous
+        generation, chunk by chunk through the WAL. Compacts synchronously
+        once the WAL passes the threshold, so the generation is complete on return.
+        """
+        try:
+            if self.index is None:
+                self.load_index()
+            total = 0
+            for texts, metas in self.iter_message_chunks(chunk_size):
+                if not texts:
+                    continue
+                start_row = len(self.messages)
+                reps = fingerprints = None
+                if self.dedup:
+                    reps, fingerprints = self.dedup_index.match(texts, start_row)
+                embeddings, chunk_embeddings, chunk_parents = self.embed_rows(embedder, texts, start_row, reps=reps)
+                self._append_rows(texts, metas, np.asarray(embeddings, dtype="float32"),
+                                  chunk_embeddings, chunk_parents, fingerprints)
+                total += len(texts)
+
+            if len(self.delta) >= self.compaction_threshold:
+                self.compact()
+            logging.info(f"[INFO] Incremental ingestion appended {total} messages ({len(self.messages)} total).")
+            return total
+        except Exception as e:
+            raise Project_Exception(e,sys)
+    def embed_rows(self, embedder, texts, start_row=None, batch_size=message_pipeline.EMBEDDING_BATCH_SIZE,
+                   show_progress_bar=False, pending=(), reps=None):
+        """
+        Embeds the texts of rows start_row.. (default: the next rows to be
+        appended) with one model pass per near-duplicate cluster: each text
+        is assigned to a cluster in dedup_index, only representatives are
+        encoded, and members reuse their representative's vectors (chunk
+        vectors included). `pending` are the texts of rows between the last
+        appended one and start_row, when a caller embeds in several batches
+        before appending. `reps` (from dedup_index.match) uses representatives
+        picked up front instead of assigning the rows now. Returns
+        generate_chunked_embeddings' triple for every text.
+        """
+        start_row = len(self.messages) + len(pending) if start_row is None else start_row
+        if not self.dedup:
+            return embedder.generate_chunked_embeddings(texts, batch_size=batch_size,
+                                                        show_progress_bar=show_progress_bar)
+
+        if reps is None:
+            reps = self.dedup_index.assign(texts, start_row)
+        slot = {}
+        for rep in reps:
+            slot.setdefault(rep, len(slot))
+        appended = start_row - len(pending)
+        rep_texts = [texts[rep - start_row] if rep >= start_row
+                     else pending[rep - appended] if rep >= appended
+                     else self.messages[rep] for rep in slot]
+        embeddings, chunk_embeddings, chunk_parents = embedder.generate_chunked_embeddings(
+            rep_texts, batch_size=batch_size, show_progress_bar=show_progress_bar
+        )
+        embeddings = np.asarray(embeddings, dtype="float32")
+        if len(slot) == len(texts):
+            return embeddings, chunk_embeddings, chunk_parents
+
+        rows = np.array([slot[rep] for rep in reps], dtype=np.int64)
+        if len(chunk_parents):
+            # Every member of a long representative gets a copy of its chunk vectors
+            chunk_parents = np.asarray(chunk_parents)
+            pairs = [(chunk, i) for i, row in enumerate(rows) for chunk in np.flatnonzero(chunk_parents == row)]
+            chunk_embeddings = np.asarray(chunk_embeddings)[[chunk for chunk, _ in pairs]]
+            chunk_parents = np.array([i for _, i in pairs], dtype=np.int64)
+        logging.info(f"[INFO] Near-duplicate collapsing: encoded {len(slot)} representatives for {len(texts)} messages.")
+        return embeddings[rows], chunk_embeddings, chunk_parents
+
     # ----------------------------------------------------------------
     # 2️⃣ Save embeddings and metadata
     # ----------------------------------------------------------------
@@ -95,66 +237,554 @@ class VectorStore:
     def save_data(self, embeddings):
         try:
             os.makedirs(self.index_dir, exist_ok=True)
-            np.save(os.path.join(self.index_dir, "embeddings.npy"), embeddings)
-            with open(os.path.join(self.index_dir, "messages.json"), "w", encoding="utf-8") as f:
-                json.dump(self.messages, f, ensure_ascii=False, indent=2)
-            with open(os.path.join(self.index_dir, "metadata.json"), "w", encoding="utf-8") as f:
-                json.dump(self.metadata, f, ensure_ascii=False, indent=2)
+            with marked_dirty(self.index_dir), atomic_open(os.path.join(self.index_dir, "embeddings.npy")) as f:
+                np.save(f, embeddings)
+            self.documents.replace(self.messages, self.metadata)
+            self._open_documents()
+
+            # A full save supersedes anything still waiting in the WAL
+            if self.vector_index_config.storage != "float32":
+                # Compressed index: the fp32 rows are only read back to rescore candidates
+                embeddings = np.load(os.path.join(self.index_dir, "embeddings.npy"), mmap_mode="r")
+            self.embeddings = embeddings
+            self.segment_log.reset()
+            self.chunk_log.reset()
             logging.info("[INFO] Saved embeddings, messages, and metadata.")
         except Exception as e:
             raise Project_Exception(e,sys)
     # ----------------------------------------------------------------
     # 3️⃣ Build and store FAISS index
     # ----------------------------------------------------------------
-    def build_index(self, embeddings):
+    def build_index(self, embeddings, chunk_embeddings=None, chunk_parents=None):
+        """
+        `chunk_embeddings` / `chunk_parents` (from generate_chunked_embeddings)
+        are the extra chunk vectors of long messages and their message ids.
+        """
         try:
-            dim = embeddings.shape[1]
-            self.index = faiss.IndexFlatL2(dim)
-            self.index.add(embeddings)
-            faiss.write_index(self.index, os.path.join(self.index_dir, "index.faiss"))
+            self.index, self.index_spec = build_faiss_index(embeddings, self.vector_index_config)
+            self.delta = DeltaBuffer(self.index.d, self.index.ntotal)
+            with marked_dirty(self.index_dir):
+                index_path = os.path.join(self.index_dir, "index.faiss")
+                faiss.write_index(self.index, index_path + ".tmp")
+                commit_tmp(index_path)
+                save_index_spec(self.index_dir, self.index_spec)
+                self.bm25_index.build(self.messages)
+                self.bm25_index.save(self.index_dir)
+                self.entity_index.build(self.messages)
+                self.entity_index.save(self.index_dir)
+                self.column_store.build(self.metadata)
+                self.column_store.save(self.index_dir)
+                self.chunk_index.build(self.index.d, chunk_embeddings, chunk_parents)
+                self.chunk_index.save(self.index_dir)
+                if len(self.dedup_index) != len(self.messages):   # embeddings did not come from embed_rows
+                    self.dedup_index.build(self.messages)
+                self.dedup_index.save(self.index_dir)
+            self._notify("rebuild")
             logging.info("[INFO] FAISS index built and saved.")
         except Exception as e:
             raise Project_Exception(e,sys)
     # ----------------------------------------------------------------
     # 4️⃣ Load index + embeddings
     # ----------------------------------------------------------------
-    def load_index(self):
+    def load_index(self, mmap: bool = False, verify: bool = None):
+        """
+        mmap=True memory-maps index.faiss and embeddings.npy instead of
+        reading them into memory, for read-only query processes (WAL rows go
+        to the delta buffer, the base index is never written to).
+        embeddings.npy is always mapped behind a compressed (rescored) index.
+
+        verify: check both files against their checksums first. By default
+        only after an unclean shutdown (the artifact is marked dirty), and
+        never for mmap readers, where hashing would read every page the map
+        exists to avoid.
+        """
         try:
-            self.index = faiss.read_index(os.path.join(self.index_dir, "index.faiss"))
-            self.embeddings = np.load(os.path.join(self.index_dir, "embeddings.npy"))
-            with open(os.path.join(self.index_dir, "messages.json"), "r", encoding="utf-8") as f:
-                self.messages = json.load(f)
-            with open(os.path.join(self.index_dir, "metadata.json"), "r", encoding="utf-8") as f:
-                self.metadata = json.load(f)
+            self._read_only = mmap
+            index_path = os.path.join(self.index_dir, "index.faiss")
+            embeddings_path = os.path.join(self.index_dir, "embeddings.npy")
+            if verify is None:
+                verify = not mmap and is_dirty(self.index_dir)
+            for path in (index_path, embeddings_path):
+                if not verify_checksum(path, verify):
+                    raise ValueError(f"{path} does not match its checksum; rebuild this artifact")
+            if mmap:
+                self.index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            else:
+                self.index = faiss.read_index(index_path)
+            # nprobe / efSearch are not stored inside index.faiss, restore them from the spec
+            self.index_spec = load_index_spec(self.index_dir)
+            if self.index_spec:
+                apply_search_params(self.index, self.index_spec.get("search_params", {}))
+            self.embeddings = np.load(embeddings_path, mmap_mode="r" if mmap or self._rescore_factor() else None)
+            self.delta = DeltaBuffer(self.index.d, self.index.ntotal)
+            messages_path = os.path.join(self.index_dir, "messages.json")
+            if not len(self.documents) and os.path.exists(messages_path):
+                # Artifact from before the document store: migrate it once
+                self.documents.import_json(messages_path, os.path.join(self.index_dir, "metadata.json"))
+            self._open_documents()
             logging.info("[INFO] Loaded FAISS index and message data.")
+
+            bm25_loaded = self.bm25_index.load(self.index_dir)
+            entities_loaded = self.entity_index.load(self.index_dir)
+            columns_loaded = self.column_store.load(self.index_dir)
+            dedup_loaded = self.dedup_index.load(self.index_dir)
+            self.chunk_index.load(self.index_dir, self.index.d)
+
+            self._replay_segments()
+            if not bm25_loaded or len(self.bm25_index) > len(self.messages):
+                self.bm25_index.build(self.messages)
+            elif len(self.bm25_index) < len(self.messages):
+                self.bm25_index.add(self.messages[len(self.bm25_index):])
+            if not entities_loaded or len(self.entity_index) > len(self.messages):
+                self.entity_index.build(self.messages)
+            elif len(self.entity_index) < len(self.messages):
+                self.entity_index.add(self.messages[len(self.entity_index):])
+            if not columns_loaded or len(self.column_store) > len(self.metadata):
+                self.column_store.build(self.metadata)
+            elif len(self.column_store) < len(self.metadata):
+                self.column_store.add(self.metadata[len(self.column_store):])
+            if not dedup_loaded or len(self.dedup_index) > len(self.messages):
+                self.dedup_index.build(self.messages)
+            elif len(self.dedup_index) < len(self.messages):
+                self.dedup_index.assign(self.messages[len(self.dedup_index):], len(self.dedup_index))
+            self._notify("rebuild")
         except Exception as e:
             raise Project_Exception(e,sys)
 
+    def _replay_segments(self):
+        """
+        Re-applies WAL segments written after the base files.
+        The index and the document store are tracked separately, so a crash in
+        the middle of a compaction (one base file replaced, another not yet)
+        or between a WAL append and its document write still converges to
+        the same rows. Read-only (mmap) stores skip a torn last record but
+        never truncate the WAL or the document store: a writer process may
+        still be appending to them.
+        """
+        doc_rows = len(self.messages)
+        replayed = 0
+
+        truncate = not self._read_only
+        for start, texts, metas, embeddings in self.segment_log.replay(self.index.d, truncate):
+            end = start + len(texts)
+            index_rows = self.index.ntotal + len(self.delta)
+            if end > index_rows:
+                self.delta.append(embeddings[max(index_rows - start, 0):])
+            if end > doc_rows:
+                skip = max(doc_rows - start, 0)
+                self.documents.append(texts[skip:], metas[skip:], start + skip)
+                doc_rows = end
+                replayed += len(texts) - skip
+
+        chunk_rows = len(self.chunk_index)
+        for start, _, metas, embeddings in self.chunk_log.replay(self.index.d, truncate):
+            if start + len(metas) > chunk_rows:
+                skip = max(chunk_rows - start, 0)
+                self.chunk_index.add(embeddings[skip:], [m["parent"] for m in metas[skip:]])
+
+        index_rows = self.index.ntotal + len(self.delta)
+        if truncate and len(self.documents) > index_rows:
+            # Documents written for a batch whose vectors never reached the index or the WAL
+            self.documents.truncate(index_rows)
+        if index_rows != len(self.messages):
+            logging.warning(
+                f"[WARN] Index has {index_rows} rows but {len(self.messages)} messages after WAL replay."
+            )
+        if replayed:
+            logging.info(f"[INFO] Replayed {replayed} messages from WAL segments.")
+
     # ----------------------------------------------------------------
     # 5️⃣ Search function (semantic search)
     # ----------------------------------------------------------------
-    def search(self, query_embedding, top_k=5):
+    def search(self, query_embedding, top_k=5, filters=None):
+        """
+        Semantic search, optionally restricted by metadata `filters`, e.g.
+        {"source": "sms", "type": "transaction", "start": "2025-10-01", "end": "2025-10-31"}
+        (see DocumentStore for every supported key).
+        Returns the results of the first query row.
+        """
         try:
-            if self.index is None:
+            return self.search_batch(np.atleast_2d(np.array(query_embedding))[:1], top_k, filters)[0]
+        except Exception as e:
+            raise Project_Exception(e,sys)
+
+    def search_batch(self, query_embeddings, top_k=5, filters=None):
+        """
+        Runs an (n, d) query matrix through a single FAISS call on the base
+        index plus an exact scan of the delta rows, and returns one result
+        list per query row. Slots FAISS pads with -1 (top_k larger than the
+        number of eligible rows) are dropped.
+
+        Everything is read from one snapshot taken up front and no store lock
+        is held, so searches keep running while writers append: rows a
+        writer has not finished publishing are not visible yet.
+        """
+        try:
+            if self._snapshot is None:
+                self.load_index()
+            snap = self._snapshot
+            queries = np.ascontiguousarray(np.atleast_2d(np.array(query_embeddings)), dtype="float32")
+
+            eligible = self.documents.eligible_ids(filters)
+            if eligible is not None:
+                eligible = eligible[eligible < snap.rows]
+                if len(eligible) == 0:
+                    return [[] for _ in range(len(queries))]
+            # Near-duplicates share a vector: search one eligible row per cluster. Unfiltered
+            # searches use a leader selector built once per base index, not a per-query mask
+            leaders = None
+            if self.dedup and eligible is None:
+                leaders = self._base_leaders(snap)
+            elif self.dedup:
+                eligible = self.dedup_index.leaders(eligible)
+                eligible = eligible[eligible < snap.rows]
+
+            # Compressed codes: over-fetch candidates, then re-rank them on the fp32 vectors
+            factor = self._rescore_factor()
+            k = top_k * factor if factor else top_k
+            base_eligible = None if eligible is None else eligible[eligible < snap.base_rows]
+            if snap.base_rows == 0 or (base_eligible is not None and len(base_eligible) == 0):
+                distances = np.full((len(queries), k), np.inf, dtype="float32")
+                indices = np.full((len(queries), k), -1, dtype="int64")
+            elif base_eligible is not None:
+                distances, indices = self._filtered_search(snap.index, queries, k, base_eligible)
+            elif leaders is not None:
+                distances, indices = self._selector_search(snap.index, queries, k, *leaders)
+            else:
+                distances, indices = snap.index.search(queries, k)
+            if factor:
+                distances, indices = rescore_candidates(queries, indices, lambda ids: snap.embeddings[ids], top_k)
+            if len(snap.delta):
+                delta_eligible = eligible
+                if self.dedup and eligible is None:
+                    delta_eligible = self.dedup_index.representatives(snap.base_rows, snap.rows)
+                distances, indices = merge_hits(
+                    [(distances, indices), snap.search_delta(queries, top_k, delta_eligible)], top_k
+                )
+            if len(self.chunk_index):
+                distances, indices = self._merge_chunk_hits(queries, distances, indices, top_k, eligible, snap.rows,
+                                                            collapse=self.dedup and eligible is None)
+
+            # Hydrate every distinct hit once, then fan out to the query rows
+            unique_ids = np.unique(indices[indices >= 0]).tolist()
+            docs = self._hydrate(unique_ids)
+            clusters = {i: [m for m in self.dedup_index.cluster(i) if m < snap.rows] if self.dedup else [i]
+                        for i in unique_ids}
+
+            batch_results = []
+            for row_ids, row_dists in zip(indices.tolist(), distances.tolist()):
+                hits = [(idx, dist) for idx, dist in zip(row_ids, row_dists) if idx >= 0]
+                batch_results.append([
+                    {
+                        "rank": rank,
+                        "id": idx,
+                        "text": docs[idx][0],
+                        "distance": dist,
+                        "metadata": docs[idx][1],
+                        "cluster_size": len(clusters[idx]),
+                        "duplicates": [i for i in clusters[idx] if i != idx][:message_pipeline.DEDUP_MAX_MEMBER_IDS]
+                    }
+                    for rank, (idx, dist) in enumerate(hits, start=1)
+                ])
+            return batch_results
+        except Exception as e:
+            raise Project_Exception(e,sys)
+
+    def hybrid_search(self, query: str, embedder=None, top_k=5, filters=None, rrf_k=60):
+        """
+        BM25 over the local inverted index fused with FAISS results by
+        reciprocal rank fusion (score = sum of 1 / (rrf_k + rank)).
+
+        Exact-ID style queries ("Ref ID GP281105", "order 44120931") that BM25
+        resolves to a few messages are answered straight from the inverted
+        index, without running the embedding model. Without an embedder only BM25 is used.
+        """
+        try:
+            if self._snapshot is None:
                 self.load_index()
-            distances, indices = self.index.search(np.array(query_embedding), top_k)
-
-            results = []
-            for rank, (idx, dist) in enumerate(zip(indices[0], distances[0])):
-                result = {
-                    "rank": rank + 1,
-                    "text": self.messages[idx],
-                    "distance": float(dist),
-                    "metadata": self.metadata[idx]
+            rows = self._snapshot.rows
+            candidates = top_k * message_pipeline.HYBRID_SEARCH_CANDIDATE_FACTOR
+
+            bm25_ids, bm25_scores = self.bm25_index.search(query, candidates)
+            keep = bm25_ids < rows
+            eligible = self.documents.eligible_ids(filters)
+            if eligible is not None:
+                keep &= np.isin(bm25_ids, eligible)
+            bm25_ids, bm25_scores = bm25_ids[keep], bm25_scores[keep]
+            bm25_rank = {int(i): r for r, i in enumerate(bm25_ids, start=1)}
+            bm25_score = dict(zip(bm25_ids.tolist(), bm25_scores.tolist()))
+
+            if embedder is None or self._is_exact_lookup(query, bm25_ids):
+                fused = list(bm25_rank)
+                dense_distance = {}
+            else:
+                query_embedding = embedder.generate_embeddings([query], show_progress_bar=False, cache=False)
+                dense = self.search(query_embedding, candidates, filters)
+                dense_distance = {r["id"]: r["distance"] for r in dense}
+
+                scores = {}
+                for row_id, rank in bm25_rank.items():
+                    scores[row_id] = scores.get(row_id, 0.0) + 1.0 / (rrf_k + rank)
+                for r in dense:
+                    scores[r["id"]] = scores.get(r["id"], 0.0) + 1.0 / (rrf_k + r["rank"])
+                fused = sorted(scores, key=scores.get, reverse=True)
+
+            docs = self._hydrate(fused[:top_k])
+            return [
+                {
+                    "rank": rank,
+                    "id": row_id,
+                    "text": docs[row_id][0],
+                    "distance": dense_distance.get(row_id),
+                    "bm25_score": bm25_score.get(row_id),
+                    "metadata": docs[row_id][1]
                 }
-                results.append(result)
-            return results
+                for rank, row_id in enumerate(fused[:top_k], start=1)
+            ]
+        except Exception as e:
+            raise Project_Exception(e,sys)
+
+    def mask_results(self, results):
+        """
+        Masks search / hybrid_search results from the entity table built at
+        ingestion time. Same output as EntityExtractor.extract_entities_from_messages,
+        with placeholders numbered by result position.
+        """
+        try:
+            return self.entity_index.mask([r["id"] for r in results], [r["text"] for r in results])
         except Exception as e:
             raise Project_Exception(e,sys)
-        
+
+    def _is_exact_lookup(self, query: str, bm25_ids) -> bool:
+        """
+        True when the query carries an ID-shaped token (letters mixed with
+        digits, or a long bare number) that only a few messages contain and
+        BM25 matched in one of `bm25_ids`. Years, amounts and other common
+        tokens ("payments in 2025") still go through dense retrieval.
+        """
+        if not len(bm25_ids):
+            return False
+        for token in BM25Index.tokenize(query):
+            if token.isdigit():
+                id_shaped = len(token) >= message_pipeline.HYBRID_EXACT_LOOKUP_MIN_DIGITS
+            else:
+                id_shaped = any(c.isdigit() for c in token) and any(c.isalpha() for c in token)
+            if not id_shaped:
+                continue
+            rows = self.bm25_index.term_rows(token)
+            if len(rows) <= message_pipeline.HYBRID_EXACT_LOOKUP_MAX_DF and np.isin(rows, bm25_ids).any():
+                return True
+        return False
+
+    def _filtered_search(self, index, query, top_k, eligible):
+        """
+        Chooses between post- and pre-filtering from the filter selectivity.
+        Broad filters search a few extra neighbours and drop ineligible hits;
+        selective ones (or a post-filter that came back short) run inside
+        FAISS with a bitmap ID selector so only eligible vectors are scanned.
+        """
+        ntotal = index.ntotal
+        selectivity = len(eligible) / max(ntotal, 1)
+
+        if selectivity > message_pipeline.VECTOR_SEARCH_PREFILTER_SELECTIVITY:
+            k = min(ntotal, int(np.ceil(top_k / selectivity * message_pipeline.VECTOR_SEARCH_POSTFILTER_OVERSAMPLE)))
+            distances, indices = index.search(query, k)
+            keep = np.isin(indices, eligible)
+            if (keep.sum(axis=1) >= min(top_k, len(eligible))).all():
+                return self._compact_hits(distances, indices, keep, top_k)
+
+        mask = np.zeros(ntotal, dtype=bool)
+        mask[eligible] = True
+        return self._selector_search(index, query, top_k, *self._bitmap_selector(index, mask))
+
+    def _bitmap_selector(self, index, mask):
+        """(mask, search params) selecting the rows set in `mask`; params is None without selector support."""
+        bitmap = np.packbits(mask, bitorder="little")
+        selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+        params = make_search_parameters(index, (self.index_spec or {}).get("search_params", {}), selector)
+        if params is not None:
+            # FAISS only borrows the bitmap: keep it alive as long as the params
+            params.bitmap, params.selector = bitmap, selector
+        return mask, params
+
+    def _selector_search(self, index, query, top_k, mask, params):
+        if params is not None:
+            return index.search(query, top_k, params=params)
+        # Index type without selector support: exhaustive search, then filter
+        distances, indices = index.search(query, index.ntotal)
+        return self._compact_hits(distances, indices, (indices >= 0) & mask[indices], top_k)
+
+    def _base_leaders(self, snap):
+        """
+        (mask, search params) of the base rows that lead their near-duplicate
+        cluster, or None when no base row is collapsed. Base rows never change
+        cluster, so this is built once per base index (and dedup rebuild).
+        """
+        key = (snap.index, self.dedup_index.version)
+        if self._leader_cache is None or self._leader_cache[0] != key:
+            leaders = self.dedup_index.representatives(0, snap.base_rows)
+            value = None
+            if len(leaders) < snap.base_rows:
+                mask = np.zeros(snap.base_rows, dtype=bool)
+                mask[leaders] = True
+                value = self._bitmap_selector(snap.index, mask)
+            self._leader_cache = (key, value)
+        return self._leader_cache[1]
+
+    def _merge_chunk_hits(self, queries, distances, indices, top_k, eligible, rows, collapse=False):
+        """
+        Parent-level aggregation over the chunk index: a message scores the
+        smallest distance among its own vector and its chunk vectors, and
+        appears once per result list. Chunks of rows >= `rows` (not in the
+        caller's snapshot yet) are skipped. collapse=True credits a chunk
+        hit to the representative of its parent's near-duplicate cluster.
+        """
+        chunk_d, chunk_parents = self.chunk_index.search(
+            queries, top_k * message_pipeline.CHUNK_SEARCH_CANDIDATE_FACTOR, eligible
+        )
+        if collapse:
+            chunk_parents = self.dedup_index.representative_of(chunk_parents.ravel()).reshape(chunk_parents.shape)
+        out_d = np.full((len(queries), top_k), np.inf, dtype="float32")
+        out_i = np.full((len(queries), top_k), -1, dtype="int64")
+        for row in range(len(queries)):
+            best = {}
+            hits = chain(zip(indices[row].tolist(), distances[row].tolist()),
+                         zip(chunk_parents[row].tolist(), chunk_d[row].tolist()))
+            for idx, dist in hits:
+                if 0 <= idx < rows and dist < best.get(idx, np.inf):
+                    best[idx] = dist
+            ranked = sorted(best.items(), key=lambda item: item[1])[:top_k]
+            out_i[row, :len(ranked)] = [idx for idx, _ in ranked]
+            out_d[row, :len(ranked)] = [dist for _, dist in ranked]
+        return out_d, out_i
+
+    def _open_documents(self):
+        """Points messages / metadata at the document store instead of in-memory lists."""
+        self.messages = DocumentColumn(self.documents, "text")
+        self.metadata = DocumentColumn(self.documents, "metadata")
+
+    def _hydrate(self, ids):
+        """{id: (text, metadata)} of the hit rows: one document store query, not the whole corpus in RAM."""
+        if isinstance(self.messages, DocumentColumn):
+            return self.documents.fetch(ids)
+        return {i: (self.messages[i], self.metadata[i]) for i in ids}
+
+    def _rescore_factor(self) -> int:
+        """Candidates fetched per result when the index stores lossy codes, else 0."""
+        return (self.index_spec or {}).get("rescore_factor", 0)
+
+    @staticmethod
+    def _compact_hits(distances, indices, keep, top_k):
+        """Moves kept hits to the front of each row and pads with -1 up to top_k."""
+        out_d = np.full((indices.shape[0], top_k), np.inf, dtype="float32")
+        out_i = np.full((indices.shape[0], top_k), -1, dtype="int64")
+        for row in range(indices.shape[0]):
+            ids = indices[row][keep[row]][:top_k]
+            out_i[row, :len(ids)] = ids
+            out_d[row, :len(ids)] = distances[row][keep[row]][:top_k]
+        return out_d, out_i
+
         # ----------------------------------------------------------------
     # 6️⃣ Add new message dynamically (real-time update simulation)
     # ----------------------------------------------------------------
+    @staticmethod
+    def _prepare_message(new_message: dict):
+        """
+        Builds the searchable text form and metadata for a raw SMS or Email dict.
+        Returns (text, meta), or None for an unrecognized format.
+        """
+        if "text" in new_message:  # SMS
+            text = f"SMS from {new_message.get('sender', 'Unknown')}: {new_message.get('text', '')}"
+            meta = {
+                "source": "sms",
+                "sender": new_message.get("sender"),
+                "timestamp": new_message.get("timestamp"),
+                "type": new_message.get("type"),
+                "details": new_message.get("details", {})
+            }
+        elif "body" in new_message:  # Email
+            subject = new_message.get("subject", "")
+            body = new_message.get("body", "")
+            text = f"Email from {new_message.get('from', 'Unknown')} about '{subject}': {body}"
+            meta = {
+                "source": "email",
+                "from": new_message.get("from"),
+                "date": new_message.get("date"),
+                "type": new_message.get("type"),
+                "details": new_message.get("details", {})
+            }
+        else:
+            return None
+        return text.strip(), meta
+
+    def _append_rows(self, texts, metas, embeddings, chunk_embeddings=None, chunk_parents=None,
+                     fingerprints=None):
+        """
+        Adds prepared rows to the WAL and the document store, then to the
+        delta buffer and the side tables, and publishes them in a new snapshot.
+        `chunk_parents` are positions in `texts`. `fingerprints` (from
+        dedup_index.match) adds the rows to their near-duplicate clusters.
+        """
+        with self._lock:
+            row_id = len(self.messages)
+            has_chunks = chunk_parents is not None and len(chunk_parents)
+            if has_chunks:
+                parents = [row_id + int(p) for p in chunk_parents]
+                chunk_row = len(self.chunk_index)
+
+            # Durable rows first: a crash after the WAL write is repaired by replay, and a
+            # failed write is undone before any in-memory table has seen the rows
+            self.segment_log.append(row_id, texts, metas, embeddings)
+            try:
+                self.documents.append(texts, metas, row_id)
+                if has_chunks:
+                    self.chunk_log.append(chunk_row, [""] * len(parents), [{"parent": p} for p in parents],
+                                          chunk_embeddings)
+            except Exception:
+                self.segment_log.rollback(row_id)
+                self.documents.truncate(row_id)
+                if has_chunks:
+                    self.chunk_log.rollback(chunk_row)
+                raise
+
+            try:
+                self.delta.append(embeddings)
+                self.bm25_index.add(texts)
+                self.entity_index.add(texts)
+                self.column_store.add(metas)
+                if has_chunks:
+                    self.chunk_index.add(chunk_embeddings, parents)
+                    embeddings = np.vstack([embeddings, chunk_embeddings])
+                if fingerprints is not None:
+                    self.dedup_index.assign(texts, row_id, fingerprints)
+            except Exception:
+                # Row ids no longer line up across the tables: rebuild them from the durable rows
+                logging.warning("[WARN] In-memory append failed, reloading the store from the WAL.")
+                self.load_index(mmap=self._read_only)
+                raise
+            self._notify("append", embeddings)
+
+    def add_listener(self, callback):
+        """
+        Registers callback(event, generation, embeddings) called after the
+        searchable rows change: "append" with the new rows' embeddings, or
+        "rebuild" (embeddings=None) after build_index / load_index.
+        """
+        self._listeners.append(callback)
+
+    def _publish(self):
+        """Swaps in a snapshot of the current base index and delta rows for searches to read."""
+        with self._lock:
+            self._snapshot = StoreSnapshot(self.index, self.embeddings, self.index.ntotal,
+                                           self.delta.view(), self.generation)
+
+    def _notify(self, event, embeddings=None):
+        with self._lock:
+            self.generation += 1
+            self._publish()
+            for callback in self._listeners:
+                callback(event, self.generation, embeddings)
+
     def add_new_message(self, new_message: dict, embedder):
         """
         Simulates real-time addition of a new SMS or Email.
@@ -170,58 +800,190 @@ class VectorStore:
                 self.load_index()
 
             # 1️⃣ Identify and prepare text + metadata
-            if "text" in new_message:  # SMS
-                text = f"SMS from {new_message.get('sender', 'Unknown')}: {new_message.get('text', '')}"
-                meta = {
-                    "source": "sms",
-                    "sender": new_message.get("sender"),
-                    "timestamp": new_message.get("timestamp"),
-                    "type": new_message.get("type"),
-                    "details": new_message.get("details", {})
-                }
-            elif "body" in new_message:  # Email
-                subject = new_message.get("subject", "")
-                body = new_message.get("body", "")
-                text = f"Email from {new_message.get('from', 'Unknown')} about '{subject}': {body}"
-                meta = {
-                    "source": "email",
-                    "from": new_message.get("from"),
-                    "date": new_message.get("date"),
-                    "type": new_message.get("type"),
-                    "details": new_message.get("details", {})
-                }
-            else:
+            prepared = self._prepare_message(new_message)
+            if prepared is None:
                 logging.warning("[WARN] Unrecognized message format, skipping addition.")
                 return
+            text, meta = prepared
 
-            # 2️⃣ Generate embedding for new message
-            new_embedding = embedder.generate_embeddings([text])
+            # 2️⃣ Generate embedding for new message (reused from its near-duplicate cluster, if any),
+            # outside the store lock: the cluster is only picked here and joined at the append
+            start_row = len(self.messages)
+            reps = fingerprints = None
+            if self.dedup:
+                reps, fingerprints = self.dedup_index.match([text], start_row)
+            new_embedding, chunk_embeddings, chunk_parents = self.embed_rows(embedder, [text], start_row, reps=reps)
             new_embedding = np.array(new_embedding).astype('float32')
 
-            # 3️⃣ Add to FAISS index
-            self.index.add(new_embedding)
-            faiss.write_index(self.index, os.path.join(self.index_dir, "index.faiss"))
-
-            # 4️⃣ Append message and metadata
-            self.messages.append(text)
-            self.metadata.append(meta)
-
-            # 5️⃣ Save updated data
-            np.save(os.path.join(self.index_dir, "embeddings.npy"),
-                    np.vstack([self.embeddings, new_embedding]) if self.embeddings is not None else new_embedding)
-            with open(os.path.join(self.index_dir, "messages.json"), "w", encoding="utf-8") as f:
-                json.dump(self.messages, f, ensure_ascii=False, indent=2)
-            with open(os.path.join(self.index_dir, "metadata.json"), "w", encoding="utf-8") as f:
-                json.dump(self.metadata, f, ensure_ascii=False, indent=2)
-
-            # Update in-memory embeddings too
-            if self.embeddings is not None:
-                self.embeddings = np.vstack([self.embeddings, new_embedding])
-            else:
-                self.embeddings = new_embedding
+            # 3️⃣ Add to FAISS index (in memory only) and append to the active
+            # WAL segment instead of rewriting the corpus
+            self._append_rows([text], [meta], new_embedding, chunk_embeddings, chunk_parents, fingerprints)
 
             logging.info(f"[INFO] New message added and index updated successfully: {text[:80]}...")
+            self._maybe_compact()
+
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def add_new_messages(self, new_messages, embedder, batch_size=message_pipeline.EMBEDDING_BATCH_SIZE):
+        """
+        Bulk version of add_new_message for sync jobs.
+        Texts are built in one pass, encoded in batches of `batch_size`,
+        added with a single index.add call and persisted with a single WAL append.
+
+        Returns a dict with per-batch timings and overall throughput.
+        """
+        try:
+            if self.index is None:
+                self.load_index()
+
+            # 1️⃣ Build every text form + metadata in one pass
+            texts, metas = [], []
+            for new_message in new_messages:
+                prepared = self._prepare_message(new_message)
+                if prepared is None:
+                    continue
+                texts.append(prepared[0])
+                metas.append(prepared[1])
+
+            skipped = len(new_messages) - len(texts)
+            if skipped:
+                logging.warning(f"[WARN] Skipped {skipped} messages with an unrecognized format.")
+            if not texts:
+                return {"added": 0, "skipped": skipped, "batches": [], "seconds": 0.0, "messages_per_second": 0.0}
+
+            # 2️⃣ Encode in model-sized batches without the store lock, so searches and other
+            # writers are not held up by the model. Near-duplicate representatives are picked
+            # up front; the rows join their clusters (and get row ids) only at the append
+            started = time.perf_counter()
+            batches = []
+            parts, chunk_parts, parent_parts = [], [], []
+            first_row = len(self.messages)
+            reps = fingerprints = None
+            if self.dedup:
+                reps, fingerprints = self.dedup_index.match(texts, first_row)
+            for start in range(0, len(texts), batch_size):
+                chunk = texts[start:start + batch_size]
+                batch_started = time.perf_counter()
+                embeddings, chunk_embeddings, chunk_parents = self.embed_rows(
+                    embedder, chunk, first_row + start, batch_size=batch_size, pending=texts[:start],
+                    reps=None if reps is None else reps[start:start + batch_size]
+                )
+                parts.append(np.asarray(embeddings, dtype="float32"))
+                chunk_parts.append(np.asarray(chunk_embeddings, dtype="float32").reshape(-1, parts[-1].shape[1]))
+                parent_parts.append(np.asarray(chunk_parents) + start)
+                elapsed = time.perf_counter() - batch_started
+                batches.append({"size": len(chunk), "seconds": elapsed})
+                logging.info(
+                    f"[INFO] Encoded batch {len(batches)} ({len(chunk)} messages) in {elapsed * 1000:.1f} ms "
+                    f"({len(chunk) / max(elapsed, 1e-9):.1f} msg/s)"
+                )
+
+            # 3️⃣ One index.add + one WAL append for the whole sync, under the lock
+            self._append_rows(texts, metas, np.vstack(parts), np.vstack(chunk_parts),
+                              np.concatenate(parent_parts), fingerprints)
+
+            total = time.perf_counter() - started
+            stats = {
+                "added": len(texts),
+                "skipped": skipped,
+                "batches": batches,
+                "seconds": total,
+                "messages_per_second": len(texts) / max(total, 1e-9),
+            }
+            logging.info(
+                f"[INFO] Added {len(texts)} messages in {total:.2f}s "
+                f"({stats['messages_per_second']:.1f} msg/s over {len(batches)} batches)."
+            )
+            self._maybe_compact()
+            return stats
+
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    # ----------------------------------------------------------------
+    # 7️⃣ Compaction: fold WAL segments into the base files
+    # ----------------------------------------------------------------
+    def _maybe_compact(self):
+        """Starts a background compaction once enough rows sit in the WAL."""
+        if len(self.delta) < self.compaction_threshold:
+            return
+        if self._compaction_lock.locked():
+            return
+        threading.Thread(target=self.compact, name="vector-store-compaction", daemon=True).start()
+
+    def compact(self):
+        """
+        Folds the delta rows of every sealed WAL segment into a new base:
+        index.faiss, embeddings.npy and the BM25 / entity / analytics /
+        chunk / dedup tables, then drops those segments. Documents are
+        already in the document store.
+        Only sealing and taking the snapshot hold the store lock. The new
+        index is built on a copy of the base, so searches keep reading the
+        old snapshot (and new messages keep going to a fresh segment) until
+        the finished base is published in one swap.
+        """
+        try:
+            with self._compaction_lock:
+                with self._lock:
+                    sealed = self.segment_log.seal()
+                    if not sealed:
+                        return False
+                    chunk_sealed = self.chunk_log.seal()
+                    snap = self._snapshot
+                    chunk_rows = len(self.chunk_index)
+
+                # index.faiss holds exactly the published base; a fresh in-memory copy to extend
+                index_path = os.path.join(self.index_dir, "index.faiss")
+                index = faiss.read_index(index_path)
+                if len(snap.delta):
+                    index.add(snap.delta)
+                apply_search_params(index, (self.index_spec or {}).get("search_params", {}))
+
+                embeddings_path = os.path.join(self.index_dir, "embeddings.npy")
+                base = snap.embeddings
+                if base is None:
+                    base = np.load(embeddings_path, mmap_mode="r")
+                with marked_dirty(self.index_dir):
+                    # Streamed into the new file part by part: no second in-memory copy of the base rows
+                    self._write_npy_parts_atomic(embeddings_path, [base[:snap.base_rows], snap.delta], index.d)
+                    mapped = isinstance(snap.embeddings, np.memmap) or self._rescore_factor()
+                    embeddings = np.load(embeddings_path, mmap_mode="r" if mapped else None)
+
+                    faiss.write_index(index, index_path + ".tmp")
+                    commit_tmp(index_path)
+                    # Cut back to the snapshot: rows appended since then are replayed from the WAL
+                    self.bm25_index.save(self.index_dir, rows=snap.rows)
+                    self.entity_index.save(self.index_dir, rows=snap.rows)
+                    self.column_store.save(self.index_dir, rows=snap.rows)
+                    self.chunk_index.save(self.index_dir, rows=chunk_rows)
+                    self.dedup_index.save(self.index_dir, rows=snap.rows)
+
+                with self._lock:
+                    # Rows appended while the files were written stay in the delta
+                    self.index = index
+                    self.embeddings = embeddings
+                    self.delta = self.delta.rebase(snap.rows)
+                    self.segment_log.drop(sealed)
+                    self.chunk_log.drop(chunk_sealed)
+                    self._publish()
+                self.documents.checkpoint()
 
+                logging.info(f"[INFO] Compacted WAL into base files ({snap.rows} rows).")
+                return True
         except Exception as e:
             raise Project_Exception(e, sys)
 
+    @staticmethod
+    def _write_npy_parts_atomic(path, parts, dim):
+        """Writes the row-wise concatenation of `parts` as one float32 .npy without stacking them."""
+        tmp_path = path + ".tmp"
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype="float32",
+                                        shape=(sum(len(p) for p in parts), dim))
+        row = 0
+        for part in parts:
+            out[row:row + len(part)] = part
+            row += len(part)
+        out.flush()
+        del out
+        commit_tmp(path)
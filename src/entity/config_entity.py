@@ -3,9 +3,6 @@ from datetime import datetime
 
 from src.constants import message_pipeline
 
-print(message_pipeline.PIPELINE_NAME)
-print(message_pipeline.ARTIFACT_DIR_NAME)
-
 class ProjectPipelineConfig:
     def __init__(self, timestamp = datetime.now()):
         timestamp = timestamp.strftime("%d_%m_%Y_%H_%M_%S")
@@ -30,6 +27,13 @@ class DataIngistionConfig:
         self.raw_data_dir :str = os.path.join(project_pipeline_config.raw_data_dir,"sample_messages")
         self.sms_dir : str = os.path.join(self.raw_data_dir,message_pipeline.RAW_SMS_DIR_NAME)
         self.email_dir : str = os.path.join(self.raw_data_dir,message_pipeline.RAW_EMAIL_DIR_NAME)
+
+        self.streaming : bool = message_pipeline.DATA_INGESTION_STREAMING
+        self.chunk_size : int = message_pipeline.DATA_INGESTION_CHUNK_SIZE
+        self.num_workers : int = message_pipeline.PREPROCESS_NUM_WORKERS
+        self.preprocess_chunk_size : int = message_pipeline.PREPROCESS_CHUNK_SIZE
+        self.artifact_root : str = project_pipeline_config.artifact_name
+        self.incremental : bool = message_pipeline.DATA_INGESTION_INCREMENTAL
         
 
 class DataPreprocessingConfig:
@@ -40,4 +44,34 @@ class DataPreprocessingConfig:
 
         self.raw_data_dir :str = os.path.join(project_pipeline_config.raw_data_dir,"sample_messages")
         self.sms_dir : str = os.path.join(self.raw_data_dir,message_pipeline.RAW_SMS_DIR_NAME)
-        self.email_dir : str = os.path.join(self.raw_data_dir,message_pipeline.RAW_EMAIL_DIR_NAME)
\ No newline at end of file
+        self.email_dir : str = os.path.join(self.raw_data_dir,message_pipeline.RAW_EMAIL_DIR_NAME)
+
+
+class VectorIndexConfig:
+    def __init__(self, index_type: str = message_pipeline.VECTOR_INDEX_TYPE,
+                 storage: str = message_pipeline.VECTOR_INDEX_STORAGE):
+        self.index_type :str = index_type
+        self.storage :str = storage
+        self.rescore_factor :int = message_pipeline.VECTOR_SEARCH_RESCORE_FACTOR
+        self.nlist :int = message_pipeline.VECTOR_INDEX_NLIST
+        self.nprobe :int = message_pipeline.VECTOR_INDEX_NPROBE
+        self.pq_m :int = message_pipeline.VECTOR_INDEX_PQ_M
+        self.pq_nbits :int = message_pipeline.VECTOR_INDEX_PQ_NBITS
+        self.hnsw_m :int = message_pipeline.VECTOR_INDEX_HNSW_M
+        self.ef_construction :int = message_pipeline.VECTOR_INDEX_EF_CONSTRUCTION
+        self.ef_search :int = message_pipeline.VECTOR_INDEX_EF_SEARCH
+        self.train_sample_size :int = message_pipeline.VECTOR_INDEX_TRAIN_SAMPLE_SIZE
+        self.min_train_size :int = message_pipeline.VECTOR_INDEX_MIN_TRAIN_SIZE
+
+
+class LLMClientConfig:
+    def __init__(self, url: str = message_pipeline.LLM_API_URL, model: str = message_pipeline.LLM_MODEL_NAME):
+        self.url :str = url
+        self.model :str = model
+        self.connect_timeout :float = message_pipeline.LLM_CONNECT_TIMEOUT
+        self.read_timeout :float = message_pipeline.LLM_READ_TIMEOUT
+        self.max_retries :int = message_pipeline.LLM_MAX_RETRIES
+        self.backoff_base :float = message_pipeline.LLM_BACKOFF_BASE
+        self.backoff_max :float = message_pipeline.LLM_BACKOFF_MAX
+        self.max_concurrency :int = message_pipeline.LLM_MAX_CONCURRENCY
+        self.pool_size :int = message_pipeline.LLM_POOL_SIZE
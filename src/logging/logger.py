@@ -2,15 +2,22 @@ import os
 import logging
 from datetime import datetime
 
-LOG_FILE = f"{datetime.now().strftime("%d_%m_%Y, %H_%M_%S")}.log"
-logs_path = os.path.join(os.getcwd(),'logs',LOG_FILE)
-os.makedirs(logs_path, exist_ok=True)
+LOG_FILE = f"{datetime.now().strftime('%d_%m_%Y, %H_%M_%S')}.log"
+logs_path = os.path.join(os.getcwd(), 'logs')
+
+LOG_FILE_PATH = os.path.join(logs_path, LOG_FILE)
+
+
+class _LazyFileHandler(logging.FileHandler):
+    """Creates the logs directory and file with the first record instead of at import time."""
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
 
-LOG_FILE_PATH=os.path.join(logs_path,LOG_FILE)
 
 logging.basicConfig(
-    filename=LOG_FILE_PATH,
+    handlers=[_LazyFileHandler(LOG_FILE_PATH, delay=True)],
     format="[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s",
     level=logging.INFO,
 )
-
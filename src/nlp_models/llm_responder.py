@@ -0,0 +1,230 @@
+# nlp_models/llm_responder.py
+
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.entity.config_entity import LLMClientConfig
+from src.nlp_models.response_cache import ResponseCache
+
+load_dotenv()
+
+
+class _APIError(Exception):
+    """The endpoint answered, but without a completion; never cached."""
+
+
+class CloudLLM:
+    """
+    A reusable wrapper for sending masked prompts to OpenRouter
+    and receiving masked responses.
+
+    - one keep-alive connection pool per client (requests.Session)
+    - (connect, read) timeouts on every call
+    - 429 / 5xx / connection errors retried with jittered exponential
+      backoff, honoring Retry-After
+    - at most `max_concurrency` requests in flight per client
+    - server-sent-event streaming via stream_prompt
+    - optional ResponseCache: identical masked prompts skip the network
+    """
+
+    RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, model: str = None, config: LLMClientConfig = None, api_key: str = None,
+                 cache: ResponseCache = None):
+        try:
+            self.config = config or LLMClientConfig()
+            self.cache = cache
+            self.url = self.config.url
+            self.model = model or self.config.model
+            self.headers = {
+                "Authorization": f"Bearer {api_key or os.getenv('OPENROUTER_API_KEY')}",
+                "Content-Type": "application/json",
+                "HTTP-Referer": "https://your-site.com",
+                "X-Title": "AI Message Assistant"
+            }
+            self.timeout = (self.config.connect_timeout, self.config.read_timeout)
+
+            # Retries are handled in _post so Retry-After and logging stay in one place
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.config.pool_size,
+                                  pool_block=True, max_retries=0)
+            self.session = requests.Session()
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+            self.session.headers.update(self.headers)
+
+            self._semaphore = threading.BoundedSemaphore(self.config.max_concurrency)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------
+    # HTTP WITH RETRIES
+    # ------------------------------------------------------
+    def _payload(self, prompt: str, stream: bool = False) -> dict:
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ]
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def _backoff(self, attempt: int, response=None) -> float:
+        """Seconds to wait before retry number `attempt` (0-based)."""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.config.backoff_max)
+            except ValueError:
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                    return min(max(delay, 0.0), self.config.backoff_max)
+                except (TypeError, ValueError):
+                    pass
+        # Full jitter: spreads retries of concurrent callers apart
+        return random.uniform(0, min(self.config.backoff_max, self.config.backoff_base * 2 ** attempt))
+
+    def _post(self, payload: dict, stream: bool = False) -> requests.Response:
+        """
+        POSTs the payload, retrying transient failures. Callers hold the
+        concurrency slot, also while backing off, so a rate-limited client
+        slows down as a whole instead of letting other callers hit the limit
+        too. With stream=True only the status line and headers have been
+        read when this returns, so a stream is never retried mid-way.
+        """
+        for attempt in range(self.config.max_retries + 1):
+            last_try = attempt == self.config.max_retries
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last_try:
+                    raise
+                delay = self._backoff(attempt)
+                reason = type(e).__name__
+            else:
+                if response.status_code not in self.RETRY_STATUS or last_try:
+                    return response
+                delay = self._backoff(attempt, response)
+                reason = f"HTTP {response.status_code}"
+                response.close()
+
+            logging.warning(
+                f"[WARN] LLM request failed ({reason}), retry {attempt + 1}/{self.config.max_retries} in {delay:.2f}s"
+            )
+            time.sleep(delay)
+
+    @staticmethod
+    def _iter_sse_data(response):
+        """Yields the data field of every server-sent event; ':' comment lines (keep-alives) are skipped."""
+        data_lines = []
+        for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+            if not line:
+                if data_lines:
+                    yield "\n".join(data_lines)
+                    data_lines = []
+                continue
+            if line.startswith(":"):
+                continue
+            field, _, value = line.partition(":")
+            if field == "data":
+                data_lines.append(value[1:] if value.startswith(" ") else value)
+        if data_lines:
+            yield "\n".join(data_lines)
+
+    # ------------------------------------------------------
+    # PUBLIC API
+    # ------------------------------------------------------
+    def send_prompt(self, prompt: str) -> str:
+        """
+        Sends a masked RAG prompt to the LLM.
+        Returns the response text OR error message.
+        """
+        try:
+            if self.cache is not None:
+                return self.cache.get_or_compute(self.model, prompt, lambda: self._complete(prompt))
+            return self._complete(prompt)
+
+        except _APIError as e:
+            return str(e)
+        except Exception as e:
+            return f"Request Exception: {str(e)}"
+
+    def _complete(self, prompt: str) -> str:
+        with self._semaphore:
+            response = self._post(self._payload(prompt))
+        data = response.json()
+
+        # Successful response
+        if "choices" in data:
+            return data["choices"][0]["message"]["content"]
+
+        # Error case
+        raise _APIError(f"API Error: {data}")
+
+    def stream_prompt(self, prompt: str):
+        """
+        Streams the completion as server-sent events and yields each text
+        delta as soon as it arrives. Raises Project_Exception on an HTTP or
+        in-stream error.
+
+        With a cache, a hit is yielded as a single piece and a stream that
+        completes is stored for next time. Misses go through the cache's
+        in-flight table: a caller asking for a prompt already being streamed
+        (or sent by send_prompt) waits for it instead of opening a second
+        stream, and gets the completed response as one piece.
+        """
+        try:
+            if self.cache is not None:
+                yield from self.cache.stream_or_compute(self.model, prompt, lambda: self._stream(prompt))
+            else:
+                yield from self._stream(prompt)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def _stream(self, prompt: str):
+        with self._semaphore:
+            response = self._post(self._payload(prompt, stream=True), stream=True)
+            with response:
+                if response.status_code != 200:
+                    raise RuntimeError(f"API Error {response.status_code}: {response.text}")
+                # SSE is UTF-8 by definition; requests would otherwise guess
+                response.encoding = "utf-8"
+                for data in self._iter_sse_data(response):
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    if "error" in chunk:
+                        raise RuntimeError(f"API Error: {chunk['error']}")
+                    for choice in chunk.get("choices", []):
+                        content = (choice.get("delta") or {}).get("content")
+                        if content:
+                            yield content
+
+    async def asend_prompt(self, prompt: str) -> str:
+        """
+        Event-loop friendly send_prompt. The blocking call runs in a worker
+        thread, so the pool, retries and concurrency cap are shared with
+        synchronous callers of the same client.
+        """
+        return await asyncio.to_thread(self.send_prompt, prompt)
@@ -0,0 +1,246 @@
+# nlp_models/response_cache.py
+
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.constants import message_pipeline
+
+
+class _Abandoned(Exception):
+    """The leading caller stopped reading its stream before it completed."""
+
+
+class ResponseCache:
+    """
+    Persistent LLM response cache keyed by (model, normalized masked prompt hash).
+
+    Rows live in <cache_dir>/responses.sqlite3 and hold only the key digest
+    and the (still masked) response, never the prompt itself. Entries older
+    than `ttl_seconds` are treated as misses; once more than `max_entries`
+    rows exist the least recently used ones are evicted.
+
+    get_or_compute() and stream_or_compute() are single-flight and share
+    one in-flight table: concurrent callers with the same key wait for the
+    one request (blocking or streamed) already in flight instead of
+    sending their own.
+    """
+
+    FILE_NAME = "responses.sqlite3"
+
+    def __init__(self,
+                 cache_dir: str = os.path.join(message_pipeline.ARTIFACT_DIR_NAME,
+                                               message_pipeline.LLM_CACHE_DIR_NAME),
+                 ttl_seconds: float = message_pipeline.LLM_CACHE_TTL_SECONDS,
+                 max_entries: int = message_pipeline.LLM_CACHE_MAX_ENTRIES):
+        try:
+            self.ttl_seconds = ttl_seconds
+            self.max_entries = max_entries
+            os.makedirs(cache_dir, exist_ok=True)
+            self.path = os.path.join(cache_dir, self.FILE_NAME)
+
+            self._lock = threading.Lock()
+            self._inflight = {}         # key -> Future of the request being made
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL, last_access REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+            self._conn.commit()
+            self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+            self.hits = 0
+            self.misses = 0
+            self.expired = 0
+            self.evictions = 0
+            self.coalesced = 0          # callers served by another caller's in-flight request
+            logging.info(f"[INFO] Opened LLM response cache with {self._size} entries at {self.path}")
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    # ------------------------------------------------------
+    # KEYS
+    # ------------------------------------------------------
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        """Whitespace-only normalization: indentation or line wrapping changes don't split the cache."""
+        return " ".join(str(prompt).split())
+
+    def key(self, model: str, prompt: str) -> str:
+        return hashlib.blake2b(f"{model}\0{self.normalize(prompt)}".encode("utf-8"), digest_size=16).hexdigest()
+
+    # ------------------------------------------------------
+    # GET / PUT
+    # ------------------------------------------------------
+    def get(self, key: str):
+        """Cached response, or None when missing or older than the TTL."""
+        try:
+            now = time.time()
+            with self._lock:
+                row = self._conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if now - row[1] > self.ttl_seconds:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self._size -= 1
+                    self.expired += 1
+                    return None
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                return row[0]
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def put(self, key: str, model: str, response: str):
+        try:
+            now = time.time()
+            with self._lock:
+                cursor = self._conn.execute("INSERT OR IGNORE INTO responses VALUES (?, ?, ?, ?, ?)",
+                                            (key, model, response, now, now))
+                if cursor.rowcount == 0:
+                    self._conn.execute("UPDATE responses SET response = ?, created = ?, last_access = ? WHERE key = ?",
+                                       (response, now, now, key))
+                else:
+                    self._size += 1
+
+                excess = self._size - self.max_entries
+                if excess > 0:
+                    self._conn.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY last_access LIMIT ?)", (excess,)
+                    )
+                    self._size -= excess
+                    self.evictions += excess
+                self._conn.commit()
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def _join(self, key: str):
+        """
+        (leader, future) for `key`: the caller either leads (and must resolve
+        the new future) or follows the request already in flight.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._inflight[key] = Future()
+                self.misses += 1
+                return True, future
+            self.coalesced += 1
+            return False, future
+
+    def _hit(self, key: str):
+        response = self.get(key)
+        if response is not None:
+            with self._lock:
+                self.hits += 1
+        return response
+
+    def get_or_compute(self, model: str, prompt: str, compute):
+        """
+        Returns the cached response for (model, prompt), or calls `compute()`
+        once and caches its result. If `compute` raises, nothing is cached and
+        every caller waiting on it gets the same exception.
+        """
+        key = self.key(model, prompt)
+        while True:
+            response = self._hit(key)
+            if response is not None:
+                return response
+            leader, future = self._join(key)
+            if leader:
+                break
+            try:
+                return future.result()
+            except _Abandoned:
+                continue                # the leader's stream was dropped half-way: take over
+
+        try:
+            # A request that finished between our lookup and taking the lead already cached it
+            response = self.get(key)
+            if response is None:
+                response = compute()
+                self.put(key, model, response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stream_or_compute(self, model: str, prompt: str, stream):
+        """
+        Streaming get_or_compute: yields the cached response as one piece,
+        or leads the request, yielding every piece of `stream()` as it
+        arrives and caching the joined text once the stream completes.
+        Callers that arrive while the same request is in flight wait for
+        it to complete and get the whole response as one piece. If the
+        leader's consumer stops reading early, nothing is cached and one
+        waiting caller takes over the request.
+        """
+        key = self.key(model, prompt)
+        while True:
+            response = self._hit(key)
+            if response is not None:
+                yield response
+                return
+            leader, future = self._join(key)
+            if leader:
+                break
+            try:
+                response = future.result()
+            except _Abandoned:
+                continue
+            yield response
+            return
+
+        try:
+            response = self.get(key)
+            if response is None:
+                pieces = []
+                for piece in stream():
+                    pieces.append(piece)
+                    yield piece
+                response = "".join(pieces)
+                self.put(key, model, response)
+                future.set_result(response)
+                return
+            future.set_result(response)
+        except GeneratorExit:
+            future.set_exception(_Abandoned())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        yield response
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,134 @@
+# pipelines/inference_pipeline.py
+
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import argparse
+import os
+import sys
+from contextlib import contextmanager
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.constants import message_pipeline
+
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
+
+def latest_artifact_dir(root: str = message_pipeline.ARTIFACT_DIR_NAME):
+    """The generation Artifact/CURRENT points at, else the newest run directory holding an index, or None."""
+    if not os.path.isdir(root):
+        return None
+    from src.data_ingestion.manifest import read_current
+    current = read_current(root)
+    if current is not None:
+        return current
+    runs = [os.path.join(root, name) for name in os.listdir(root)
+            if os.path.exists(os.path.join(root, name, "index.faiss"))]
+    return max(runs, key=lambda run: os.path.getmtime(os.path.join(run, "index.faiss")), default=None)
+
+
+class _LazyEmbedder:
+    """Loads the EmbeddingGenerator on the first query that needs a vector."""
+
+    def __init__(self, pipeline, backend):
+        self.pipeline = pipeline
+        self.backend = backend
+        self.generator = None
+
+    def generate_embeddings(self, texts, *args, **kwargs):
+        if self.generator is None:
+            with self.pipeline._timed("load_model"):
+                from src.embedding_service.embedding_generator import EmbeddingGenerator
+                self.generator = EmbeddingGenerator(backend=self.backend)
+        return self.generator.generate_embeddings(texts, *args, **kwargs)
+
+
+class InferencePipeline:
+    """
+    Query-only entry point over an artifact a previous training run built.
+
+    Nothing from ingestion is imported or run: the vector store is loaded
+    with index.faiss / embeddings.npy memory-mapped, the embedding model is
+    only loaded when a query needs a vector (aggregate questions are
+    answered from the column store without it), and the LLM client is
+    optional. Every startup stage is timed in `timings` (seconds).
+    """
+
+    def __init__(self, artifact_dir: str, use_llm: bool = True,
+                 top_k: int = message_pipeline.QUERY_TOP_K,
+                 backend: str = message_pipeline.EMBEDDING_BACKEND):
+        try:
+            self.timings = {"module_import": _IMPORT_SECONDS}
+
+            with self._timed("import"):
+                from src.entity.artifact_entity import DataIngestionArtifact
+                from src.embedding_service.vector_store import VectorStore
+                from src.query_engine.query_handler import QueryHandler
+
+            with self._timed("load_index"):
+                artifact = DataIngestionArtifact(sms_path=None, email_path=None,
+                                                 processed_data_dir=artifact_dir, artifact_dir=artifact_dir)
+                self.store = VectorStore(artifact)
+                self.store.load_index(mmap=True)
+
+            llm = None
+            if use_llm:
+                with self._timed("load_llm"):
+                    from src.nlp_models.llm_responder import CloudLLM
+                    from src.nlp_models.response_cache import ResponseCache
+                    llm = CloudLLM(cache=ResponseCache())
+
+            self.embedder = _LazyEmbedder(self, backend)
+            self.handler = QueryHandler(self.store, self.embedder, llm, top_k=top_k)
+            logging.info(f"[INFO] Inference pipeline ready over {len(self.store.messages)} messages: {self.timings}")
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    @contextmanager
+    def _timed(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - started
+
+    def answer(self, query: str, filters=None, on_text=None) -> dict:
+        """QueryHandler.answer; the first call also records "first_answer" in `timings`."""
+        try:
+            first = "first_answer" not in self.timings
+            with self._timed("answer"):
+                result = self.handler.answer(query, filters, on_text)
+            if first:
+                self.timings["first_answer"] = time.perf_counter() - _IMPORT_STARTED
+            return result
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def report(self) -> str:
+        return "  ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in self.timings.items())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer queries from an existing artifact without re-ingesting")
+    parser.add_argument("query", nargs="*", help="query to answer (interactive prompt if omitted)")
+    parser.add_argument("--artifact-dir", help="run directory holding index.faiss (default: Artifact/CURRENT)")
+    parser.add_argument("--top-k", type=int, default=message_pipeline.QUERY_TOP_K)
+    parser.add_argument("--backend", default=message_pipeline.EMBEDDING_BACKEND)
+    parser.add_argument("--no-llm", action="store_true", help="retrieval and masking only")
+    args = parser.parse_args()
+
+    artifact_dir = args.artifact_dir or latest_artifact_dir()
+    if artifact_dir is None:
+        sys.exit("No built artifact found; run main.py once or pass --artifact-dir.")
+
+    pipeline = InferencePipeline(artifact_dir, use_llm=not args.no_llm, top_k=args.top_k, backend=args.backend)
+    queries = [" ".join(args.query)] if args.query else iter(lambda: input("Query (blank to quit): ").strip(), "")
+    for text in queries:
+        print("Answer: ", end="", flush=True)
+        answer = pipeline.answer(text, on_text=lambda piece: print(piece, end="", flush=True))
+        print()
+        for r in answer["results"]:
+            print(f"{r['rank']}. {r['text']}  (distance {r['distance']:.3f})")
+        print(f"[startup] {pipeline.report()}")
@@ -0,0 +1,159 @@
+# pipelines/train_pipeline.py
+
+import argparse
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.constants import message_pipeline
+from src.entity.artifact_entity import DataIngestionArtifact
+from src.entity.config_entity import ProjectPipelineConfig, DataIngistionConfig
+from src.data_ingestion.data_preprocessor import DataIngestion
+from src.data_ingestion.message_parser import iter_json_array
+from src.data_ingestion.manifest import (
+    SourceManifest, content_id, file_fingerprint, read_current, publish_current, clone_generation,
+    prune_generations,
+)
+from src.embedding_service.vector_store import VectorStore
+
+
+class TrainPipeline:
+    """
+    Builds or refreshes the artifact generation Artifact/CURRENT points at.
+
+    Every generation carries a manifest (see SourceManifest) with the
+    fingerprints of sms.json / emails.json and the content id of each
+    indexed row. A run then:
+
+      - sources unchanged          -> reuses the current generation as is
+      - only new / edited messages -> clones the current generation, embeds
+                                      and appends just the delta
+      - first run, full=True, or too many stale rows (edited / deleted
+        messages still indexed)    -> full ingest + build
+
+    A new generation only becomes visible once it is complete: CURRENT is
+    switched with an atomic rename, and older generations are pruned.
+    """
+
+    def __init__(self, embedder=None, full: bool = False):
+        try:
+            self.project_pipeline_config = ProjectPipelineConfig(datetime.now())
+            self.data_ingestion_config = DataIngistionConfig(self.project_pipeline_config)
+            self.full = full or not self.data_ingestion_config.incremental
+            if embedder is None:
+                from src.embedding_service.embedding_generator import EmbeddingGenerator
+                embedder = EmbeddingGenerator()
+            self.embedder = embedder
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def _sources(self):
+        return {"sms": (self.data_ingestion_config.sms_dir, "messages"),
+                "email": (self.data_ingestion_config.email_dir, "emails")}
+
+    def _raw_messages(self, kind):
+        path, key = self._sources()[kind]
+        if not os.path.exists(path):
+            return
+        yield from iter_json_array(path, key)
+
+    def run(self) -> VectorStore:
+        try:
+            root = self.data_ingestion_config.artifact_root
+            current = read_current(root)
+            previous = SourceManifest.load(current) if current else None
+
+            fingerprints = {
+                kind: file_fingerprint(path, previous.sources.get(kind) if previous else None)
+                for kind, (path, _) in self._sources().items()
+            }
+            if previous is not None and not self.full and previous.same_sources(fingerprints):
+                logging.info(f"[INFO] Sources unchanged since {current}; nothing to ingest.")
+                return self._open(current)
+
+            # Content ids of every message, in the order VectorStore indexes them (SMS, then emails)
+            known = Counter(previous.messages) if previous is not None else Counter()
+            ids, new_ids, delta = [], [], {"sms": [], "email": []}
+            for kind in ("sms", "email"):
+                for message in self._raw_messages(kind):
+                    cid = content_id(kind, message)
+                    ids.append(cid)
+                    if known[cid] > 0:
+                        known[cid] -= 1
+                    else:
+                        new_ids.append(cid)
+                        delta[kind].append(message)
+            stale = sum(known.values())
+
+            rows = len(previous.messages) + len(new_ids) if previous is not None else len(ids)
+            if (previous is None or self.full
+                    or stale / max(rows, 1) > message_pipeline.FULL_REBUILD_STALE_FRACTION):
+                return self._full_build(ids, fingerprints, current)
+            if not new_ids:
+                # Reordered / re-saved files, or only deletions: same rows, refreshed fingerprints
+                previous.sources, previous.stale = fingerprints, stale
+                previous.save(current)
+                logging.info(f"[INFO] No new messages; {stale} stale rows remain in {current}.")
+                return self._open(current)
+            return self._incremental_build(previous, current, delta, new_ids, fingerprints, stale)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def _open(self, artifact_dir):
+        store = VectorStore(DataIngestionArtifact(None, None, artifact_dir, artifact_dir))
+        store.load_index()
+        return store
+
+    def _full_build(self, ids, fingerprints, parent):
+        config = self.data_ingestion_config
+        logging.info(f"[INFO] Full build of {len(ids)} messages into {config.artifact_dir}")
+        artifact = DataIngestion(config).initiate_dataingestion()
+        store = VectorStore(artifact)
+        if config.streaming:
+            # Steps 2 + 3 chunk by chunk, memory bounded by the chunk size
+            store.ingest_stream(self.embedder, config.chunk_size)
+        else:
+            store.load_messages()
+            embeddings, chunk_embeddings, chunk_parents = store.embed_rows(
+                self.embedder, store.messages, start_row=0, show_progress_bar=True
+            )
+            store.save_data(embeddings)
+            store.build_index(embeddings, chunk_embeddings, chunk_parents)
+
+        self._publish(SourceManifest(fingerprints, ids, 0), parent)
+        return store
+
+    def _incremental_build(self, previous, current, delta, new_ids, fingerprints, stale):
+        config = self.data_ingestion_config
+        logging.info(
+            f"[INFO] Incremental build: {len(delta['sms'])} new SMS, {len(delta['email'])} new emails "
+            f"on top of {current} ({stale} stale rows)"
+        )
+        clone_generation(current, config.artifact_dir)
+        artifact = DataIngestion(config).process_delta(delta["sms"], delta["email"])
+        store = VectorStore(artifact)
+        store.load_index()
+        store.ingest_delta(self.embedder, config.chunk_size)
+
+        self._publish(SourceManifest(fingerprints, previous.messages + new_ids, stale), current)
+        return store
+
+    def _publish(self, manifest, parent):
+        config = self.data_ingestion_config
+        manifest.generation = os.path.basename(os.path.normpath(config.artifact_dir))
+        manifest.parent = os.path.basename(os.path.normpath(parent)) if parent else None
+        manifest.save(config.artifact_dir)
+        publish_current(config.artifact_dir, config.artifact_root)
+        prune_generations(config.artifact_root)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or incrementally refresh the current artifact")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and rebuild from scratch")
+    args = parser.parse_args()
+
+    vector_store = TrainPipeline(full=args.full).run()
+    print(f"{len(vector_store.messages)} messages indexed in {vector_store.index_dir}")
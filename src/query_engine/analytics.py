@@ -0,0 +1,245 @@
+# query_engine/analytics.py
+
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.embedding_service.column_store import ColumnStore
+
+
+MONTHS = {name: i for i, name in enumerate(
+    ["january", "february", "march", "april", "may", "june", "july",
+     "august", "september", "october", "november", "december"], start=1)}
+MONTHS.update({name[:3]: i for name, i in list(MONTHS.items())})
+
+TOP_SENDERS_REGEX = re.compile(r'\btop\s+(?:\d+\s+)?senders?\b|\bwho\s+(?:sent|messaged|texted|emailed)\s+(?:me\s+)?(?:the\s+)?most\b|\bmost\s+(?:frequent|active)\s+senders?\b')
+SUM_REGEX = re.compile(r'\bhow\s+much\b|\btotal\b|\bsum\b')
+COUNT_REGEX = re.compile(r'\bhow\s+many\b|\bcount\b|\bnumber\s+of\b')
+DEBIT_REGEX = re.compile(r'\b(?:debit(?:ed|s)?|spent|spend|paid|pay|sent)\b')
+CREDIT_REGEX = re.compile(r'\b(?:credit(?:ed|s)?|received|receive|earned|got|refund(?:ed|s)?)\b')
+TOP_N_REGEX = re.compile(r'\btop\s+(\d+)\b')
+LAST_N_REGEX = re.compile(r'\b(?:last|past)\s+(\d+)\s+(day|week|month)s?\b')
+IN_MONTH_REGEX = re.compile(r'\b(?:in|during|for)\s+(%s)\b(?:\s+(\d{4}))?' % "|".join(MONTHS))
+FROM_REGEX = re.compile(r'\bfrom\s+([a-z][\w.&-]*(?:\s+[a-z][\w.&-]*)?)')
+NON_NAMES = {"me", "my", "i", "the", "a", "an", "this", "last", "past", "all", "in", "during", "today",
+             "yesterday", "week", "month", "year", "total", "everything", "anything", "it", "them",
+             "each", "every", "sms", "email", "emails", "messages", "transactions", "much", "many"}
+TIME_REGEX = re.compile(r'\btoday\b|\byesterday\b|\b(?:this|last)\s+(?:week|month|year)\b')
+AMOUNT_REGEX = re.compile(r'\bamounts?\b|\bmoney\b|\brs\b|\brupees\b|\binr\b')
+SUM_SUBJECT_REGEX = re.compile(r'\btransactions?\b|\bpayments?\b')
+MESSAGES_REGEX = re.compile(r'\bmessages?\b')
+# The object of on / for / of / from ("spend on groceries", "due on my Amazon invoice")
+# must itself be understood, otherwise the columns cannot answer it
+OBJECT_REGEX = re.compile(r'\b(?:on|for|of|from)\s+(?:(?:the|my|a|an|all)\s+)?([a-z0-9][\w.&-]*)')
+WORD_REGEX = re.compile(r"[a-z0-9]+(?:['&.-][a-z0-9]+)*")
+# Words that carry no meaning of their own; every other word must be consumed by an intent,
+# a time phrase or a known sender, or the query goes to the RAG path
+FILLER_WORDS = {"what", "what's", "whats", "is", "was", "were", "are", "be", "been", "the", "a", "an",
+                "my", "me", "i", "i've", "did", "do", "does", "have", "has", "had", "in", "on", "for",
+                "of", "from", "to", "by", "at", "with", "all", "so", "far", "overall", "please", "tell",
+                "show", "give", "can", "could", "you", "how", "which", "who", "there", "get", "it",
+                "and", "till", "until", "now", "during"}
+
+# Query word -> column filter for counts
+COUNT_SUBJECTS = (
+    (re.compile(r'\btransactions?\b|\bpayments?\b'), {"type": "transaction"}),
+    (re.compile(r'\bmeetings?\b'), {"type": "meeting"}),
+    (re.compile(r'\borders?\b|\bdeliver(?:y|ies)\b'), {"type": "order_update"}),
+    (re.compile(r'\breminders?\b'), {"type": "reminder"}),
+    (re.compile(r'\boffers?\b'), {"type": "offer"}),
+    (re.compile(r'\bemails?\b|\bmails?\b'), {"source": "email"}),
+    (re.compile(r'\bsms\b|\btexts?\b'), {"source": "sms"}),
+)
+
+
+class AnalyticsEngine:
+    """
+    Answers aggregate questions ("how much was debited this month", "how
+    many transactions last week", "top senders") straight from the
+    ColumnStore with vectorized NumPy operations: no retrieval, no LLM.
+
+    answer() returns None for anything it does not fully understand, so the
+    caller falls back to the RAG path instead of giving a wrong number.
+    """
+
+    def __init__(self, column_store: ColumnStore):
+        self.column_store = column_store
+
+    # ------------------------------------------------------
+    # INTENT PARSING
+    # ------------------------------------------------------
+    @staticmethod
+    def _time_range(q: str, now: datetime):
+        """(start, end, label) for the time phrase in `q`, or (None, None, "") if there is none."""
+        day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        month = day.replace(day=1)
+
+        if re.search(r'\btoday\b', q):
+            return day, now, "today"
+        if re.search(r'\byesterday\b', q):
+            return day - timedelta(days=1), day - timedelta(microseconds=1), "yesterday"
+        if re.search(r'\bthis\s+week\b', q):
+            return day - timedelta(days=day.weekday()), now, "this week"
+        if re.search(r'\blast\s+week\b', q):
+            start = day - timedelta(days=day.weekday() + 7)
+            return start, start + timedelta(days=7) - timedelta(microseconds=1), "last week"
+        if re.search(r'\bthis\s+month\b', q):
+            return month, now, "this month"
+        if re.search(r'\blast\s+month\b', q):
+            start = (month - timedelta(days=1)).replace(day=1)
+            return start, month - timedelta(microseconds=1), "last month"
+        if re.search(r'\bthis\s+year\b', q):
+            return month.replace(month=1), now, "this year"
+        if re.search(r'\blast\s+year\b', q):
+            start = month.replace(year=month.year - 1, month=1)
+            return start, month.replace(month=1) - timedelta(microseconds=1), "last year"
+
+        match = LAST_N_REGEX.search(q)
+        if match:
+            n, unit = int(match.group(1)), match.group(2)
+            days = n * {"day": 1, "week": 7, "month": 30}[unit]
+            return now - timedelta(days=days), now, f"in the last {n} {unit}{'s' if n != 1 else ''}"
+
+        match = IN_MONTH_REGEX.search(q)
+        if match:
+            m = MONTHS[match.group(1)]
+            year = int(match.group(2)) if match.group(2) else (now.year if m <= now.month else now.year - 1)
+            start = datetime(year, m, 1)
+            end = datetime(year + (m == 12), m % 12 + 1, 1) - timedelta(microseconds=1)
+            return start, end, f"in {start.strftime('%B %Y')}"
+
+        return None, None, ""
+
+    def _resolve_sender(self, q: str):
+        """
+        (sender filter, matched span) for "from <name>" if <name> is a known
+        sender; (False, None) if it names an unknown one, (None, None) if there is none.
+        """
+        match = FROM_REGEX.search(q)
+        if not match:
+            return None, None
+        words = match.group(1).split()
+        if words[0] in NON_NAMES:
+            return None, None
+        for candidate in (" ".join(words), words[0]):
+            senders = [s for s in self.column_store.senders if s and (s == candidate or s.startswith(candidate))]
+            if senders:
+                return senders, (match.start(), match.start(1) + len(candidate))
+        return False, None
+
+    @staticmethod
+    def _fully_consumed(q: str, spans) -> bool:
+        """True if every word of `q` lies in one of `spans` or is a filler word, and every on/for/of/from object lies in a span."""
+        def consumed(pos):
+            return any(start <= pos < end for start, end in spans)
+
+        for match in WORD_REGEX.finditer(q):
+            if not consumed(match.start()) and match.group(0) not in FILLER_WORDS:
+                return False
+        return all(consumed(match.start(1)) for match in OBJECT_REGEX.finditer(q))
+
+    def parse(self, query: str, now: datetime = None) -> Optional[Dict]:
+        """
+        {"op", "filters", "label", "n"} for a recognized aggregate question,
+        else None. Every word must be accounted for: a query that also says
+        what was bought or which document is meant ("spend on groceries",
+        "amount due on my Amazon invoice") is not an aggregate over the columns.
+        """
+        q = " ".join(query.lower().split())
+        now = now or datetime.now()
+
+        if TOP_SENDERS_REGEX.search(q):
+            op = "top_senders"
+            regexes = [TOP_SENDERS_REGEX, TOP_N_REGEX, MESSAGES_REGEX]
+        elif SUM_REGEX.search(q) and (DEBIT_REGEX.search(q) or CREDIT_REGEX.search(q) or AMOUNT_REGEX.search(q)):
+            op = "sum"
+            regexes = [SUM_REGEX, DEBIT_REGEX, CREDIT_REGEX, AMOUNT_REGEX, SUM_SUBJECT_REGEX]
+        elif COUNT_REGEX.search(q):
+            op = "count"
+            regexes = [COUNT_REGEX, DEBIT_REGEX, CREDIT_REGEX] + [regex for regex, _ in COUNT_SUBJECTS]
+        else:
+            return None
+
+        filters = {}
+        sender, sender_span = self._resolve_sender(q)
+        if sender is False:
+            return None
+        if sender:
+            filters["sender"] = sender
+
+        spans = [match.span() for regex in regexes + [TIME_REGEX, LAST_N_REGEX, IN_MONTH_REGEX]
+                 for match in regex.finditer(q)]
+        if sender_span:
+            spans.append(sender_span)
+        if not self._fully_consumed(q, spans):
+            return None
+
+        if op == "sum":
+            if DEBIT_REGEX.search(q) and not CREDIT_REGEX.search(q):
+                filters["action"] = "debited"
+            elif CREDIT_REGEX.search(q) and not DEBIT_REGEX.search(q):
+                filters["action"] = "credited"
+        elif op == "count":
+            subjects = [f for regex, f in COUNT_SUBJECTS if regex.search(q)]
+            if not subjects:
+                return None
+            for subject in subjects:
+                for key, value in subject.items():
+                    filters.setdefault(key, value)
+            if filters.get("type") == "transaction":
+                if DEBIT_REGEX.search(q) and not CREDIT_REGEX.search(q):
+                    filters["action"] = "debited"
+                elif CREDIT_REGEX.search(q) and not DEBIT_REGEX.search(q):
+                    filters["action"] = "credited"
+
+        start, end, label = self._time_range(q, now)
+        if start is not None:
+            filters["start"], filters["end"] = start, end
+
+        top_n = TOP_N_REGEX.search(q)
+        return {"op": op, "filters": filters, "label": label, "n": int(top_n.group(1)) if top_n else 5}
+
+    # ------------------------------------------------------
+    # ANSWER
+    # ------------------------------------------------------
+    def answer(self, query: str, now: datetime = None) -> Optional[Dict]:
+        """
+        Returns {"intent", "filters", "value", "text", "seconds"} for a
+        recognized aggregate question, or None.
+        """
+        try:
+            started = time.perf_counter()
+            intent = self.parse(query, now)
+            if intent is None:
+                return None
+
+            filters, label = intent["filters"], intent["label"]
+            suffix = f" {label}" if label else ""
+            if filters.get("sender"):
+                suffix = f" from {', '.join(filters['sender'])}{suffix}"
+
+            if intent["op"] == "sum":
+                value = self.column_store.sum_amount(filters)
+                what = {"debited": "Total debited", "credited": "Total credited"}.get(filters.get("action"), "Total amount")
+                text = f"{what}{suffix}: Rs. {value['total']:,.2f} across {value['count']} transaction{'s' if value['count'] != 1 else ''}."
+            elif intent["op"] == "count":
+                value = self.column_store.count(filters)
+                subject = filters.get("type") or filters.get("source") or "message"
+                subject = {"order_update": "order update", "email": "email", "sms": "SMS"}.get(subject, subject)
+                if filters.get("action"):
+                    subject = f"{filters['action']} {subject}"
+                text = f"{value} {subject}{'s' if value != 1 and subject != 'SMS' else ''}{suffix}."
+            else:
+                value = self.column_store.top_senders(filters, n=intent["n"])
+                listed = ", ".join(f"{sender} ({int(count)})" for sender, count in value)
+                text = f"Top senders{suffix}: {listed}." if value else f"No messages{suffix}."
+
+            seconds = time.perf_counter() - started
+            logging.info(f"[INFO] Answered '{query}' locally ({intent['op']}) in {seconds * 1000:.2f} ms")
+            return {"intent": intent["op"], "filters": filters, "value": value, "text": text, "seconds": seconds}
+        except Exception as e:
+            raise Project_Exception(e, sys)
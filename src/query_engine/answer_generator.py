@@ -0,0 +1,96 @@
+# query_engine/answer_generator.py
+
+import re
+from typing import Dict, Iterable, List
+
+from src.query_engine.entity_extractor import EntityExtractor
+
+
+PLACEHOLDER_REGEX = re.compile(r'#(%s)_(\d+)' % "|".join(EntityExtractor.ENTITY_TYPES))
+
+
+def build_prompt(query: str, masked_messages: List[str]) -> str:
+    """RAG prompt for the cloud LLM; only masked message texts ever go into it."""
+    return f"""
+        You are a natural-language reasoning assistant for a RAG system.
+
+        IMPORTANT RULES:
+        - The text contains masked entities like #amount, #receiver, #date.
+        - These placeholders MUST remain EXACTLY as they appear.
+        - NEVER replace, modify, create, or remove placeholders.
+        - Never hallucinate real names, numbers, dates, or apps.
+        - Only summarize or compute using the placeholders given.
+        - Ignore messages that do NOT contain #amount if question is about payments.
+        - If total cannot be calculated because placeholders are the same, say so.
+
+        USER QUERY:
+        {query}
+
+        RETRIEVED MESSAGES:
+        {masked_messages}
+
+        TASK:
+        - Identify which messages represent payments.
+        - Use only the placeholders to calculate.
+        - If multiple different #amount placeholders exist, express total as (#amount + #amount).
+        - If the same placeholder repeats, say: 
+        "Both payments use the placeholder #amount, so the total cannot be calculated."
+
+        Give final answer in 1–2 sentences.
+        """
+
+
+def refill_placeholders(text: str, placeholder_map: Dict) -> str:
+    """Puts the real values back for every #<type>_<n> found in placeholder_map; unknown ones stay as they are."""
+    def real_value(match):
+        return str(placeholder_map.get(f"{match.group(1)}_{match.group(2)}", match.group(0)))
+    return PLACEHOLDER_REGEX.sub(real_value, text)
+
+
+class PlaceholderRefiller:
+    """
+    Incremental refill for a token stream.
+
+    feed() returns everything that can already be shown with real values;
+    only a trailing piece that may still turn into a placeholder ("#amo",
+    "#amount_", "#amount_1" which could become "#amount_12") is held back
+    until the next delta decides it. flush() releases the rest at the end.
+    """
+
+    def __init__(self, placeholder_map: Dict):
+        self.placeholder_map = placeholder_map
+        self._pending = ""
+
+    @staticmethod
+    def _maybe_partial(tail: str) -> bool:
+        """True if `tail` (starting at '#', running to the end of the buffer) could still grow into a placeholder."""
+        name, sep, digits = tail[1:].partition("_")
+        if not sep:
+            return any(kind.startswith(name) for kind in EntityExtractor.ENTITY_TYPES)
+        return name in EntityExtractor.ENTITY_TYPES and (digits == "" or digits.isdigit())
+
+    def feed(self, delta: str) -> str:
+        buffer = self._pending + delta
+        cut = len(buffer)
+        # A partial placeholder has no '#' after its own, so only the last one can be partial
+        hash_pos = buffer.rfind("#")
+        if hash_pos != -1 and self._maybe_partial(buffer[hash_pos:]):
+            cut = hash_pos
+        self._pending = buffer[cut:]
+        return refill_placeholders(buffer[:cut], self.placeholder_map)
+
+    def flush(self) -> str:
+        rest, self._pending = self._pending, ""
+        return refill_placeholders(rest, self.placeholder_map)
+
+
+def refill_stream(deltas: Iterable[str], placeholder_map: Dict):
+    """Wraps a stream of text deltas (e.g. CloudLLM.stream_prompt) and yields refilled text as early as possible."""
+    refiller = PlaceholderRefiller(placeholder_map)
+    for delta in deltas:
+        text = refiller.feed(delta)
+        if text:
+            yield text
+    text = refiller.flush()
+    if text:
+        yield text
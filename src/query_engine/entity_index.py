@@ -0,0 +1,154 @@
+# query_engine/entity_index.py
+
+import os
+import sys
+import threading
+from array import array
+from typing import Dict, List
+import numpy as np
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.utils.atomic_io import atomic_open, verify_checksum
+from src.query_engine.entity_extractor import EntityExtractor
+
+
+class EntityIndex:
+    """
+    Per-message entity table filled once at ingestion time, so retrieved
+    messages can be masked without running any regex at query time.
+
+    Row i holds the entity spans and values of message i, stored as flat
+    arrays with per-row offsets. On disk, next to index.faiss:
+      - entities.npz : span_offsets / span_kinds / span_starts / span_ends
+                       entity_offsets / entity_kinds / entity_values
+    Kinds are positions in EntityExtractor.ENTITY_TYPES.
+    """
+
+    FILE_NAME = "entities.npz"
+    KIND_IDS = {kind: i for i, kind in enumerate(EntityExtractor.ENTITY_TYPES)}
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.span_offsets = array("q", [0])
+        self.span_kinds = array("B")
+        self.span_starts = array("i")
+        self.span_ends = array("i")
+        self.entity_offsets = array("q", [0])
+        self.entity_kinds = array("B")
+        self.entity_values = []
+
+    def __len__(self):
+        return len(self.span_offsets) - 1
+
+    # ------------------------------------------------------
+    # BUILD / UPDATE
+    # ------------------------------------------------------
+    def build(self, texts):
+        with self._lock:
+            self._reset()
+            self._add(texts)
+        logging.info(f"[INFO] Built entity index over {len(self)} messages ({len(self.span_kinds)} spans).")
+
+    def add(self, texts):
+        with self._lock:
+            self._add(texts)
+
+    def _add(self, texts):
+        for text in texts:
+            entities, spans = EntityExtractor.scan(text)
+            for kind, start, end in spans:
+                self.span_kinds.append(self.KIND_IDS[kind])
+                self.span_starts.append(start)
+                self.span_ends.append(end)
+            self.span_offsets.append(len(self.span_kinds))
+            for kind, value in entities.items():
+                self.entity_kinds.append(self.KIND_IDS[kind])
+                self.entity_values.append(value)
+            self.entity_offsets.append(len(self.entity_kinds))
+
+    # ------------------------------------------------------
+    # LOOKUP
+    # ------------------------------------------------------
+    def spans(self, row: int):
+        lo, hi = self.span_offsets[row], self.span_offsets[row + 1]
+        types = EntityExtractor.ENTITY_TYPES
+        return [(types[self.span_kinds[i]], self.span_starts[i], self.span_ends[i]) for i in range(lo, hi)]
+
+    def entities(self, row: int) -> Dict:
+        lo, hi = self.entity_offsets[row], self.entity_offsets[row + 1]
+        types = EntityExtractor.ENTITY_TYPES
+        return {types[self.entity_kinds[i]]: self.entity_values[i] for i in range(lo, hi)}
+
+    def mask(self, row_ids: List[int], texts: List[str], start: int = 1) -> Dict:
+        """
+        Same output as EntityExtractor.extract_entities_from_messages, built
+        from the stored spans. Placeholders are renumbered by position in
+        `row_ids` (first result -> _1), not by row id.
+        """
+        try:
+            all_placeholders = {}
+            masked_messages = []
+            with self._lock:
+                for idx, (row, text) in enumerate(zip(row_ids, texts), start=start):
+                    if row < len(self):
+                        entities, spans = self.entities(row), self.spans(row)
+                    else:
+                        # Row not indexed yet (e.g. added by another process): scan it now
+                        entities, spans = EntityExtractor.scan(text)
+                    all_placeholders.update(EntityExtractor.assign_placeholders(entities, idx))
+                    masked_messages.append(EntityExtractor.mask_spans(text, spans, idx))
+            return {
+                "masked_messages": masked_messages,
+                "placeholder_map": all_placeholders
+            }
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    # ------------------------------------------------------
+    # PERSISTENCE
+    # ------------------------------------------------------
+    def save(self, index_dir: str, rows: int = None):
+        """Writes rows 0..rows-1 (default: every row)."""
+        try:
+            path = os.path.join(index_dir, self.FILE_NAME)
+            with self._lock:
+                rows = len(self) if rows is None else min(rows, len(self))
+                spans, entities = self.span_offsets[rows], self.entity_offsets[rows]
+                # Copies, not buffer views: add() cannot grow an array that still exports one
+                arrays = {
+                    "span_offsets": np.array(self.span_offsets[:rows + 1], dtype=np.int64),
+                    "span_kinds": np.array(self.span_kinds[:spans], dtype=np.uint8),
+                    "span_starts": np.array(self.span_starts[:spans], dtype=np.int32),
+                    "span_ends": np.array(self.span_ends[:spans], dtype=np.int32),
+                    "entity_offsets": np.array(self.entity_offsets[:rows + 1], dtype=np.int64),
+                    "entity_kinds": np.array(self.entity_kinds[:entities], dtype=np.uint8),
+                    "entity_values": np.array(self.entity_values[:entities], dtype=str),
+                }
+                with atomic_open(path) as f:
+                    np.savez(f, **arrays)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def load(self, index_dir: str) -> bool:
+        """Loads a saved table; returns False if the artifact has none yet."""
+        try:
+            path = os.path.join(index_dir, self.FILE_NAME)
+            if not os.path.exists(path) or not verify_checksum(path):
+                return False
+            with self._lock:
+                self._reset()
+                with np.load(path) as data:
+                    self.span_offsets = array("q", data["span_offsets"].astype(np.int64).tobytes())
+                    self.span_kinds = array("B", data["span_kinds"].astype(np.uint8).tobytes())
+                    self.span_starts = array("i", data["span_starts"].astype(np.int32).tobytes())
+                    self.span_ends = array("i", data["span_ends"].astype(np.int32).tobytes())
+                    self.entity_offsets = array("q", data["entity_offsets"].astype(np.int64).tobytes())
+                    self.entity_kinds = array("B", data["entity_kinds"].astype(np.uint8).tobytes())
+                    self.entity_values = data["entity_values"].tolist()
+            return True
+        except Exception as e:
+            raise Project_Exception(e, sys)
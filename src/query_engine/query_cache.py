@@ -0,0 +1,170 @@
+# query_engine/query_cache.py
+
+import json
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+import faiss
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.constants import message_pipeline
+
+
+class QueryCache:
+    """
+    Small in-memory cache of recent query embeddings -> retrieval results
+    and final answer, so rephrasings of a question ("how much did I pay
+    Rajesh" / "total paid to Rajesh") skip search, masking and the LLM.
+
+    - lookup: cosine similarity over normalized query embeddings
+      (FAISS IndexFlatIP); a hit needs similarity >= `threshold` and the
+      same top_k / filters
+    - invalidation: attach with VectorStore.add_listener(cache.on_store_event).
+      Appended rows drop only the entries whose result list they would
+      enter (closer to the query than the entry's last hit); a rebuild
+      clears everything. Every entry also remembers the store generation
+      it was computed at and is ignored if the store moved on without
+      telling the cache.
+    """
+
+    def __init__(self, dim: int,
+                 threshold: float = message_pipeline.QUERY_CACHE_SIMILARITY,
+                 max_entries: int = message_pipeline.QUERY_CACHE_MAX_ENTRIES,
+                 candidates: int = message_pipeline.QUERY_CACHE_CANDIDATES):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.candidates = candidates
+
+        self._lock = threading.Lock()
+        self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        self._entries = OrderedDict()       # entry id -> entry dict, least recently used first
+        self._next_id = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _signature(top_k, filters) -> str:
+        return json.dumps([top_k, filters or {}], sort_keys=True, default=str)
+
+    def _normalized(self, query_embedding):
+        vector = np.ascontiguousarray(np.asarray(query_embedding, dtype="float32").reshape(1, self.dim))
+        faiss.normalize_L2(vector)
+        return vector
+
+    # ------------------------------------------------------
+    # LOOKUP / INSERT
+    # ------------------------------------------------------
+    def lookup(self, query_embedding, top_k, filters=None, generation=None):
+        """Cached entry for a near-duplicate query, or None."""
+        try:
+            vector = self._normalized(query_embedding)
+            signature = self._signature(top_k, filters)
+            with self._lock:
+                if self._entries:
+                    sims, ids = self._index.search(vector, min(self.candidates, len(self._entries)))
+                    for sim, entry_id in zip(sims[0].tolist(), ids[0].tolist()):
+                        if sim < self.threshold:
+                            break
+                        entry = self._entries.get(entry_id)
+                        if entry is None or entry["signature"] != signature:
+                            continue
+                        if generation is not None and entry["generation"] != generation:
+                            continue
+                        self._entries.move_to_end(entry_id)
+                        self.hits += 1
+                        return entry
+                self.misses += 1
+                return None
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def put(self, query: str, query_embedding, top_k, filters, results, masked=None, answer=None, generation=None):
+        """
+        Caches one pipeline run; `results` are VectorStore.search results (their
+        distances drive invalidation), `masked` the mask_results output.
+        """
+        try:
+            vector = self._normalized(query_embedding)
+            # Squared L2 of the last hit: a new row closer than this would enter the results
+            cutoff = results[-1]["distance"] if len(results) >= top_k and results else np.inf
+            with self._lock:
+                entry_id = self._next_id
+                self._next_id += 1
+                self._entries[entry_id] = {
+                    "query": query,
+                    "embedding": np.asarray(query_embedding, dtype="float32").reshape(self.dim),
+                    "signature": self._signature(top_k, filters),
+                    "results": results,
+                    "masked": masked,
+                    "answer": answer,
+                    "generation": generation,
+                    "cutoff": cutoff,
+                }
+                self._index.add_with_ids(vector, np.array([entry_id], dtype="int64"))
+                while len(self._entries) > self.max_entries:
+                    oldest, _ = self._entries.popitem(last=False)
+                    self._index.remove_ids(np.array([oldest], dtype="int64"))
+                return self._entries[entry_id]
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index.reset()
+
+    # ------------------------------------------------------
+    # INVALIDATION
+    # ------------------------------------------------------
+    def on_store_event(self, event: str, generation: int, embeddings=None):
+        """
+        VectorStore listener. "append" drops entries the new rows would
+        change and moves the rest to `generation`; "rebuild" clears the cache.
+        """
+        try:
+            with self._lock:
+                if event != "append" or embeddings is None:
+                    self.invalidations += len(self._entries)
+                    self._entries.clear()
+                    self._index.reset()
+                    return
+                if not self._entries:
+                    return
+
+                entry_ids = list(self._entries)
+                queries = np.stack([self._entries[i]["embedding"] for i in entry_ids])
+                rows = np.asarray(embeddings, dtype="float32").reshape(-1, self.dim)
+                # Squared L2 from every cached query to its closest new row, same metric as the index
+                sq = (queries ** 2).sum(1)[:, None] - 2 * queries @ rows.T + (rows ** 2).sum(1)[None, :]
+                closest = sq.min(axis=1)
+
+                stale = [i for i, d in zip(entry_ids, closest.tolist()) if d <= self._entries[i]["cutoff"]]
+                for entry_id in stale:
+                    del self._entries[entry_id]
+                if stale:
+                    self._index.remove_ids(np.array(stale, dtype="int64"))
+                    self.invalidations += len(stale)
+                    logging.info(f"[INFO] Query cache: {len(stale)} entries invalidated by new messages.")
+                for entry in self._entries.values():
+                    entry["generation"] = generation
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,89 @@
+# query_engine/query_handler.py
+
+import sys
+import time
+
+from src.exception.exception import Project_Exception
+from src.logging.logger import logging
+from src.constants import message_pipeline
+from src.query_engine.query_cache import QueryCache
+from src.query_engine.analytics import AnalyticsEngine
+from src.query_engine.answer_generator import build_prompt, refill_stream
+
+
+class QueryHandler:
+    """
+    Runs a user query through the whole pipeline:
+    analytics fast path -> embed -> semantic cache -> search -> mask -> LLM -> refill.
+
+    Aggregate questions AnalyticsEngine recognizes ("how much was debited
+    this month") are answered from the column store, before any embedding.
+    A near-duplicate of a recent query (see QueryCache) returns the cached
+    results and answer right after the query embedding, skipping search,
+    masking and the LLM round trip.
+    """
+
+    def __init__(self, store, embedder, llm=None, query_cache: QueryCache = None,
+                 top_k: int = message_pipeline.QUERY_TOP_K):
+        try:
+            self.store = store
+            self.embedder = embedder
+            self.llm = llm
+            self.top_k = top_k
+            if self.store.index is None:
+                self.store.load_index()
+            self.query_cache = query_cache or QueryCache(self.store.index.d)
+            self.store.add_listener(self.query_cache.on_store_event)
+            self.analytics = AnalyticsEngine(self.store.column_store)
+        except Exception as e:
+            raise Project_Exception(e, sys)
+
+    def answer(self, query: str, filters=None, on_text=None) -> dict:
+        """
+        Returns {"query", "results", "masked", "answer", "cached", "local", "seconds"}.
+        `on_text` receives the refilled answer piece by piece as it streams
+        (a cached answer arrives as one piece). Without an LLM only the
+        retrieval part runs and "answer" is None.
+        """
+        try:
+            started = time.perf_counter()
+            local = self.analytics.answer(query)
+            if local is not None:
+                if on_text is not None:
+                    on_text(local["text"])
+                return {"query": query, "results": [], "masked": None, "answer": local["text"],
+                        "cached": False, "local": True, "seconds": time.perf_counter() - started}
+
+            query_embedding = self.embedder.generate_embeddings([query], show_progress_bar=False, cache=False)
+
+            entry = self.query_cache.lookup(query_embedding, self.top_k, filters, self.store.generation)
+            if entry is not None and (entry["answer"] is not None or self.llm is None):
+                if on_text is not None and entry["answer"]:
+                    on_text(entry["answer"])
+                seconds = time.perf_counter() - started
+                logging.info(f"[INFO] Query cache hit for '{query}' (cached from '{entry['query']}') in {seconds * 1000:.1f} ms")
+                return {"query": query, "results": entry["results"], "masked": entry["masked"],
+                        "answer": entry["answer"], "cached": True, "local": False, "seconds": seconds}
+
+            # Captured before searching: rows appended meanwhile make this entry stale
+            generation = self.store.generation
+            results = self.store.search(query_embedding, top_k=self.top_k, filters=filters)
+            masked = self.store.mask_results(results)
+
+            answer = None
+            if self.llm is not None:
+                prompt = build_prompt(query, masked["masked_messages"])
+                pieces = []
+                for piece in refill_stream(self.llm.stream_prompt(prompt), masked["placeholder_map"]):
+                    pieces.append(piece)
+                    if on_text is not None:
+                        on_text(piece)
+                answer = "".join(pieces)
+
+            self.query_cache.put(query, query_embedding, self.top_k, filters, results, masked, answer, generation)
+            seconds = time.perf_counter() - started
+            logging.info(f"[INFO] Answered '{query}' in {seconds * 1000:.1f} ms")
+            return {"query": query, "results": results, "masked": masked,
+                    "answer": answer, "cached": False, "local": False, "seconds": seconds}
+        except Exception as e:
+            raise Project_Exception(e, sys)
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+
+from src.logging.logger import logging
+from src.constants import message_pipeline
+
+CHECKSUM_SUFFIX = message_pipeline.ARTIFACT_CHECKSUM_SUFFIX
+DIRTY_MARKER = message_pipeline.ARTIFACT_DIRTY_MARKER
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fsync_dir(path: str):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def commit_tmp(path: str):
+    """
+    Publishes `path + ".tmp"` (already written and closed) as `path`.
+    The sha256 goes to `path + ".sha256"`: first to its own temp file, then
+    the data and the checksum are renamed in that order, so a crash between
+    the two renames is recognised by verify_checksum and rolled forward.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "rb+") as f:
+        os.fsync(f.fileno())
+    sum_path = path + CHECKSUM_SUFFIX
+    with open(sum_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(file_sha256(tmp_path) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    os.replace(sum_path + ".tmp", sum_path)
+    _fsync_dir(path)
+
+
+@contextmanager
+def atomic_open(path: str, mode: str = "wb", encoding: str = None):
+    """
+    open() for writing an artifact file: the caller writes `path + ".tmp"`,
+    which replaces `path` (with its checksum) only if the block succeeds.
+    """
+    tmp_path = path + ".tmp"
+    f = open(tmp_path, mode, encoding=encoding)
+    try:
+        yield f
+    except BaseException:
+        f.close()
+        os.remove(tmp_path)
+        raise
+    f.close()
+    commit_tmp(path)
+
+
+def write_bytes_atomic(path: str, data: bytes):
+    with atomic_open(path, "wb") as f:
+        f.write(data)
+
+
+def write_json_atomic(path: str, obj, **kwargs):
+    with atomic_open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, **kwargs)
+
+
+def is_dirty(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, DIRTY_MARKER))
+
+
+@contextmanager
+def marked_dirty(directory: str):
+    """
+    Marks `directory` dirty while the block rewrites its files. The marker
+    is only removed when the block finishes, so after a crash or an error
+    the next load knows to verify checksums.
+    """
+    marker = os.path.join(directory, DIRTY_MARKER)
+    with open(marker, "w", encoding="utf-8") as f:
+        f.write(f"{os.getpid()}\n")
+        f.flush()
+        os.fsync(f.fileno())
+    _fsync_dir(marker)
+    yield
+    os.remove(marker)
+    _fsync_dir(marker)
+
+
+def verify_checksum(path: str, verify: bool = None) -> bool:
+    """
+    True when `path` matches its recorded sha256, or has none (written
+    before checksums). Hashing reads the whole file, so by default it only
+    runs after an unclean shutdown: when the directory is marked dirty or a
+    checksum is still pending from an interrupted commit_tmp (which is then
+    completed here). verify=True / False forces it on / off.
+    """
+    sum_path = path + CHECKSUM_SUFFIX
+    pending = sum_path + ".tmp"
+    if not os.path.exists(sum_path):
+        return True
+    if verify is None:
+        verify = (message_pipeline.ARTIFACT_VERIFY_CHECKSUMS or os.path.exists(pending)
+                  or is_dirty(os.path.dirname(os.path.abspath(path))))
+    if not verify:
+        return True
+    digest = file_sha256(path)
+    with open(sum_path, "r", encoding="utf-8") as f:
+        if f.read().strip() == digest:
+            return True
+    if os.path.exists(pending):
+        with open(pending, "r", encoding="utf-8") as f:
+            if f.read().strip() == digest:
+                os.replace(pending, sum_path)
+                return True
+    logging.warning(f"[WARN] Checksum mismatch for {path}")
+    return False
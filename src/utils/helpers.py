@@ -0,0 +1,82 @@
+import math
+from datetime import datetime, date, timedelta
+from email.utils import parsedate_to_datetime
+
+DATE_FORMATS = ("%d %B %Y", "%d %b %Y", "%d/%m/%Y", "%d-%m-%Y")
+
+
+def to_epoch(value) -> float:
+    """
+    Converts a message timestamp to epoch seconds.
+    Accepts ISO strings ("2025-11-07T10:05:00", "2025-11-07"), RFC 2822 email
+    dates, datetime/date objects and numbers. Returns NaN when it cannot parse.
+    """
+    if value is None or value == "":
+        return math.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day).timestamp()
+
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(text).timestamp()
+    except (TypeError, ValueError):
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            continue
+    return math.nan
+
+
+def _date_only(value):
+    """The date of a value that names a day without a time ("2025-11-07", date objects), else None."""
+    if isinstance(value, datetime):
+        return None
+    if isinstance(value, date):
+        return value
+    if not isinstance(value, str):
+        return None
+    text = value.strip()
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def to_end_epoch(value):
+    """
+    Upper bound of an "end" filter as (epoch seconds, inclusive). A day
+    without a time covers the whole day: (midnight after it, False), so
+    end="2025-11-07" keeps messages sent at 18:00 that day.
+    """
+    day = _date_only(value)
+    if day is not None:
+        return (datetime(day.year, day.month, day.day) + timedelta(days=1)).timestamp(), False
+    return to_epoch(value), True
+
+
+def iter_chunks(items, chunk_size: int):
+    """Groups any iterable into lists of at most `chunk_size` items."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -1,10 +1,31 @@
 from src.logging.logger import logging
 from src.exception.exception import Project_Exception
+from src.utils.helpers import iter_chunks
 import sys
 
+import os
 import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Iterable, Iterator, List
+
+
+# -----------------------------
+# PRECOMPILED PATTERNS
+# -----------------------------
+RS_REGEX = re.compile(r'rs\.?')
+PUNCTUATION_REGEX = re.compile(r'[^a-z0-9\s\.\:\%]')
+WHITESPACE_REGEX = re.compile(r'\s+')
+
+SMS_AMOUNT_REGEX = re.compile(r'rs[\s\.]?\s?([0-9,]+)')
+ORDER_ID_REGEX = re.compile(r'order\s*#?(\d+)')
+DELIVERY_REGEX = re.compile(r'deliver(?:ed|y)?\s*(?:by|on)?\s*([a-z0-9\s:]+)')
+
+MEETING_TIME_REGEX = re.compile(r'(\d{1,2}\s?(?:am|pm|a\.m\.|p\.m\.))')
+MEETING_DAY_REGEX = re.compile(r'(monday|tuesday|wednesday|thursday|friday|saturday|sunday|tomorrow)')
+ONBOARDING_REGEX = re.compile(r'onboarding\s+on\s+([0-9]{1,2}(?:st|nd|rd|th)?\s+\w+)')
 
 
 
@@ -26,14 +47,14 @@ def preprocess_text(text: str) -> str:
         text = text.lower()
         
         # 2. Normalize "Rs.", "₹" etc.
-        text = re.sub(r'rs\.?', 'rs', text)
+        text = RS_REGEX.sub('rs', text)
         text = text.replace('₹', 'rs')
         
         # 3. Remove unnecessary punctuation (keep numbers, %, ., and : for timestamps)
-        text = re.sub(r'[^a-z0-9\s\.\:\%]', ' ', text)
+        text = PUNCTUATION_REGEX.sub(' ', text)
         
         # 4. Collapse multiple spaces
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = WHITESPACE_REGEX.sub(' ', text).strip()
         
         return text
     
@@ -63,7 +84,7 @@ def analyze_sms(message: Dict) -> Dict:
         }
 
         # Detect transaction SMS
-        match_amount = re.search(r'rs[\s\.]?\s?([0-9,]+)', clean_text)
+        match_amount = SMS_AMOUNT_REGEX.search(clean_text)
         if "debited" in clean_text or "credited" in clean_text:
             info["type"] = "transaction"
             if match_amount:
@@ -77,10 +98,10 @@ def analyze_sms(message: Dict) -> Dict:
         # Detect order/delivery SMS
         elif "order" in clean_text or "delivered" in clean_text:
             info["type"] = "order_update"
-            order_match = re.search(r'order\s*#?(\d+)', clean_text)
+            order_match = ORDER_ID_REGEX.search(clean_text)
             if order_match:
                 info["details"]["order_id"] = order_match.group(1)
-            delivery_match = re.search(r'deliver(?:ed|y)?\s*(?:by|on)?\s*([a-z0-9\s:]+)', clean_text)
+            delivery_match = DELIVERY_REGEX.search(clean_text)
             if delivery_match:
                 info["details"]["delivery_time"] = delivery_match.group(1).strip()
 
@@ -119,8 +140,8 @@ def analyze_email(email: Dict) -> Dict:
         # --- Detect meeting reminders ---
         if "meeting" in clean_text or "schedule" in clean_text or "review" in clean_text:
             info["type"] = "meeting"
-            time_match = re.search(r'(\d{1,2}\s?(?:am|pm|a\.m\.|p\.m\.))', clean_text)
-            day_match = re.search(r'(monday|tuesday|wednesday|thursday|friday|saturday|sunday|tomorrow)', clean_text)
+            time_match = MEETING_TIME_REGEX.search(clean_text)
+            day_match = MEETING_DAY_REGEX.search(clean_text)
             if time_match:
                 info["details"]["time"] = time_match.group(1)
             if day_match:
@@ -129,7 +150,7 @@ def analyze_email(email: Dict) -> Dict:
         # --- Detect offer / internship / onboarding ---
         elif "offer" in clean_text or "internship" in clean_text or "selected" in clean_text:
             info["type"] = "offer"
-            join_match = re.search(r'onboarding\s+on\s+([0-9]{1,2}(?:st|nd|rd|th)?\s+\w+)', clean_text)
+            join_match = ONBOARDING_REGEX.search(clean_text)
             if join_match:
                 info["details"]["onboarding_date"] = join_match.group(1)
 
@@ -144,3 +165,87 @@ def analyze_email(email: Dict) -> Dict:
         return info
     except Exception as e:
         raise Project_Exception(e,sys)
+
+
+
+def analyze_sms_stream(messages: Iterable[Dict]) -> Iterator[Dict]:
+    """Lazily runs analyze_sms over an iterable of messages (one in memory at a time)."""
+    for message in messages:
+        yield analyze_sms(message)
+
+
+
+def analyze_email_stream(emails: Iterable[Dict]) -> Iterator[Dict]:
+    """Lazily runs analyze_email over an iterable of emails (one in memory at a time)."""
+    for email in emails:
+        yield analyze_email(email)
+
+
+
+# ------------------------------------------------------
+# PARALLEL PREPROCESSING
+# ------------------------------------------------------
+ANALYZERS = {"sms": analyze_sms, "email": analyze_email}
+
+
+def _analyze_chunk(kind: str, chunk: List[Dict]) -> List[Dict]:
+    """Process-pool worker: analyzes one chunk of messages."""
+    analyzer = ANALYZERS[kind]
+    return [analyzer(message) for message in chunk]
+
+
+def analyze_parallel(messages: Iterable[Dict], kind: str = "sms", num_workers: int = None,
+                     chunk_size: int = 500) -> Iterator[Dict]:
+    """
+    Shards messages into chunks across a process pool and yields the
+    analyzed records in input order.
+
+    At most 2 * num_workers chunks are in flight, so a streamed input is
+    never materialized. num_workers=None uses every CPU; 1 runs in-process.
+    Throughput is logged when the input is exhausted.
+    """
+    try:
+        num_workers = num_workers or os.cpu_count() or 1
+        started = time.perf_counter()
+        count = 0
+
+        if num_workers == 1:
+            for chunk in iter_chunks(messages, chunk_size):
+                for record in _analyze_chunk(kind, chunk):
+                    count += 1
+                    yield record
+        else:
+            with ProcessPoolExecutor(max_workers=num_workers) as pool:
+                pending = deque()
+                for chunk in iter_chunks(messages, chunk_size):
+                    pending.append(pool.submit(_analyze_chunk, kind, chunk))
+                    if len(pending) >= 2 * num_workers:
+                        for record in pending.popleft().result():
+                            count += 1
+                            yield record
+                while pending:
+                    for record in pending.popleft().result():
+                        count += 1
+                        yield record
+
+        elapsed = time.perf_counter() - started
+        logging.info(
+            f"[INFO] Preprocessed {count} {kind} messages in {elapsed:.2f}s "
+            f"({count / max(elapsed, 1e-9):.0f} msg/s, {num_workers} workers, chunk size {chunk_size})"
+        )
+    except Exception as e:
+        raise Project_Exception(e,sys)
+
+
+
+if __name__ == "__main__":
+    # Throughput report: synthetic SMS stream at increasing worker counts
+    sample = {"sender": "HDFC", "body": "Rs. 2,500 debited from A/c XX1234 on 07-Nov. Ref 99812.", "timestamp": ""}
+    messages = [sample] * 200_000
+    for workers in (1, 2, 4, 8, 16):
+        if workers > (os.cpu_count() or 1):
+            break
+        started = time.perf_counter()
+        count = sum(1 for _ in analyze_parallel(messages, "sms", workers, chunk_size=2000))
+        elapsed = time.perf_counter() - started
+        print(f"{workers:>2} workers: {count / elapsed:>10.0f} msg/s")
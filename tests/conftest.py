@@ -0,0 +1,63 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from src.embedding_service.embedding_generator import EmbeddingGenerator
+from src.embedding_service.vector_store import VectorStore
+from src.entity.artifact_entity import DataIngestionArtifact
+
+# Manual check against the live OpenRouter API (needs a key and network); calls it on import
+collect_ignore = ["test_api.py"]
+
+
+class BagOfWordsModel:
+    """Stand-in for the sentence-transformer: hashed word counts, 32 dims."""
+
+    def encode(self, texts, batch_size=64, show_progress_bar=False):
+        out = np.zeros((len(texts), 32), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                out[i, zlib.crc32(word.encode()) % 32] += 1
+        return out
+
+
+@pytest.fixture
+def embedder():
+    generator = object.__new__(EmbeddingGenerator)
+    generator.model = BagOfWordsModel()
+    generator.cache = None
+    generator.tokenizer = None
+    generator.max_seq_length = 256
+    return generator
+
+
+def sms(i, text=None):
+    return {"sender": f"Bank{i % 3}", "timestamp": f"2025-11-{i % 28 + 1:02d}T10:00:00", "type": "transaction",
+            "text": text or f"Payment {i} of Rs. {100 + i} to merchant{i} was successful. Ref ID: TX{i:06d}.",
+            "details": {"amount": 100 + i, "action": "debited"}}
+
+
+def open_store(index_dir, dedup=False, config=None):
+    store = VectorStore(DataIngestionArtifact(None, None, str(index_dir), str(index_dir)), config)
+    store.dedup = dedup
+    return store
+
+
+def build_store(index_dir, embedder, messages, dedup=False, config=None):
+    """A saved and indexed store of `messages`, compaction left to the test."""
+    store = open_store(index_dir, dedup, config)
+    prepared = [store._prepare_message(m) for m in messages]
+    store.messages = [text for text, _ in prepared]
+    store.metadata = [meta for _, meta in prepared]
+    embeddings, chunk_embeddings, chunk_parents = store.embed_rows(embedder, store.messages, 0)
+    store.save_data(embeddings)
+    store.build_index(embeddings, chunk_embeddings, chunk_parents)
+    store.compaction_threshold = 10 ** 9
+    return store
+
+
+@pytest.fixture
+def built_store(tmp_path, embedder):
+    """A saved and indexed store of 50 SMS."""
+    return build_store(tmp_path, embedder, [sms(i) for i in range(50)])
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.entity.config_entity import LLMClientConfig
+from src.nlp_models.llm_responder import CloudLLM
+from src.query_engine.answer_generator import refill_stream
+
+
+class StubOpenRouter:
+    """
+    Local stand-in for the OpenRouter chat-completions endpoint.
+
+    - failures : list of (status, headers) answered, in order, before any
+                 successful response, e.g. [(429, {"Retry-After": "0"}), (503, {})]
+    - delay    : seconds before the first token of a successful response
+    - token_delay : seconds per generated token (~4 characters), so a
+                 non-streamed answer arrives after delay + n_tokens * token_delay
+
+    Successful responses echo the prompt back as the assistant message;
+    requests with "stream": true get it as server-sent events instead.
+    `requests` counts every POST, `connections` every TCP connection, so a
+    pooled client shows far fewer connections than requests.
+    `max_in_flight` is the most POSTs the stub was handling at once.
+    """
+
+    def __init__(self, failures=None, delay: float = 0.0, token_delay: float = 0.0):
+        self.failures = list(failures or [])
+        self.delay = delay
+        self.token_delay = token_delay
+        self.requests = 0
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/api/v1/chat/completions"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"       # keep-alive
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body, headers=None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _write_chunk(self, text):
+                data = text.encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def _stream(self, payload, tokens):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                self._write_chunk(": OPENROUTER PROCESSING\n\n")
+                for token in tokens:
+                    if stub.token_delay:
+                        time.sleep(stub.token_delay)
+                    chunk = {"model": payload.get("model"),
+                             "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                    self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+                self._write_chunk("data: [DONE]\n\n")
+                self._write_chunk("")
+
+            def do_POST(self):
+                with stub._lock:
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    self._answer()
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def _answer(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with stub._lock:
+                    stub.requests += 1
+                    failure = stub.failures.pop(0) if stub.failures else None
+                if failure is not None:
+                    status, headers = failure
+                    self._reply(status, {"error": {"code": status, "message": "stub failure"}}, headers)
+                    return
+                if stub.delay:
+                    time.sleep(stub.delay)
+                content = f"echo: {payload['messages'][-1]['content']}"
+                tokens = [content[i:i + 4] for i in range(0, len(content), 4)]
+                if payload.get("stream"):
+                    self._stream(payload, tokens)
+                    return
+                if stub.token_delay:
+                    time.sleep(stub.token_delay * len(tokens))
+                self._reply(200, {
+                    "id": f"stub-{stub.requests}",
+                    "model": payload.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": "stop"}],
+                })
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    # Retries, pooling and the async variant against the stub
+    with StubOpenRouter(failures=[(429, {"Retry-After": "0"}), (503, {})], delay=0.01) as stub:
+        config = LLMClientConfig(url=stub.url)
+        config.backoff_base = 0.01
+        with CloudLLM(config=config, api_key="stub") as llm:
+            print(llm.send_prompt("hello"))
+
+            started = time.perf_counter()
+            threads = [threading.Thread(target=llm.send_prompt, args=(f"prompt {i}",)) for i in range(50)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            print(f"50 threaded prompts in {time.perf_counter() - started:.2f}s")
+
+            async def fan_out():
+                return await asyncio.gather(*(llm.asend_prompt(f"async {i}") for i in range(20)))
+            print(asyncio.run(fan_out())[:2])
+
+        print(f"requests={stub.requests} connections={stub.connections}")
+
+    # Time to first useful token: blocking call vs SSE stream + placeholder refill
+    placeholder_map = {"amount_1": "250", "receiver_1": "Rajesh"}
+    prompt = "You paid Rs. #amount_1 to #receiver_1 for dinner, which is your largest payment this week."
+    with StubOpenRouter(delay=0.05, token_delay=0.02) as stub, CloudLLM(config=LLMClientConfig(url=stub.url)) as llm:
+        started = time.perf_counter()
+        llm.send_prompt(prompt)
+        print(f"\nblocking: first text after {time.perf_counter() - started:.3f}s")
+
+        started = time.perf_counter()
+        first = None
+        for piece in refill_stream(llm.stream_prompt(prompt), placeholder_map):
+            first = first or time.perf_counter() - started
+            sys.stdout.write(piece)
+            sys.stdout.flush()
+        print(f"\nstreaming: first text after {first:.3f}s, done after {time.perf_counter() - started:.3f}s")
@@ -1,49 +1,115 @@
-import os
-import requests
-from dotenv import load_dotenv
-
-load_dotenv()
-
-
-class CloudLLM:
-    """
-    A reusable wrapper for sending masked prompts to OpenRouter
-    and receiving masked responses.
-    """
-
-    def __init__(self, model="kwaipilot/kat-coder-pro:free"):
-        self.url = "https://openrouter.ai/api/v1/chat/completions"
-        self.model = model
-        self.headers = {
-            "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://your-site.com",
-            "X-Title": "AI Message Assistant"
-        }
-
-    def send_prompt(self, prompt: str) -> str:
-        """
-        Sends a masked RAG prompt to the LLM.
-        Returns the response text OR error message.
-        """
-
-        payload = {
-            "model": self.model,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ]
-        }
-
-        try:
-            response = requests.post(self.url, headers=self.headers, json=payload)
-            data = response.json()
-
-            # Successful response
-            if "choices" in data:
-                return data["choices"][0]["message"]["content"]
-
-            # Error case
-            return f"API Error: {data}"
-
-        except Exception as e:
-            return f"Request Exception: {str(e)}"
+# CloudLLM moved to src/nlp_models/llm_responder.py; kept importable from here
+# for older scripts.
+from src.nlp_models.llm_responder import CloudLLM
+
+import threading
+import time
+
+import pytest
+
+from src.entity.config_entity import LLMClientConfig
+from src.nlp_models.response_cache import ResponseCache
+from stub_openrouter import StubOpenRouter
+
+
+def _client(stub, **overrides):
+    config = LLMClientConfig(url=stub.url)
+    config.backoff_base = 0.0
+    for name, value in overrides.items():
+        setattr(config, name, value)
+    return CloudLLM(config=config, api_key="stub")
+
+
+def test_retries_429_then_succeeds():
+    with StubOpenRouter(failures=[(429, {})]) as stub, _client(stub) as llm:
+        assert llm.send_prompt("hello") == "echo: hello"
+        assert stub.requests == 2
+
+
+def test_honours_retry_after():
+    with StubOpenRouter(failures=[(429, {"Retry-After": "0.3"})]) as stub, _client(stub) as llm:
+        started = time.perf_counter()
+        assert llm.send_prompt("hello") == "echo: hello"
+        assert time.perf_counter() - started >= 0.3
+        assert stub.requests == 2
+
+
+@pytest.mark.parametrize("status", [400, 401, 404, 422])
+def test_does_not_retry_other_4xx(status):
+    with StubOpenRouter(failures=[(status, {})]) as stub, _client(stub) as llm:
+        answer = llm.send_prompt("hello")
+        assert answer.startswith("API Error") and str(status) in answer
+        assert stub.requests == 1
+
+
+def test_gives_up_after_max_retries():
+    with StubOpenRouter(failures=[(503, {})] * 5) as stub, _client(stub, max_retries=2) as llm:
+        assert llm.send_prompt("hello").startswith("API Error")
+        assert stub.requests == 3
+
+
+def test_semaphore_bounds_concurrent_requests():
+    with StubOpenRouter(delay=0.05) as stub, _client(stub, max_concurrency=2) as llm:
+        answers = []
+        threads = [threading.Thread(target=lambda i=i: answers.append(llm.send_prompt(f"prompt {i}")))
+                   for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert sorted(answers) == sorted(f"echo: prompt {i}" for i in range(8))
+        assert stub.max_in_flight == 2
+
+
+def _stream_in_thread(llm, prompt, out, started=None):
+    def run():
+        pieces = []
+        for piece in llm.stream_prompt(prompt):
+            if started is not None:
+                started.set()
+            pieces.append(piece)
+        out.append(pieces)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_concurrent_streams_of_one_prompt_share_a_request(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    with StubOpenRouter(token_delay=0.05) as stub, _client(stub) as llm:
+        llm.cache = cache
+        leader, followers, started = [], [], threading.Event()
+        threads = [_stream_in_thread(llm, "You paid Rs. #amount_1", leader, started)]
+        assert started.wait(5)
+        threads += [_stream_in_thread(llm, "You paid Rs. #amount_1", followers) for _ in range(3)]
+        blocking = llm.send_prompt("You paid Rs. #amount_1")
+        for t in threads:
+            t.join()
+
+        expected = "echo: You paid Rs. #amount_1"
+        assert "".join(leader[0]) == expected and len(leader[0]) > 1
+        assert followers == [[expected]] * 3
+        assert blocking == expected
+        assert stub.requests == 1
+        assert cache.stats()["misses"] == 1
+
+        # Completed stream is served from the cache afterwards
+        assert list(llm.stream_prompt("You paid Rs. #amount_1")) == [expected]
+        assert stub.requests == 1
+
+
+def test_follower_takes_over_an_abandoned_stream(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    with StubOpenRouter(token_delay=0.02) as stub, _client(stub) as llm:
+        llm.cache = cache
+        stream = llm.stream_prompt("hello there")
+        assert next(stream) == "echo"
+
+        followers = []
+        follower = _stream_in_thread(llm, "hello there", followers)
+        time.sleep(0.1)
+        stream.close()
+        follower.join(10)
+
+        assert "".join(followers[0]) == "echo: hello there"
+        assert stub.requests == 2
@@ -0,0 +1,445 @@
+import gc
+import os
+import threading
+import weakref
+from datetime import date, datetime
+
+import faiss
+import numpy as np
+import pytest
+
+from src.embedding_service.bm25_index import BM25Index
+from src.embedding_service.index_factory import build_faiss_index, rescore_candidates
+from src.embedding_service.embedding_cache import EmbeddingCache
+from src.embedding_service.embedding_generator import EmbeddingGenerator
+from src.embedding_service.vector_store import VectorStore
+from src.entity.config_entity import VectorIndexConfig
+from src.utils.helpers import to_end_epoch
+from conftest import build_store, open_store, sms
+
+
+class _CountingModel:
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts, batch_size=None, show_progress_bar=None):
+        self.encoded += len(texts)
+        return np.array([[len(t), t.count(" "), 1.0, 0.0] for t in texts], dtype=np.float32)
+
+
+def _vectors(n, offset=0):
+    return np.arange(offset * 4, (offset + n) * 4, dtype=np.float32).reshape(n, 4)
+
+
+def test_cache_appends_segments_and_merges_on_save(tmp_path):
+    cache = EmbeddingCache("model", cache_dir=str(tmp_path), flush_every=4)
+    keys = [cache.key(f"text {i}") for i in range(10)]
+    cache.put(keys[:5], _vectors(5))
+    cache.put(keys[5:7], _vectors(2, offset=5))
+
+    # One segment of new rows, the rest pending in memory, the main file not written yet
+    assert len(cache._segment_paths()) == 1
+    assert not os.path.exists(cache.path)
+
+    reopened = EmbeddingCache("model", cache_dir=str(tmp_path), flush_every=4)
+    found = reopened.lookup(keys)
+    assert all(v is not None for v in found[:5]) and all(v is None for v in found[5:])
+    np.testing.assert_array_equal(np.vstack(found[:5]), _vectors(5))
+
+    cache.put(keys[7:], _vectors(3, offset=7))
+    assert len(cache._segment_paths()) == 2
+
+    cache.save()
+    assert cache._segment_paths() == []
+    merged = EmbeddingCache("model", cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(np.vstack(merged.lookup(keys)), _vectors(10))
+
+
+def test_cache_ignores_segment_already_merged(tmp_path):
+    cache = EmbeddingCache("model", cache_dir=str(tmp_path), flush_every=2)
+    keys = [cache.key(f"text {i}") for i in range(2)]
+    cache.put(keys, _vectors(2))
+    segments = cache._segment_paths()
+    contents = {path: open(path, "rb").read() for path in segments}
+    cache.save()
+    # Crash after writing cache.npz but before the segments were deleted
+    for path, data in contents.items():
+        with open(path, "wb") as f:
+            f.write(data)
+
+    reopened = EmbeddingCache("model", cache_dir=str(tmp_path))
+    assert len(reopened._rows) == 2
+    np.testing.assert_array_equal(np.vstack(reopened.lookup(keys)), _vectors(2))
+
+
+def test_cache_evicts_least_recently_used_rows_on_put(tmp_path):
+    cache = EmbeddingCache("model", cache_dir=str(tmp_path), max_entries=10, flush_every=100)
+    keys = [cache.key(f"text {i}") for i in range(20)]
+    cache.put(keys[:10], _vectors(10))
+    cache.lookup(keys[:3])
+    cache.put(keys[10:11], _vectors(1, offset=10))
+
+    # Over budget: down to 9 rows, the three just read and the newest one kept
+    assert len(cache._rows) == 9
+    found = cache.lookup(keys[:11])
+    assert all(v is not None for v in found[:3]) and found[10] is not None
+    cache.put(keys[11:], _vectors(9, offset=11))
+    assert len(cache._rows) <= 10
+
+
+def test_cache_hits_do_not_rewrite_the_cache_file(tmp_path):
+    cache = EmbeddingCache("model", cache_dir=str(tmp_path))
+    keys = [cache.key(f"text {i}") for i in range(4)]
+    cache.put(keys, _vectors(4))
+    cache.save()
+    written = os.stat(cache.path).st_mtime_ns
+
+    reopened = EmbeddingCache("model", cache_dir=str(tmp_path))
+    reopened.lookup(keys[2:])
+    reopened.save()
+    assert os.stat(cache.path).st_mtime_ns == written
+    # The refreshed ticks went to the small side file and survive a reload
+    again = EmbeddingCache("model", cache_dir=str(tmp_path))
+    assert again._ticks[2:].min() > again._ticks[:2].max()
+
+
+def test_cache_is_not_kept_alive_by_its_exit_hook(tmp_path):
+    cache = EmbeddingCache("model", cache_dir=str(tmp_path))
+    cache.put([cache.key("text")], _vectors(1))
+    cache.close()
+    assert os.path.exists(cache.path)
+
+    ref = weakref.ref(cache)
+    del cache
+    gc.collect()
+    assert ref() is None
+
+
+def test_query_embeddings_are_not_cached(tmp_path):
+    generator = object.__new__(EmbeddingGenerator)
+    generator.model = _CountingModel()
+    generator.tokenizer = None
+    generator.max_seq_length = 256
+    generator.cache = EmbeddingCache("model", cache_dir=str(tmp_path))
+
+    generator.generate_embeddings(["Payment of Rs. 250 to Rajesh"], show_progress_bar=False)
+    generator.generate_embeddings(["how much did I pay Rajesh"], show_progress_bar=False, cache=False)
+    assert len(generator.cache._rows) == 1
+
+    generator.generate_embeddings(["Payment of Rs. 250 to Rajesh"], show_progress_bar=False)
+    assert generator.model.encoded == 2
+
+
+class _SpyEmbedder:
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.calls = 0
+
+    def generate_embeddings(self, texts, *args, **kwargs):
+        self.calls += 1
+        return self.embedder.generate_embeddings(texts, *args, **kwargs)
+
+
+def test_bm25_add_while_searching():
+    index = BM25Index()
+    index.build([f"payment {i} to merchant{i}" for i in range(2000)])
+    errors, stop = [], threading.Event()
+
+    def search():
+        while not stop.is_set():
+            try:
+                index.search("payment merchant5", 5)
+            except Exception as e:
+                errors.append(e)
+                return
+
+    searchers = [threading.Thread(target=search) for _ in range(4)]
+    for thread in searchers:
+        thread.start()
+    try:
+        for i in range(2000):
+            index.add([f"payment {i} refund"])
+    finally:
+        stop.set()
+        for thread in searchers:
+            thread.join()
+    assert errors == [] and len(index) == 4000
+
+
+@pytest.mark.parametrize("storage, factory, codes", [
+    ("float32", "Flat", "IndexFlat"), ("float16", "SQfp16", "IndexScalarQuantizer"),
+    ("int8", "SQ8", "IndexScalarQuantizer"),
+])
+def test_untrainable_index_falls_back_with_its_storage_codec(storage, factory, codes):
+    vectors = np.random.default_rng(0).standard_normal((100, 16)).astype("float32")
+    index, spec = build_faiss_index(vectors, VectorIndexConfig(index_type="ivf_flat", storage=storage))
+    assert spec["factory"] == factory and type(index).__name__.startswith(codes)
+    assert index.ntotal == 100 and bool(spec["rescore_factor"]) == (storage != "float32")
+
+
+@pytest.mark.parametrize("storage", ["float16", "int8"])
+def test_rescoring_recovers_the_float32_top_k(storage):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((2000, 32)).astype("float32")
+    queries = (vectors[rng.integers(0, 2000, 50)] + 0.5 * rng.standard_normal((50, 32))).astype("float32")
+    exact = faiss.IndexFlatL2(32)
+    exact.add(vectors)
+    expected_d, expected_i = exact.search(queries, 5)
+
+    index, spec = build_faiss_index(vectors, VectorIndexConfig(storage=storage))
+    if storage == "int8":
+        # The 8-bit codes alone reorder some neighbours
+        assert (index.search(queries, 5)[1] != expected_i).any()
+    _, candidates = index.search(queries, 5 * spec["rescore_factor"])
+    distances, indices = rescore_candidates(queries, candidates, lambda ids: vectors[ids], 5)
+    np.testing.assert_array_equal(indices, expected_i)
+    np.testing.assert_allclose(distances, expected_d, rtol=1e-5)
+
+
+@pytest.mark.parametrize("storage", ["float16", "int8"])
+def test_compressed_store_returns_the_float32_results(tmp_path, embedder, storage):
+    messages = [sms(i) for i in range(50)]
+    reference = build_store(tmp_path / "float32", embedder, messages)
+    store = build_store(tmp_path / storage, embedder, messages, config=VectorIndexConfig(storage=storage))
+    assert store._rescore_factor() > 0
+    queries = embedder.generate_embeddings([messages[i]["text"] for i in (3, 20, 41)] + ["payment to merchant"])
+
+    reopened = open_store(store.index_dir, config=VectorIndexConfig(storage=storage))
+    reopened.load_index()
+    # Word-count vectors tie a lot, so compare distances; each message still finds itself first
+    expected = reference.search_batch(queries, top_k=5)
+    for compressed in (store, reopened):
+        batch = compressed.search_batch(queries, top_k=5)
+        assert [results[0]["id"] for results in batch[:3]] == [3, 20, 41]
+        for got, want in zip(batch, expected):
+            np.testing.assert_allclose([r["distance"] for r in got], [r["distance"] for r in want], rtol=1e-5)
+
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+@pytest.mark.parametrize("quantize, min_cosine", [(False, 0.999), (True, 0.98)])
+def test_onnx_backend_matches_the_torch_model(tmp_path, quantize, min_cosine):
+    pytest.importorskip("onnxruntime")
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    from src.embedding_service.onnx_backend import OnnxEmbeddingBackend
+    try:
+        torch_model = sentence_transformers.SentenceTransformer(MODEL_NAME, local_files_only=True)
+    except Exception:
+        pytest.skip(f"{MODEL_NAME} is not in the local Hugging Face cache")
+
+    backend = OnnxEmbeddingBackend(MODEL_NAME, quantize=quantize, onnx_dir=str(tmp_path))
+    assert backend.max_length == torch_model.max_seq_length
+    # The last text runs past max_length: both sides must truncate it the same way
+    texts = ["Rs. 2,500 debited from A/c XX1234", "Your OTP is 482913", "short",
+             " ".join(f"Payment {i} of Rs. {100 + i} to merchant{i} was successful." for i in range(80))]
+    expected = torch_model.encode(texts, batch_size=2)
+    got = backend.encode(texts, batch_size=2)
+
+    assert got.shape == expected.shape and got.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(got, axis=1), np.linalg.norm(expected, axis=1), atol=1e-3)
+    cosine = (got * expected).sum(axis=1) / (np.linalg.norm(got, axis=1) * np.linalg.norm(expected, axis=1))
+    assert cosine.min() > min_cosine
+
+
+def test_hybrid_search_answers_ref_ids_from_bm25(built_store, embedder):
+    spy = _SpyEmbedder(embedder)
+    results = built_store.hybrid_search("Ref ID TX000007", spy, top_k=3)
+    assert results[0]["id"] == 7
+    assert spy.calls == 0
+
+
+def test_hybrid_search_keeps_dense_retrieval_for_years(built_store, embedder):
+    # "2025" is a 4-digit number with no postings; "payment" matches every row in BM25
+    spy = _SpyEmbedder(embedder)
+    results = built_store.hybrid_search("payment in 2025", spy, top_k=3)
+    assert spy.calls == 1
+    assert any(r["distance"] is not None for r in results)
+
+
+def test_hybrid_search_fuses_when_the_year_is_in_the_corpus(built_store, embedder):
+    email = {"from": "Unknown", "subject": "Invoice", "date": "2025-11-10T08:00:00", "type": "invoice",
+             "body": "Attached is invoice. Total amount due: Rs. 45,000. Kindly process payment by 15 November 2025."}
+    built_store.add_new_message(email, embedder)
+    assert len(built_store.bm25_index.term_rows("2025")) == 1
+
+    spy = _SpyEmbedder(embedder)
+    results = built_store.hybrid_search("payments in 2025", spy, top_k=5)
+    assert spy.calls == 1
+    assert any(r["metadata"]["source"] == "sms" for r in results)
+
+
+@pytest.mark.parametrize("filters, expected", [
+    ({"source": "email"}, []),
+    ({"sender": "bank1", "start": "2025-11-05", "end": "2025-11-10"}, [4, 7, 34, 37]),
+    ({"sender": ["BANK0", "Bank2"], "end": "2025-11-02"}, [0, 29]),
+    ({"source": "sms", "type": "transaction", "start": "2025-11-28T10:00:00"}, [27]),
+    ({"sender": []}, []),
+])
+def test_eligible_ids_combine_filters(built_store, filters, expected):
+    assert built_store.documents.eligible_ids(filters).tolist() == expected
+
+
+@pytest.mark.parametrize("filters", [None, {}, {"type": None}])
+def test_eligible_ids_without_a_filter_keeps_every_row(built_store, filters):
+    assert built_store.documents.eligible_ids(filters) is None
+
+
+def test_filtered_search_returns_only_eligible_rows(built_store, embedder):
+    built_store.add_new_message(sms(50), embedder)
+    # Row 50 is from Bank2 on 2025-11-23
+    filters = {"sender": "Bank2", "end": "2025-11-23"}
+    eligible = set(built_store.documents.eligible_ids(filters).tolist())
+    assert 50 in eligible
+
+    results = built_store.search(embedder.generate_embeddings([built_store.messages[50]]), top_k=5, filters=filters)
+    assert len(results) == 5 and results[0]["id"] == 50
+    assert all(r["id"] in eligible and r["metadata"]["sender"] == "Bank2" for r in results)
+
+
+def test_search_batch_returns_one_list_per_query_row(built_store, embedder):
+    built_store.add_new_message(sms(50), embedder)
+    queries = embedder.generate_embeddings([built_store.messages[i] for i in (3, 50, 17)])
+    batch = built_store.search_batch(queries, top_k=4)
+    assert len(batch) == 3
+    assert [results[0]["id"] for results in batch] == [3, 50, 17]
+    for query, results in zip(queries, batch):
+        assert results == built_store.search(query, top_k=4)
+
+
+def test_search_batch_drops_padding_past_the_eligible_rows(built_store, embedder):
+    queries = embedder.generate_embeddings([built_store.messages[4], "payment"])
+    filters = {"sender": "bank1", "start": "2025-11-05", "end": "2025-11-10"}
+    batch = built_store.search_batch(queries, top_k=10, filters=filters)
+    assert [sorted(r["id"] for r in results) for results in batch] == [[4, 7, 34, 37]] * 2
+    assert [r["rank"] for r in batch[0]] == [1, 2, 3, 4]
+    assert built_store.search_batch(queries, top_k=10, filters={"source": "email"}) == [[], []]
+    assert [len(results) for results in built_store.search_batch(queries, top_k=60)] == [50, 50]
+
+
+@pytest.mark.parametrize("end, expected", [
+    ("2025-11-07", (datetime(2025, 11, 8).timestamp(), False)),
+    (date(2025, 11, 7), (datetime(2025, 11, 8).timestamp(), False)),
+    ("07 November 2025", (datetime(2025, 11, 8).timestamp(), False)),
+    ("2025-11-07T18:00:00", (datetime(2025, 11, 7, 18).timestamp(), True)),
+    (datetime(2025, 11, 7, 18), (datetime(2025, 11, 7, 18).timestamp(), True)),
+    (1762500000, (1762500000.0, True)),
+])
+def test_to_end_epoch_makes_a_date_only_end_exclusive_of_the_next_day(end, expected):
+    assert to_end_epoch(end) == expected
+
+
+def test_date_only_end_includes_the_whole_day(built_store):
+    # Rows 0 and 28 were sent on 2025-11-01 at 10:00
+    filters = {"start": "2025-11-01", "end": "2025-11-01"}
+    assert built_store.documents.eligible_ids(filters).tolist() == [0, 28]
+    assert built_store.column_store.count(filters) == 2
+    assert built_store.documents.eligible_ids({"end": "2025-11-01T09:00:00"}).tolist() == []
+
+
+# ------------------------------------------------------
+# Long messages: chunk vectors scored at the parent level
+# ------------------------------------------------------
+REFUND = "Refund for cancelled flight booking PNR XQ7731 has been processed to your card."
+
+
+def _long_email(tail):
+    filler = " ".join(f"clause{i}" for i in range(40))
+    return {"from": "Airline", "subject": "Booking update", "date": "2025-11-12T09:00:00", "type": "travel",
+            "body": f"{filler} {tail}"}
+
+
+@pytest.fixture
+def chunked_store(tmp_path, embedder, monkeypatch):
+    # A 30-token window: the SMS fit, the email (row 20) is split into overlapping chunks
+    monkeypatch.setattr(embedder, "max_seq_length", 32)
+    return build_store(tmp_path, embedder, [sms(i) for i in range(20)] + [_long_email(REFUND)])
+
+
+def test_long_message_is_found_through_its_chunk_once(chunked_store, embedder):
+    assert len(chunked_store.chunk_index) == 3 and set(chunked_store.chunk_index.parents) == {20}
+    # The last chunk, which holds the refund sentence the first-chunk vector misses
+    query = embedder.generate_embeddings(embedder.chunk_text(chunked_store.messages[20])[-1:])
+    first_chunk = float(((chunked_store.embeddings[20] - query[0]) ** 2).sum())
+    chunk_d, _ = chunked_store.chunk_index.search(query, 1)
+
+    results = chunked_store.search(query, top_k=5)
+    ids = [r["id"] for r in results]
+    assert ids[0] == 20 and ids.count(20) == 1 and len(ids) == 5
+    assert results[0]["distance"] == pytest.approx(float(chunk_d[0, 0])) and results[0]["distance"] < first_chunk
+
+
+def test_chunks_of_new_messages_are_merged_and_filtered(chunked_store, embedder):
+    tail = "Your seat upgrade request for flight 6E 512 is confirmed, boarding pass attached."
+    chunked_store.add_new_message(_long_email(tail), embedder)
+    assert chunked_store.chunk_index.parents.tolist() == [20] * 3 + [21] * 3
+
+    query = embedder.generate_embeddings(embedder.chunk_text(chunked_store.messages[21])[-1:])
+    assert [r["id"] for r in chunked_store.search(query, top_k=3)][0] == 21
+    # A filter that excludes the parent also drops its chunk hits
+    filtered = chunked_store.search(query, top_k=3, filters={"source": "sms"})
+    assert len(filtered) == 3 and all(r["metadata"]["source"] == "sms" for r in filtered)
+
+
+# ------------------------------------------------------
+# Near-duplicate collapsing
+# ------------------------------------------------------
+OTP = "Your OTP for login is {:06d}. Do not share it with anyone."
+UNIQUE = ["Your Swiggy order from Meghana Foods is out for delivery.",
+          "Electricity bill of Rs. 1,240 is due on 12 November.",
+          "Flight 6E 512 to Delhi departs from gate 4 at 18:40."]
+
+
+@pytest.fixture
+def dedup_store(tmp_path, embedder):
+    # Rows 0-9: templated payments, 10-14: OTPs, 15-17: one of a kind
+    messages = ([sms(i) for i in range(10)] + [sms(i, OTP.format(100000 + i)) for i in range(10, 15)]
+                + [sms(15 + i, text) for i, text in enumerate(UNIQUE)])
+    return build_store(tmp_path, embedder, messages, dedup=True)
+
+
+def test_near_duplicates_collapse_into_clusters(dedup_store):
+    assert dedup_store.dedup_index.n_clusters == 5
+    assert dedup_store.dedup_index.cluster(3) == list(range(10))
+    assert dedup_store.dedup_index.cluster(12) == list(range(10, 15))
+    assert dedup_store.dedup_index.cluster(16) == [16]
+
+
+def test_search_returns_one_row_per_cluster(dedup_store, embedder):
+    query = embedder.generate_embeddings([dedup_store.messages[12]])
+    results = dedup_store.search(query, top_k=5)
+    ids = [r["id"] for r in results]
+    assert len(ids) == 5 and sorted(ids) == [0, 10, 15, 16, 17]
+    otp = results[ids.index(10)]
+    assert otp["cluster_size"] == 5 and otp["duplicates"] == [11, 12, 13, 14]
+    assert results[ids.index(16)]["cluster_size"] == 1 and results[ids.index(16)]["duplicates"] == []
+
+    # A filter leaves the lowest eligible member of each cluster
+    filtered = dedup_store.search(query, top_k=5, filters={"sender": "Bank2"})
+    assert sorted(r["id"] for r in filtered) == [2, 11, 17]
+
+
+def test_leader_selector_is_built_once_per_base_index(dedup_store, embedder, monkeypatch):
+    built = []
+    selector = VectorStore._bitmap_selector
+    monkeypatch.setattr(VectorStore, "_bitmap_selector", lambda self, *args: built.append(1) or selector(self, *args))
+    query = embedder.generate_embeddings(["payment to merchant"])
+    for _ in range(3):
+        dedup_store.search(query, top_k=3)
+    dedup_store.add_new_message(sms(30, OTP.format(999999)), embedder)
+    results = dedup_store.search(embedder.generate_embeddings([OTP.format(1)]), top_k=5)
+    assert len(built) == 1
+
+    # The new OTP sits in the delta and joins the OTP cluster
+    otp = next(r for r in results if r["id"] == 10)
+    assert otp["cluster_size"] == 6 and 18 not in [r["id"] for r in results]
+
+
+def test_loaded_clusters_match_and_accept_new_rows(dedup_store, embedder):
+    reopened = open_store(dedup_store.index_dir, dedup=True)
+    reopened.load_index()
+    assert [reopened.dedup_index.cluster(row) for row in (3, 12, 16)] == [list(range(10)), list(range(10, 15)), [16]]
+
+    reopened.add_new_message(sms(40, OTP.format(424242)), embedder)
+    assert reopened.dedup_index.cluster(18) == [10, 11, 12, 13, 14, 18]
+    assert reopened.dedup_index.n_clusters == 5
@@ -0,0 +1,381 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+import pytest
+
+from src.constants import message_pipeline
+from src.data_ingestion.data_preprocessor import DataIngestion
+from src.data_ingestion.manifest import SourceManifest, read_current
+from src.embedding_service.bm25_index import BM25Index
+from src.embedding_service.column_store import ColumnStore
+from src.embedding_service.vector_store import VectorStore
+from src.entity.config_entity import DataIngistionConfig, ProjectPipelineConfig
+from src.pipelines import train_pipeline
+from src.pipelines.train_pipeline import TrainPipeline
+from src.query_engine.entity_index import EntityIndex
+from src.utils import atomic_io
+from conftest import build_store, open_store, sms
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """Paths file_sha256 was asked to hash."""
+    paths = []
+    original = atomic_io.file_sha256
+
+    def counting(path):
+        paths.append(os.path.basename(path))
+        return original(path)
+
+    monkeypatch.setattr(atomic_io, "file_sha256", counting)
+    return paths
+
+
+def test_clean_load_skips_checksums(built_store, hashed):
+    assert not atomic_io.is_dirty(built_store.index_dir)
+    open_store(built_store.index_dir).load_index()
+    assert hashed == []
+
+
+def test_dirty_load_verifies_but_mmap_reader_does_not(built_store, hashed):
+    with open(os.path.join(built_store.index_dir, atomic_io.DIRTY_MARKER), "w") as f:
+        f.write("crashed\n")
+
+    open_store(built_store.index_dir).load_index(mmap=True)
+    assert "index.faiss" not in hashed and "embeddings.npy" not in hashed
+
+    open_store(built_store.index_dir).load_index()
+    assert {"index.faiss", "embeddings.npy"} <= set(hashed)
+
+    with open(os.path.join(built_store.index_dir, "index.faiss"), "r+b") as f:
+        f.seek(200)
+        f.write(b"\x07")
+    with pytest.raises(Exception, match="checksum"):
+        open_store(built_store.index_dir).load_index()
+
+
+def test_default_preprocessing_logs_its_throughput(caplog):
+    config = DataIngistionConfig(ProjectPipelineConfig())
+    assert config.num_workers == 1
+    raw = [{"sender": "HDFC", "body": f"Rs. {100 + i} debited from A/c XX1234. Ref {i}.", "timestamp": ""}
+           for i in range(5)]
+    with caplog.at_level("INFO"):
+        records = list(DataIngestion(config)._analyze(iter(raw), "sms"))
+    assert len(records) == 5
+    assert "Preprocessed 5 sms messages" in caplog.text and "1 workers" in caplog.text
+
+
+# ------------------------------------------------------
+# Crash recovery: WAL replay, compaction, checksum commits
+# ------------------------------------------------------
+def _texts(store):
+    return list(store.messages)
+
+
+def test_replay_after_crash_mid_append(built_store, embedder):
+    built_store.add_new_messages([sms(i) for i in range(50, 60)], embedder)
+    expected = _texts(built_store)
+
+    # Torn write of the next batch: half a vector and half a JSON line, no document row
+    segment_log = built_store.segment_log
+    vec_path, rec_path = segment_log._paths(segment_log.active_start)
+    with open(vec_path, "ab") as f:
+        f.write(b"\x00" * 70)
+    with open(rec_path, "a", encoding="utf-8") as f:
+        f.write('{"text": "Payment 60 of Rs')
+
+    reopened = open_store(built_store.index_dir)
+    reopened.load_index()
+    assert _texts(reopened) == expected
+    assert reopened._snapshot.rows == len(expected)
+
+    # The active segment was cut back to whole records, so new appends replay cleanly
+    reopened.add_new_messages([sms(60)], embedder)
+    again = open_store(built_store.index_dir)
+    again.load_index()
+    assert _texts(again) == expected + [_texts(reopened)[-1]]
+
+
+def test_reader_skips_a_torn_record_without_truncating(built_store, embedder):
+    built_store.add_new_messages([sms(i) for i in range(50, 60)], embedder)
+    expected = _texts(built_store)
+
+    # A writer process halfway through its next append
+    segment_log = built_store.segment_log
+    paths = segment_log._paths(segment_log.active_start)
+    with open(paths[0], "ab") as f:
+        f.write(b"\x00" * 70)
+    with open(paths[1], "a", encoding="utf-8") as f:
+        f.write('{"text": "Payment 60 of Rs')
+    sizes = [os.path.getsize(path) for path in paths]
+
+    reader = open_store(built_store.index_dir)
+    reader.load_index(mmap=True)
+    assert _texts(reader) == expected and reader._snapshot.rows == 60
+    assert [os.path.getsize(path) for path in paths] == sizes
+
+
+def test_replay_restores_documents_lost_after_the_wal_write(built_store, embedder, monkeypatch):
+    def crash(*args, **kwargs):
+        raise RuntimeError("killed before the document write")
+
+    # A killed process runs no rollback
+    monkeypatch.setattr(built_store.documents, "append", crash)
+    monkeypatch.setattr(built_store.segment_log, "rollback", lambda start_row: None)
+    with pytest.raises(Exception):
+        built_store.add_new_messages([sms(50)], embedder)
+
+    reopened = open_store(built_store.index_dir)
+    reopened.load_index()
+    assert len(reopened.messages) == 51
+    assert "Payment 50 " in reopened.messages[50]
+    assert reopened.search(embedder.generate_embeddings([reopened.messages[50]]), 1)[0]["id"] == 50
+
+
+def test_failed_document_write_rolls_back_the_wal(built_store, embedder, monkeypatch):
+    append = built_store.documents.append
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(built_store.documents, "append", fail)
+    with pytest.raises(Exception):
+        built_store.add_new_messages([sms(50)], embedder)
+    monkeypatch.setattr(built_store.documents, "append", append)
+    assert len(built_store.delta) == 0 and len(built_store.bm25_index) == 50
+
+    # The next add takes row 50 again, in memory and after a replay
+    built_store.add_new_messages([sms(50, "Payment of Rs. 999 to retried merchant. Ref ID: RT000050.")], embedder)
+    assert built_store.hybrid_search("RT000050")[0]["id"] == 50
+    reopened = open_store(built_store.index_dir)
+    reopened.load_index()
+    assert _texts(reopened) == _texts(built_store) and len(reopened.messages) == 51
+
+
+def test_adds_while_searching(built_store, embedder):
+    errors, stop = [], threading.Event()
+
+    def search():
+        while not stop.is_set():
+            try:
+                built_store.hybrid_search("payment to merchant7", embedder)
+                built_store.hybrid_search("Ref ID TX000003")
+            except Exception as e:
+                errors.append(e)
+                return
+
+    searchers = [threading.Thread(target=search) for _ in range(4)]
+    for thread in searchers:
+        thread.start()
+    try:
+        for i in range(50, 250):
+            built_store.add_new_message(sms(i), embedder)
+    finally:
+        stop.set()
+        for thread in searchers:
+            thread.join()
+
+    assert errors == []
+    rows = built_store._snapshot.rows
+    assert rows == 250 == len(built_store.messages) == len(built_store.bm25_index)
+    assert len(built_store.entity_index) == len(built_store.column_store) == rows
+    assert built_store.hybrid_search("Ref ID TX000200")[0]["id"] == 200
+
+
+class _GatedEmbedder:
+    """Encodes texts containing "SLOW" only once `release` is set."""
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.encoding, self.release = threading.Event(), threading.Event()
+
+    def generate_chunked_embeddings(self, texts, *args, **kwargs):
+        if any("SLOW" in text for text in texts):
+            self.encoding.set()
+            assert self.release.wait(10)
+        return self.embedder.generate_chunked_embeddings(texts, *args, **kwargs)
+
+
+@pytest.mark.parametrize("dedup", [False, True])
+def test_slow_encode_does_not_block_other_writers(tmp_path, embedder, dedup):
+    store = build_store(tmp_path, embedder, [sms(i) for i in range(50)], dedup=dedup)
+    gated = _GatedEmbedder(embedder)
+    slow = threading.Thread(target=store.add_new_messages,
+                            args=([sms(90, "SLOW payment of Rs. 7 to merchant90. Ref ID: SL000090.")], gated))
+    slow.start()
+    try:
+        assert gated.encoding.wait(10)
+        # Another writer and a search go through while the model is still busy
+        store.add_new_message(sms(50), gated)
+        assert store._snapshot.rows == 51
+        assert store.hybrid_search("Ref ID TX000050")[0]["id"] == 50
+        assert store.hybrid_search("SL000090") == []
+    finally:
+        gated.release.set()
+        slow.join()
+
+    assert store._snapshot.rows == 52 and "SLOW" in store.messages[51]
+    assert store.hybrid_search("SL000090")[0]["id"] == 51
+    if dedup:
+        # Rows join their near-duplicate clusters at the append, in row order
+        assert len(store.dedup_index) == 52 and store.dedup_index.cluster(0)[-1] == 50
+
+
+def test_snapshot_is_unchanged_by_later_appends(built_store, embedder):
+    built_store.add_new_messages([sms(i) for i in range(50, 60)], embedder)
+    snap = built_store._snapshot
+    delta = snap.delta.copy()
+
+    # Enough rows to grow the delta buffer past its initial capacity
+    built_store.add_new_messages([sms(i) for i in range(60, 1200)], embedder)
+    assert snap.rows == 60 and (snap.delta == delta).all()
+    assert built_store._snapshot.rows == 1200 and snap.generation < built_store._snapshot.generation
+
+    # Delta rows are searched exactly next to the base index
+    query = embedder.generate_embeddings([built_store.messages[1100]])
+    assert built_store.search(query, top_k=1)[0]["id"] == 1100
+    assert built_store.search(query, top_k=1)[0]["distance"] == pytest.approx(0.0, abs=1e-4)
+
+
+def test_appends_while_compaction_runs(built_store, embedder, monkeypatch):
+    built_store.add_new_messages([sms(i) for i in range(50, 70)], embedder)
+    writing, resume = threading.Event(), threading.Event()
+    save = built_store.bm25_index.save
+
+    def slow_save(index_dir, rows=None):
+        writing.set()
+        assert resume.wait(10)
+        save(index_dir, rows=rows)
+
+    monkeypatch.setattr(built_store.bm25_index, "save", slow_save)
+    compaction = threading.Thread(target=built_store.compact)
+    compaction.start()
+    assert writing.wait(10)
+
+    # The compaction snapshot holds rows 0..69; these land in a fresh segment meanwhile
+    built_store.add_new_messages([sms(i) for i in range(70, 80)], embedder)
+    assert built_store.hybrid_search("Ref ID TX000075")[0]["id"] == 75
+    resume.set()
+    compaction.join()
+
+    assert built_store.index.ntotal == 70
+    assert len(built_store.delta) == 10 and built_store._snapshot.rows == 80
+    assert built_store.hybrid_search("Ref ID TX000075")[0]["id"] == 75
+
+    reopened = open_store(built_store.index_dir)
+    reopened.load_index()
+    assert reopened.index.ntotal == 70 and reopened._snapshot.rows == 80
+    assert _texts(reopened) == _texts(built_store)
+
+    # The side tables were saved at the snapshot, not with the rows appended meanwhile
+    for table in (BM25Index(), EntityIndex(), ColumnStore()):
+        assert table.load(built_store.index_dir) and len(table) == 70
+    bm25, expected = BM25Index(), BM25Index()
+    bm25.load(built_store.index_dir)
+    expected.build(_texts(built_store)[:70])
+    assert bm25.vocab == expected.vocab
+    assert (bm25.doc_ids == expected.doc_ids).all() and (bm25.tfs == expected.tfs).all()
+
+
+def test_bm25_files_from_different_saves_are_rebuilt(built_store, embedder):
+    vocab_path = os.path.join(built_store.index_dir, BM25Index.VOCAB_FILE_NAME)
+    stale = {path: open(path, "rb").read() for path in (vocab_path, vocab_path + atomic_io.CHECKSUM_SUFFIX)}
+    built_store.add_new_messages([sms(i) for i in range(50, 60)], embedder)
+    assert built_store.compact()
+
+    # Crash between the two renames of the next save: new postings, old vocab (with a valid checksum)
+    for path, data in stale.items():
+        with open(path, "wb") as f:
+            f.write(data)
+    assert not BM25Index().load(built_store.index_dir)
+
+    reopened = open_store(built_store.index_dir)
+    reopened.load_index()
+    assert len(reopened.bm25_index) == 60
+    assert reopened.hybrid_search("Ref ID TX000055")[0]["id"] == 55
+
+
+def test_crash_between_data_and_checksum_rename(built_store, embedder, monkeypatch):
+    built_store.add_new_messages([sms(i) for i in range(50, 60)], embedder)
+    expected = _texts(built_store)
+    replace = os.replace
+
+    def crash_on_checksum(src, dst):
+        if src.endswith(atomic_io.CHECKSUM_SUFFIX + ".tmp"):
+            raise OSError("killed between the renames")
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", crash_on_checksum)
+    with pytest.raises(Exception):
+        built_store.compact()
+    monkeypatch.setattr(os, "replace", replace)
+
+    # embeddings.npy was renamed, its checksum was not
+    embeddings_path = os.path.join(built_store.index_dir, "embeddings.npy")
+    assert os.path.exists(embeddings_path + atomic_io.CHECKSUM_SUFFIX + ".tmp")
+    assert atomic_io.is_dirty(built_store.index_dir)
+
+    reopened = open_store(built_store.index_dir)
+    reopened.load_index()
+    assert not os.path.exists(embeddings_path + atomic_io.CHECKSUM_SUFFIX + ".tmp")
+    assert atomic_io.verify_checksum(embeddings_path, verify=True)
+    assert _texts(reopened) == expected and reopened._snapshot.rows == 60
+
+    assert reopened.compact()
+    assert not atomic_io.is_dirty(reopened.index_dir)
+    again = open_store(built_store.index_dir)
+    again.load_index()
+    assert again.index.ntotal == 60 and _texts(again) == expected
+
+
+# ------------------------------------------------------
+# Generations: a failed incremental build never moves CURRENT
+# ------------------------------------------------------
+def _write_sources(messages):
+    raw_dir = os.path.join("data", message_pipeline.RAW_DATA_DIR_NAME, "sample_messages")
+    os.makedirs(raw_dir, exist_ok=True)
+    with open(os.path.join(raw_dir, message_pipeline.RAW_SMS_DIR_NAME), "w", encoding="utf-8") as f:
+        json.dump({"messages": messages}, f)
+    with open(os.path.join(raw_dir, message_pipeline.RAW_EMAIL_DIR_NAME), "w", encoding="utf-8") as f:
+        json.dump({"emails": []}, f)
+
+
+def _artifact_files(generation):
+    # SQLite's -wal/-shm files come and go with open connections to documents.sqlite3
+    return sorted(name for name in os.listdir(generation) if not name.endswith(("-wal", "-shm")))
+
+
+def test_failed_incremental_build_leaves_current_untouched(tmp_path, embedder, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    clock = iter(datetime(2025, 11, 20, 12, 0, second) for second in range(60))
+    monkeypatch.setattr(train_pipeline, "datetime", type("Clock", (), {"now": staticmethod(lambda: next(clock))}))
+
+    _write_sources([sms(i) for i in range(30)])
+    TrainPipeline(embedder).run()
+    current = read_current(message_pipeline.ARTIFACT_DIR_NAME)
+    before = _artifact_files(current)
+    manifest = SourceManifest.load(current)
+
+    def crash(self, *args, **kwargs):
+        raise RuntimeError("killed during the incremental build")
+
+    _write_sources([sms(i) for i in range(35)])
+    ingest_delta = VectorStore.ingest_delta
+    monkeypatch.setattr(VectorStore, "ingest_delta", crash)
+    with pytest.raises(Exception):
+        TrainPipeline(embedder).run()
+
+    assert read_current(message_pipeline.ARTIFACT_DIR_NAME) == current
+    assert _artifact_files(current) == before
+    assert SourceManifest.load(current).messages == manifest.messages
+    store = open_store(current)
+    store.load_index()
+    assert len(store.messages) == 30
+
+    # The next run starts over from the untouched generation
+    monkeypatch.setattr(VectorStore, "ingest_delta", ingest_delta)
+    store = TrainPipeline(embedder).run()
+    assert len(store.messages) == 35
+    assert read_current(message_pipeline.ARTIFACT_DIR_NAME) != current
@@ -0,0 +1,205 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from src.exception.exception import Project_Exception
+from src.entity.config_entity import LLMClientConfig
+from src.embedding_service.column_store import ColumnStore
+from src.nlp_models.llm_responder import CloudLLM
+from src.query_engine.analytics import AnalyticsEngine
+from src.query_engine.answer_generator import PlaceholderRefiller, refill_stream
+from src.query_engine.entity_extractor import EntityExtractor
+from src.query_engine.query_cache import QueryCache
+from conftest import sms
+
+
+NOW = datetime(2025, 11, 20, 12, 0)
+
+
+@pytest.fixture
+def engine():
+    columns = ColumnStore()
+    columns.build([
+        {"source": "sms", "sender": "HDFC Bank", "type": "transaction", "timestamp": "2025-11-03T09:00:00",
+         "details": {"amount": 1200, "action": "debited"}},
+        {"source": "sms", "sender": "Google Pay", "type": "transaction", "timestamp": "2025-11-07T10:05:00",
+         "details": {"amount": 250, "action": "debited"}},
+        {"source": "sms", "sender": "HDFC Bank", "type": "transaction", "timestamp": "2025-10-28T18:30:00",
+         "details": {"amount": 5000, "action": "credited"}},
+        {"source": "email", "from": "Amazon", "type": "order_update", "date": "2025-11-10T08:00:00"},
+    ])
+    return AnalyticsEngine(columns)
+
+
+@pytest.mark.parametrize("query, op, filters", [
+    ("How much did I spend this month?", "sum", {"action": "debited"}),
+    ("total amount credited in october 2025", "sum", {"action": "credited"}),
+    ("how many transactions from hdfc bank", "count", {"type": "transaction", "sender": ["hdfc bank"]}),
+    ("how many emails did I get last week", "count", {"source": "email"}),
+    ("who sent me the most messages", "top_senders", {}),
+])
+def test_parse_recognizes_aggregates(engine, query, op, filters):
+    intent = engine.parse(query, NOW)
+    assert intent is not None and intent["op"] == op
+    for key, value in filters.items():
+        assert intent["filters"][key] == value
+
+
+@pytest.mark.parametrize("query", [
+    "how much did I spend on groceries",
+    "what is the total amount due on my Amazon invoice",
+    "how much did I pay for rent last month",
+    "total spent on swiggy orders this week",
+    "how many transactions from flipkart",
+    "how much did I pay Rajesh",
+    "how many meetings did I miss",
+])
+def test_parse_sends_partly_understood_queries_to_rag(engine, query):
+    assert engine.parse(query, NOW) is None
+    assert engine.answer(query, NOW) is None
+
+
+def test_answer_sums_known_sender(engine):
+    result = engine.answer("how much was debited from hdfc bank this month", NOW)
+    assert result["value"] == {"total": 1200.0, "count": 1}
+
+
+# ------------------------------------------------------
+# Entity masking: single-pass scanner vs the legacy masker
+# ------------------------------------------------------
+@pytest.mark.parametrize("message", [
+    "SMS from HDFC: Rs. 1500 debited from your account. Available balance after 1500 debit is low.",
+    "SMS from Google Pay: Payment of Rs. 250 to Rajesh for dinner was successful. Ref ID: GP281105.",
+    "Email from Unknown: Invoice total due: Rs. 45,000. Kindly process payment of 45000 by 15 November 2025.",
+    "SMS from Paytm: Rs. 45000 received. You now have 45,000 more in your wallet.",
+    "SMS from BookMyShow: Tickets confirmed. Ref: BMS5599. Quote BMS5599 at the counter.",
+])
+def test_scanner_matches_legacy_masker(message):
+    assert EntityExtractor.extract_entities_batch([message], 3)[0]["masked"] == EntityExtractor.legacy_mask(message, 3)
+
+
+def test_scanner_masks_repeated_amount_on_word_boundaries_only():
+    message = "SMS from Bank: Rs. 25 cashback on order GP2581 credited. 25 points added, 250 pending."
+    masked = EntityExtractor.extract_entities_batch([message])[0]["masked"]
+    assert masked == "#source_1 from Bank: Rs. #amount_1 cashback on order GP2581 credited. #amount_1 points added, 250 pending."
+    # The legacy masker replaced substrings of unrelated tokens
+    assert "GP#amount_1" in EntityExtractor.legacy_mask(message, 1)
+
+
+# ------------------------------------------------------
+# Streaming: SSE parsing and placeholder refill
+# ------------------------------------------------------
+class _SSEResponse:
+    """Just enough of a streamed requests.Response for stream_prompt."""
+
+    def __init__(self, lines, status_code=200):
+        self.lines = lines
+        self.status_code = status_code
+        self.text = ""
+        self.encoding = None
+
+    def iter_lines(self, chunk_size=None, decode_unicode=False):
+        yield from self.lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _delta(text):
+    return "data: " + json.dumps({"choices": [{"index": 0, "delta": {"content": text}}]})
+
+
+def _streamed(lines):
+    llm = CloudLLM(config=LLMClientConfig(url="http://127.0.0.1:9/unused"), api_key="stub")
+    llm._post = lambda payload, stream=False: _SSEResponse(lines)
+    return list(llm.stream_prompt("prompt"))
+
+
+def test_sse_parser_skips_keep_alives_and_joins_multiline_data():
+    lines = [": OPENROUTER PROCESSING", "", "data: one", "data: two", "", ":", "event: ping", "", "data:three", ""]
+    assert list(CloudLLM._iter_sse_data(_SSEResponse(lines))) == ["one\ntwo", "three"]
+
+
+def test_stream_prompt_stops_at_done():
+    lines = [": OPENROUTER PROCESSING", "", _delta("You paid "), "", ": keep-alive", "",
+             _delta("Rs. #amount_1"), "", "data: [DONE]", "", _delta("after done"), ""]
+    assert _streamed(lines) == ["You paid ", "Rs. #amount_1"]
+
+
+def test_stream_prompt_raises_on_error_event():
+    lines = [_delta("partial "), "", 'data: {"error": {"code": 502, "message": "upstream failed"}}', ""]
+    with pytest.raises(Project_Exception, match="upstream failed"):
+        _streamed(lines)
+
+
+PLACEHOLDERS = {"amount_1": "250", "amount_12": "9,999", "receiver_1": "Rajesh"}
+
+
+@pytest.mark.parametrize("deltas, expected", [
+    (["You paid Rs. #amo", "unt_1 to #receiver_1."], "You paid Rs. 250 to Rajesh."),
+    (["Rs. #", "amount", "_", "1", "2 total"], "Rs. 9,999 total"),
+    (["Rs. #amount_1", "2"], "Rs. 9,999"),
+    (["Rs. #amount_1"], "Rs. 250"),
+    (["tagged #amo", "ng friends"], "tagged #among friends"),
+])
+def test_refill_stream_handles_placeholders_split_across_deltas(deltas, expected):
+    assert "".join(refill_stream(deltas, PLACEHOLDERS)) == expected
+
+
+def test_refiller_holds_back_only_a_possible_placeholder():
+    refiller = PlaceholderRefiller(PLACEHOLDERS)
+    assert refiller.feed("You paid Rs. #amo") == "You paid Rs. "
+    assert refiller.feed("unt_1 to ") == "250 to "
+    assert refiller.feed("#receiver_1") == ""
+    assert refiller.feed(".") == "Rajesh."
+    assert refiller.flush() == ""
+
+
+# ------------------------------------------------------
+# Query cache: invalidation by store events
+# ------------------------------------------------------
+BILL = "Electricity bill of Rs. 1,240 is due on 12 November."
+
+
+def _cached(cache, store, embedder, query, top_k=3):
+    embedding = embedder.generate_embeddings([query])[0]
+    cache.put(query, embedding, top_k, None, store.search(embedding, top_k), answer=query,
+              generation=store.generation)
+    return embedding
+
+
+def test_query_cache_drops_only_entries_a_new_message_would_enter(built_store, embedder):
+    cache = QueryCache(32)
+    built_store.add_listener(cache.on_store_event)
+    payment = _cached(cache, built_store, embedder, built_store.messages[7])
+    bill = _cached(cache, built_store, embedder, f"SMS from Bank2: {BILL}")
+    assert cache.lookup(bill, 3, generation=built_store.generation)["answer"].endswith(BILL)
+
+    built_store.add_new_message(sms(50, BILL), embedder)
+    assert len(cache) == 1 and cache.stats()["invalidations"] == 1
+    assert cache.lookup(bill, 3, generation=built_store.generation) is None
+    # The payment entry was moved to the new generation, so it still answers
+    entry = cache.lookup(payment, 3, generation=built_store.generation)
+    assert entry is not None and entry["results"][0]["id"] == 7
+    assert cache.lookup(payment, 5, generation=built_store.generation) is None
+
+
+def test_query_cache_is_cleared_on_rebuild(built_store, embedder):
+    cache = QueryCache(32)
+    built_store.add_listener(cache.on_store_event)
+    _cached(cache, built_store, embedder, built_store.messages[7])
+    built_store.load_index()
+    assert len(cache) == 0 and cache.stats()["invalidations"] == 1
+
+
+def test_query_cache_ignores_entries_from_an_older_generation(built_store, embedder):
+    # A cache the store never told about its appends
+    cache = QueryCache(32)
+    payment = _cached(cache, built_store, embedder, built_store.messages[7])
+    built_store.add_new_message(sms(50), embedder)
+    assert cache.lookup(payment, 3, generation=built_store.generation) is None
+    assert cache.lookup(payment, 3) is not None